@@ -0,0 +1,405 @@
+import asyncio
+import os
+import tempfile
+import time
+from typing import List, NamedTuple, Optional, Sequence
+
+import httpx
+import numpy as np
+from fastapi import FastAPI
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..models.category import Category
+from ..models.local import Local
+from ..models.tourist import Tourist
+from ..models.user import pwd_context
+from ..security import limit_login_attempts
+from ..services.nearby import find_nearby, rank_by_distance
+from ..services.password_hasher import PasswordHasher, get_password_hasher
+from .config import API_PREFIX
+from .db import engine, get_async_session, get_session
+
+# read paths served by the async session
+READ_PATHS = (
+    f"{API_PREFIX}/locals/?category_id=1",
+    f"{API_PREFIX}/search/?query=agro",
+    f"{API_PREFIX}/reviews/",
+    f"{API_PREFIX}/itineraries/public",
+)
+
+
+class BlockingSession:
+    """
+    Async facade over a sync Session: every query blocks the event loop, as
+    the read paths did before the async engine. Used as the baseline.
+    """
+
+    def __init__(self, session: Session, latency: float = 0.0):
+        self.session = session
+        self.latency = latency
+
+    async def exec(self, statement, **kwargs):
+        time.sleep(self.latency)
+        return self.session.exec(statement, **kwargs)
+
+
+class DelayedAsyncSession:
+    """
+    Async session whose queries wait `latency` seconds more, simulating
+    the round trip to a database server over the network.
+    """
+
+    def __init__(self, session: AsyncSession, latency: float = 0.0):
+        self.session = session
+        self.latency = latency
+
+    async def exec(self, statement, **kwargs):
+        await asyncio.sleep(self.latency)
+        return await self.session.exec(statement, **kwargs)
+
+
+def session_dependency(session: str, latency: float = 0.0):
+    """Dependency that replaces get_async_session in the benchmark."""
+    if session == "sync":
+
+        def get_blocking_session():
+            with Session(engine) as sync_session:
+                yield BlockingSession(sync_session, latency)
+
+        return get_blocking_session
+
+    async def get_delayed_async_session():
+        async for async_session in get_async_session():
+            yield DelayedAsyncSession(async_session, latency)
+
+    return get_delayed_async_session
+
+
+class BenchmarkResult(NamedTuple):
+    session: str
+    requests: int
+    errors: int
+    elapsed: float  # in seconds
+    latencies: List[float]  # in seconds
+
+    @property
+    def throughput(self) -> float:
+        return self.requests / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self) -> str:
+        p50, p95 = np.percentile(self.latencies, [50, 95]) * 1000
+        return (
+            f"{self.session}: {self.requests} requests in "
+            f"{self.elapsed:.2f}s ({self.throughput:.1f} req/s, "
+            f"p50 {p50:.1f} ms, p95 {p95:.1f} ms, {self.errors} errors)"
+        )
+
+
+async def run_load(
+    app: FastAPI,
+    paths: Sequence[str] = READ_PATHS,
+    requests: int = 500,
+    concurrency: int = 20,
+    session: str = "async",
+    latency: float = 0.0,
+) -> BenchmarkResult:
+    """
+    Send `requests` GETs over `paths` from `concurrency` concurrent clients
+    to the app, in this process, using the async session or the blocking
+    baseline (`session="sync"`). Each query waits `latency` seconds more,
+    as with a database in another host.
+    """
+    app.dependency_overrides[get_async_session] = session_dependency(
+        session, latency
+    )
+    latencies: List[float] = []
+    errors = 0
+    pending = iter(range(requests))
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        nonlocal errors
+        for i in pending:
+            started_at = time.perf_counter()
+            response = await client.get(paths[i % len(paths)])
+            latencies.append(time.perf_counter() - started_at)
+            errors += response.is_error
+
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://benchmark"
+        ) as client:
+            await client.get(paths[0])  # warm up connections and caches
+            started_at = time.perf_counter()
+            await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+            elapsed = time.perf_counter() - started_at
+    finally:
+        app.dependency_overrides.pop(get_async_session, None)
+    return BenchmarkResult(session, requests, errors, elapsed, latencies)
+
+
+# region of the synthetic catalogue (Espírito Santo), as
+# (min latitude, max latitude, min longitude, max longitude)
+NEARBY_REGION = (-21.3, -17.9, -41.9, -39.7)
+
+
+class NearbyBenchmarkResult(NamedTuple):
+    mode: str
+    latencies: List[float]  # in seconds
+    results: List[int]  # locals returned by each query
+
+    def __str__(self) -> str:
+        p50, p95 = np.percentile(self.latencies, [50, 95]) * 1000
+        return (
+            f"{self.mode}: {len(self.latencies)} queries, "
+            f"p50 {p50:.2f} ms, p95 {p95:.2f} ms, "
+            f"{np.mean(self.results):.0f} locals per query"
+        )
+
+
+def create_synthetic_catalogue(database_url: str, count: int, seed: int):
+    """Locals spread at random over NEARBY_REGION, in a new database."""
+    rng = np.random.default_rng(seed)
+    min_lat, max_lat, min_lon, max_lon = NEARBY_REGION
+    latitudes = rng.uniform(min_lat, max_lat, count)
+    longitudes = rng.uniform(min_lon, max_lon, count)
+    sync_engine = create_engine(database_url)
+    SQLModel.metadata.create_all(sync_engine)
+    with sync_engine.begin() as connection:
+        connection.execute(
+            insert(Category.__table__),
+            [{"id": 1, "name": "Synthetic", "slug": "synthetic"}],
+        )
+        connection.execute(
+            insert(Local.__table__),
+            [
+                {
+                    "name": f"Local {i}",
+                    "slug": f"local-{i}",
+                    "latitude": float(latitude),
+                    "longitude": float(longitude),
+                    "address": "",
+                    "description": "",
+                    "main_category_id": 1,
+                }
+                for i, (latitude, longitude) in enumerate(
+                    zip(latitudes, longitudes)
+                )
+            ],
+        )
+    return sync_engine
+
+
+async def run_nearby_benchmark(
+    count: int = 100_000,
+    queries: int = 200,
+    radius: Optional[float] = 20.0,
+    k: Optional[int] = None,
+    seed: int = 0,
+) -> List[NearbyBenchmarkResult]:
+    """
+    Time the nearby search over a synthetic catalogue of `count` locals,
+    in a temporary SQLite database: a full scan of the coordinates (as the
+    clients did), then the bounding box without and with the (latitude,
+    longitude) index.
+    """
+    rng = np.random.default_rng(seed + 1)
+    min_lat, max_lat, min_lon, max_lon = NEARBY_REGION
+    points = np.column_stack(
+        [
+            rng.uniform(min_lat, max_lat, queries),
+            rng.uniform(min_lon, max_lon, queries),
+        ]
+    )
+    index = next(
+        index
+        for index in Local.__table__.indexes
+        if index.name == "ix_local_latitude_longitude"
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "nearby.sqlite3")
+        sync_engine = create_synthetic_catalogue(
+            f"sqlite:///{path}", count, seed
+        )
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+
+        async def full_scan(session, latitude, longitude):
+            rows = (
+                await session.execute(
+                    select(Local.id, Local.latitude, Local.longitude)
+                )
+            ).all()
+            data = np.array(rows, dtype=np.float64).reshape(-1, 3)
+            return rank_by_distance(
+                latitude,
+                longitude,
+                data[:, 0].astype(np.int64),
+                data[:, 1:],
+                radius,
+                k,
+            )
+
+        async def bounding_box(session, latitude, longitude):
+            return await find_nearby(
+                session, latitude, longitude, radius=radius, k=k
+            )
+
+        async def measure(mode, search) -> NearbyBenchmarkResult:
+            latencies, results = [], []
+            async with AsyncSession(async_engine) as session:
+                for latitude, longitude in points:
+                    started_at = time.perf_counter()
+                    nearby = await search(session, latitude, longitude)
+                    latencies.append(time.perf_counter() - started_at)
+                    results.append(len(nearby))
+            return NearbyBenchmarkResult(mode, latencies, results)
+
+        try:
+            index.drop(sync_engine)
+            results = [
+                await measure("full scan", full_scan),
+                await measure("bounding box", bounding_box),
+            ]
+            index.create(sync_engine)
+            results.append(await measure("bounding box + index", bounding_box))
+        finally:
+            await async_engine.dispose()
+            sync_engine.dispose()
+    return results
+
+
+class BlockingPasswordHasher(PasswordHasher):
+    """
+    Hashes on the event loop, as the login did before the password hasher.
+    Used as the baseline.
+    """
+
+    def __init__(self):
+        super().__init__(max_workers=1, max_queue=0)
+
+    async def run(self, func, *args):
+        return func(*args)
+
+
+class LoginStormResult(NamedTuple):
+    mode: str
+    logins: int
+    login_errors: int
+    elapsed: float  # in seconds, until the last login
+    latencies: List[float]  # of the other requests, in seconds
+    errors: int
+
+    def __str__(self) -> str:
+        p50, p95, p99 = np.percentile(self.latencies, [50, 95, 99]) * 1000
+        return (
+            f"{self.mode}: {self.logins} logins in {self.elapsed:.2f}s "
+            f"({self.login_errors} errors), {len(self.latencies)} other "
+            f"requests p50 {p50:.1f} ms, p95 {p95:.1f} ms, "
+            f"p99 {p99:.1f} ms ({self.errors} errors)"
+        )
+
+
+async def run_login_storm(
+    app: FastAPI,
+    paths: Sequence[str] = READ_PATHS,
+    logins: int = 50,
+    concurrency: int = 20,
+    requests: int = 200,
+    readers: int = 5,
+    mode: str = "pool",
+) -> LoginStormResult:
+    """
+    Send `logins` logins from `concurrency` concurrent clients while
+    `readers` other clients send `requests` GETs over `paths`, and time the
+    GETs. The passwords are checked in the password hasher pool, on the
+    event loop (`mode="blocking"`, the baseline) or there are no logins at
+    all (`mode="idle"`).
+
+    The user logs in against a temporary SQLite database, with the login
+    rate limit off.
+    """
+    if mode == "idle":
+        logins = 0
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "logins.sqlite3")
+        users_engine = create_engine(
+            f"sqlite:///{path}", connect_args={"check_same_thread": False}
+        )
+        SQLModel.metadata.create_all(users_engine)
+        password = "benchmark-password"
+        with Session(users_engine) as session:
+            user = Tourist(
+                username="benchmark",
+                name="Benchmark",
+                email="benchmark@example.com",
+                user_type="tourist",
+            )
+            user.password = pwd_context.hash(password)
+            session.add(user)
+            session.commit()
+
+        def get_users_session():
+            with Session(users_engine) as session:
+                yield session
+
+        app.dependency_overrides[get_session] = get_users_session
+        app.dependency_overrides[limit_login_attempts] = lambda: None
+        if mode == "blocking":
+            blocking_hasher = BlockingPasswordHasher()
+            app.dependency_overrides[get_password_hasher] = (
+                lambda: blocking_hasher
+            )
+
+        latencies: List[float] = []
+        errors = 0
+        login_errors = 0
+        pending_logins = iter(range(logins))
+        pending_requests = iter(range(requests))
+
+        async def login(client: httpx.AsyncClient) -> None:
+            nonlocal login_errors
+            for _ in pending_logins:
+                response = await client.post(
+                    f"{API_PREFIX}/token",
+                    data={"username": "benchmark", "password": password},
+                )
+                login_errors += response.is_error
+
+        async def read(client: httpx.AsyncClient) -> None:
+            nonlocal errors
+            for i in pending_requests:
+                started_at = time.perf_counter()
+                response = await client.get(paths[i % len(paths)])
+                latencies.append(time.perf_counter() - started_at)
+                errors += response.is_error
+
+        async def storm(client: httpx.AsyncClient) -> float:
+            started_at = time.perf_counter()
+            await asyncio.gather(*(login(client) for _ in range(concurrency)))
+            return time.perf_counter() - started_at
+
+        transport = httpx.ASGITransport(app=app)
+        try:
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://benchmark"
+            ) as client:
+                await client.get(paths[0])  # warm up connections and caches
+                elapsed, *_ = await asyncio.gather(
+                    storm(client), *(read(client) for _ in range(readers))
+                )
+        finally:
+            for dependency in (
+                get_session,
+                limit_login_attempts,
+                get_password_hasher,
+            ):
+                app.dependency_overrides.pop(dependency, None)
+            users_engine.dispose()
+    return LoginStormResult(
+        mode, logins, login_errors, elapsed, latencies, errors
+    )
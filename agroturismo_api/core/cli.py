@@ -1,10 +1,16 @@
+import asyncio
+
 import typer
 import uvicorn
 from sqlmodel import Session
 
+from ..main import app
 from ..models.admin_user import AdminUser
 from ..models.user import User
-from .db import create_db_and_tables, engine
+from ..services.text_search import text_search_index
+from .benchmark import run_load, run_login_storm, run_nearby_benchmark
+from .db import async_engine, create_db_and_tables, engine
+from .query_budget import check_query_budgets
 
 cli = typer.Typer(name="Agrorturismo API")
 
@@ -26,6 +32,132 @@ def run(
     )
 
 
+@cli.command()
+def mock_osrm(
+    port: int = 5000,
+    host: str = "localhost",
+    log_level: str = "info",
+):  # pragma: no cover
+    """Run a local OSRM-compatible table server for offline tests."""
+    uvicorn.run(
+        "agroturismo_api.services.routing_provider:create_mock_osrm_app",
+        factory=True,
+        host=host,
+        port=port,
+        log_level=log_level,
+    )
+
+
+@cli.command()
+def benchmark(
+    requests: int = 500,
+    concurrency: int = 20,
+    session: str = "both",
+    latency: float = 0.0,
+):  # pragma: no cover
+    """
+    Measure the read paths throughput with sync and async sessions.
+
+    Use --latency (in ms) to add a network round trip to each query when
+    the database is local.
+    """
+    sessions = ["sync", "async"] if session == "both" else [session]
+    engine.echo = False
+    create_db_and_tables(engine)
+
+    async def run():
+        for name in sessions:
+            result = await run_load(
+                app,
+                requests=requests,
+                concurrency=concurrency,
+                session=name,
+                latency=latency / 1000,
+            )
+            typer.echo(result)
+        await async_engine.dispose()
+
+    asyncio.run(run())
+
+
+@cli.command()
+def benchmark_nearby(
+    locals: int = 100_000,
+    queries: int = 200,
+    radius: float = 20.0,
+    k: int = 0,
+):  # pragma: no cover
+    """
+    Measure the nearby search over a synthetic catalogue of locals.
+
+    Use --radius 0 with --k to search only the k nearest.
+    """
+    results = asyncio.run(
+        run_nearby_benchmark(
+            count=locals,
+            queries=queries,
+            radius=radius or None,
+            k=k or None,
+        )
+    )
+    for result in results:
+        typer.echo(result)
+
+
+@cli.command()
+def benchmark_logins(
+    logins: int = 50,
+    concurrency: int = 20,
+    requests: int = 200,
+    readers: int = 5,
+    mode: str = "all",
+):  # pragma: no cover
+    """
+    Measure the latency of the other endpoints during a login storm.
+
+    Compares no logins (idle), bcrypt on the event loop (blocking) and the
+    password hasher pool (pool).
+    """
+    modes = ["idle", "blocking", "pool"] if mode == "all" else [mode]
+    engine.echo = False
+    create_db_and_tables(engine)
+
+    async def run():
+        for name in modes:
+            result = await run_login_storm(
+                app,
+                logins=logins,
+                concurrency=concurrency,
+                requests=requests,
+                readers=readers,
+                mode=name,
+            )
+            typer.echo(result)
+        await async_engine.dispose()
+
+    asyncio.run(run())
+
+
+@cli.command()
+def check_queries():  # pragma: no cover
+    """Fail when an endpoint runs more queries than its budget (N+1)."""
+    engine.echo = False
+    counts = check_query_budgets(app)
+    for count in counts:
+        typer.echo(count)
+    if not all(count.ok for count in counts):
+        raise typer.Exit(code=1)
+
+
+@cli.command()
+def rebuild_search_index():
+    """Rebuild the text search index of locals, categories and tags."""
+    create_db_and_tables(engine)
+    with engine.begin() as connection:
+        documents = text_search_index.rebuild(connection)
+    typer.echo(f"indexed {documents} documents")
+
+
 @cli.command()
 def create_super_admin_user(username: str, password: str):
     """Create user"""
@@ -1,4 +1,5 @@
 from starlette.config import Config
+from starlette.datastructures import CommaSeparatedStrings
 
 APP_VERSION = "0.0.1"
 APP_NAME = "Agroturismo API"
@@ -11,6 +12,41 @@ IS_DEBUG: bool = config("IS_DEBUG", cast=bool, default=False)
 DATABASE_URL: str = config(
     "DATABASE_URL", cast=str, default="sqlite:///./db.sqlite3"
 )
+# defaults to DATABASE_URL with the async driver (asyncpg or aiosqlite)
+ASYNC_DATABASE_URL: str = config("ASYNC_DATABASE_URL", cast=str, default="")
+
+# Database config
+DATABASE_ECHO: str = config(
+    "DATABASE_ECHO", cast=str, default="true" if IS_DEBUG else "false"
+)  # true, false or debug (also logs the result rows)
+DATABASE_POOL_SIZE: int = config("DATABASE_POOL_SIZE", cast=int, default=5)
+DATABASE_MAX_OVERFLOW: int = config(
+    "DATABASE_MAX_OVERFLOW", cast=int, default=10
+)
+DATABASE_POOL_TIMEOUT: float = config(
+    "DATABASE_POOL_TIMEOUT", cast=float, default=30.0
+)  # in seconds, waiting for a free connection
+DATABASE_POOL_RECYCLE: int = config(
+    "DATABASE_POOL_RECYCLE", cast=int, default=1800
+)  # in seconds, -1 to keep the connections forever
+DATABASE_POOL_PRE_PING: bool = config(
+    "DATABASE_POOL_PRE_PING", cast=bool, default=True
+)
+DATABASE_STATEMENT_TIMEOUT: int = config(
+    "DATABASE_STATEMENT_TIMEOUT", cast=int, default=30_000
+)  # in milliseconds, 0 to disable (postgres only)
+SQLITE_JOURNAL_MODE: str = config(
+    "SQLITE_JOURNAL_MODE", cast=str, default="wal"
+)
+SQLITE_SYNCHRONOUS: str = config(
+    "SQLITE_SYNCHRONOUS", cast=str, default="normal"
+)
+SQLITE_BUSY_TIMEOUT: int = config(
+    "SQLITE_BUSY_TIMEOUT", cast=int, default=5000
+)  # in milliseconds
+SQLITE_CACHE_SIZE: int = config(
+    "SQLITE_CACHE_SIZE", cast=int, default=-64_000
+)  # in pages, or in KiB when negative
 
 # Cloudinary config
 CLOUDINARY_CLOUD_NAME: str = config(
@@ -21,6 +57,40 @@ CLOUDINARY_API_SECRET: str = config(
     "CLOUDINARY_API_SECRET", cast=str, default=""
 )
 
+# Image upload config
+# "cloudinary" or "local", which stores the images in IMAGE_UPLOAD_DIR
+IMAGE_UPLOAD_BACKEND: str = config(
+    "IMAGE_UPLOAD_BACKEND", cast=str, default="cloudinary"
+)
+IMAGE_UPLOAD_CONCURRENCY: int = config(
+    "IMAGE_UPLOAD_CONCURRENCY", cast=int, default=4
+)
+# bytes sent per request to Cloudinary (its minimum is 5 MB)
+IMAGE_UPLOAD_CHUNK_SIZE: int = config(
+    "IMAGE_UPLOAD_CHUNK_SIZE", cast=int, default=6_000_000
+)
+IMAGE_UPLOAD_DIR: str = config("IMAGE_UPLOAD_DIR", cast=str, default="uploads")
+IMAGE_UPLOAD_URL: str = config(
+    "IMAGE_UPLOAD_URL", cast=str, default="/uploads"
+)
+
+# Image processing config
+# widths of the resized copies of each image, in pixels; the largest JPEG
+# is also the url of the image
+IMAGE_VARIANT_WIDTHS: CommaSeparatedStrings = config(
+    "IMAGE_VARIANT_WIDTHS",
+    cast=CommaSeparatedStrings,
+    default="320,640,1280,2048",
+)
+IMAGE_VARIANT_FORMATS: CommaSeparatedStrings = config(
+    "IMAGE_VARIANT_FORMATS", cast=CommaSeparatedStrings, default="webp,jpeg"
+)
+IMAGE_JPEG_QUALITY: int = config("IMAGE_JPEG_QUALITY", cast=int, default=82)
+IMAGE_WEBP_QUALITY: int = config("IMAGE_WEBP_QUALITY", cast=int, default=80)
+IMAGE_PLACEHOLDER_WIDTH: int = config(
+    "IMAGE_PLACEHOLDER_WIDTH", cast=int, default=16
+)
+
 # JWT config
 SECRET_KEY: str = config("SECRET_KEY", cast=str, default="secret")
 ALGORITHM: str = config("ALGORITHM", cast=str, default="HS256")
@@ -30,3 +100,133 @@ ACCESS_TOKEN_EXPIRE_MINUTES: int = config(
 REFRESH_TOKEN_EXPIRE_MINUTES: int = config(
     "REFRESH_TOKEN_EXPIRE_MINUTES", cast=int, default=60
 )
+
+# Password hashing config
+PASSWORD_BCRYPT_ROUNDS: int = config(
+    "PASSWORD_BCRYPT_ROUNDS", cast=int, default=12
+)  # log2 of the iterations; changed hashes are redone on the next login
+PASSWORD_HASH_WORKERS: int = config(
+    "PASSWORD_HASH_WORKERS", cast=int, default=2
+)
+PASSWORD_HASH_MAX_QUEUE: int = config(
+    "PASSWORD_HASH_MAX_QUEUE", cast=int, default=32
+)
+
+# Login rate limit config (attempts per window, 0 to disable)
+LOGIN_RATE_LIMIT_WINDOW: float = config(
+    "LOGIN_RATE_LIMIT_WINDOW", cast=float, default=60.0
+)  # in seconds
+LOGIN_RATE_LIMIT_PER_USERNAME: int = config(
+    "LOGIN_RATE_LIMIT_PER_USERNAME", cast=int, default=10
+)
+LOGIN_RATE_LIMIT_PER_CLIENT: int = config(
+    "LOGIN_RATE_LIMIT_PER_CLIENT", cast=int, default=30
+)
+# header with the client IP set by the proxy in front of the app (like
+# Fly-Client-IP); without it, the IP of the connection is used
+CLIENT_IP_HEADER: str = config("CLIENT_IP_HEADER", cast=str, default="")
+
+# Principal cache config (authenticated users)
+PRINCIPAL_CACHE_SIZE: int = config(
+    "PRINCIPAL_CACHE_SIZE", cast=int, default=1024
+)
+PRINCIPAL_CACHE_TTL: float = config(
+    "PRINCIPAL_CACHE_TTL", cast=float, default=60.0
+)  # in seconds
+
+# Distance cache config
+DISTANCE_CACHE_SIZE: int = config(
+    "DISTANCE_CACHE_SIZE", cast=int, default=100_000
+)
+
+# Text search config
+SEARCH_RESULT_LIMIT: int = config("SEARCH_RESULT_LIMIT", cast=int, default=20)
+SEARCH_MAX_RESULTS: int = config("SEARCH_MAX_RESULTS", cast=int, default=100)
+
+# Autocomplete config
+AUTOCOMPLETE_LIMIT: int = config("AUTOCOMPLETE_LIMIT", cast=int, default=10)
+AUTOCOMPLETE_MAX_LIMIT: int = config(
+    "AUTOCOMPLETE_MAX_LIMIT", cast=int, default=50
+)
+# seconds between rebuilds from the database (0 disables), so that each
+# process also sees the writes made by the others
+AUTOCOMPLETE_REFRESH_INTERVAL: int = config(
+    "AUTOCOMPLETE_REFRESH_INTERVAL", cast=int, default=300
+)
+
+# Pagination config
+DEFAULT_PAGE_SIZE: int = config("DEFAULT_PAGE_SIZE", cast=int, default=50)
+MAX_PAGE_SIZE: int = config("MAX_PAGE_SIZE", cast=int, default=500)
+
+# Nearby locals config (in km)
+NEARBY_DEFAULT_RADIUS: float = config(
+    "NEARBY_DEFAULT_RADIUS", cast=float, default=20.0
+)
+NEARBY_INITIAL_RADIUS: float = config(
+    "NEARBY_INITIAL_RADIUS", cast=float, default=10.0
+)
+NEARBY_MAX_RADIUS: float = config(
+    "NEARBY_MAX_RADIUS", cast=float, default=1000.0
+)
+
+# Response cache config (catalogue reads)
+RESPONSE_CACHE_MAX_BYTES: int = config(
+    "RESPONSE_CACHE_MAX_BYTES", cast=int, default=32_000_000
+)  # of cached bodies, 0 to disable
+RESPONSE_CACHE_TTL: float = config(
+    "RESPONSE_CACHE_TTL", cast=float, default=300.0
+)  # in seconds
+RESPONSE_CACHE_MAX_AGE: int = config(
+    "RESPONSE_CACHE_MAX_AGE", cast=int, default=60
+)  # in seconds, of the Cache-Control header
+
+# Routing provider config (haversine, osrm or mock)
+ROUTING_PROVIDER: str = config(
+    "ROUTING_PROVIDER", cast=str, default="haversine"
+)
+OSRM_URL: str = config(
+    "OSRM_URL", cast=str, default="https://router.project-osrm.org"
+)
+OSRM_PROFILE: str = config("OSRM_PROFILE", cast=str, default="driving")
+ROUTING_TIMEOUT: float = config(
+    "ROUTING_TIMEOUT", cast=float, default=10.0
+)  # in seconds
+ROUTING_RETRIES: int = config("ROUTING_RETRIES", cast=int, default=2)
+ROUTING_MAX_TABLE_SIZE: int = config(
+    "ROUTING_MAX_TABLE_SIZE", cast=int, default=100
+)  # coordinates per table request
+ROUTING_MAX_CONNECTIONS: int = config(
+    "ROUTING_MAX_CONNECTIONS", cast=int, default=10
+)
+
+# Route solver pool config
+SOLVER_WORKERS: int = config("SOLVER_WORKERS", cast=int, default=2)
+SOLVER_MAX_QUEUE: int = config("SOLVER_MAX_QUEUE", cast=int, default=16)
+SOLVER_TIME_LIMIT: float = config(
+    "SOLVER_TIME_LIMIT", cast=float, default=10.0
+)  # in seconds
+
+# Exact route solver config (automatic mode)
+HELD_KARP_MAX_STOPS: int = config("HELD_KARP_MAX_STOPS", cast=int, default=13)
+BRANCH_AND_BOUND_MAX_STOPS: int = config(
+    "BRANCH_AND_BOUND_MAX_STOPS", cast=int, default=18
+)
+
+# Time window routing config
+ROUTE_AVERAGE_SPEED: float = config(
+    "ROUTE_AVERAGE_SPEED", cast=float, default=40.0
+)  # in km/h, used when the travel duration is unknown
+VISIT_DURATION: int = config("VISIT_DURATION", cast=int, default=60)  # minutes
+
+# Route job config
+ROUTE_JOB_WORKERS: int = config("ROUTE_JOB_WORKERS", cast=int, default=1)
+ROUTE_JOB_MAX_QUEUE: int = config("ROUTE_JOB_MAX_QUEUE", cast=int, default=64)
+ROUTE_JOB_TIME_LIMIT: float = config(
+    "ROUTE_JOB_TIME_LIMIT", cast=float, default=60.0
+)  # in seconds
+
+# Route cache config
+ROUTE_CACHE_SIZE: int = config("ROUTE_CACHE_SIZE", cast=int, default=1024)
+ROUTE_CACHE_TTL: float = config(
+    "ROUTE_CACHE_TTL", cast=float, default=3600.0
+)  # in seconds
@@ -1,18 +1,292 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional, Type, Union
+
 from fastapi import Depends
+from pydantic import BaseModel
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.engine.url import URL
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, Pool, QueuePool
 from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .config import (
+    ASYNC_DATABASE_URL,
+    DATABASE_ECHO,
+    DATABASE_MAX_OVERFLOW,
+    DATABASE_POOL_PRE_PING,
+    DATABASE_POOL_RECYCLE,
+    DATABASE_POOL_SIZE,
+    DATABASE_POOL_TIMEOUT,
+    DATABASE_STATEMENT_TIMEOUT,
+    DATABASE_URL,
+    SQLITE_BUSY_TIMEOUT,
+    SQLITE_CACHE_SIZE,
+    SQLITE_JOURNAL_MODE,
+    SQLITE_SYNCHRONOUS,
+)
+
+# async drivers for each database backend
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+class PoolMetrics(BaseModel):
+    engine: str
+    pool: str
+    size: Optional[int]
+    max_overflow: Optional[int]
+    checked_out: int
+    max_checked_out: int
+    checkouts: int
+    timeouts: int
+    connections: int  # opened since the start
+    checkout_time_avg: float  # in ms, waiting for a connection
+    checkout_time_max: float
+    hold_time_avg: float  # in ms, from checkout to checkin
+    hold_time_max: float
+
+
+class PoolStats:
+    """
+    Counters of a connection pool, updated by its events. Used to size the
+    pool: many timeouts or a long checkout time with `max_checked_out` at
+    size + max_overflow mean the pool is too small.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.engine: Optional[Engine] = None
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connections = 0
+        self.checkout_time = 0.0
+        self.max_checkout_time = 0.0
+        self.hold_time = 0.0
+        self.max_hold_time = 0.0
+        self.checkins = 0
+
+    def record_checkout(self, elapsed: float, timed_out: bool) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.checkout_time += elapsed
+            self.max_checkout_time = max(self.max_checkout_time, elapsed)
+
+    def on_connect(self, dbapi_connection, connection_record) -> None:
+        with self._lock:
+            self.connections += 1
+
+    def on_checkout(
+        self, dbapi_connection, connection_record, connection_proxy
+    ) -> None:
+        connection_record.info["checked_out_at"] = time.perf_counter()
+        with self._lock:
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+
+    def on_checkin(self, dbapi_connection, connection_record) -> None:
+        checked_out_at = connection_record.info.pop("checked_out_at", None)
+        if checked_out_at is None:
+            return
+        elapsed = time.perf_counter() - checked_out_at
+        with self._lock:
+            self.checked_out -= 1
+            self.checkins += 1
+            self.hold_time += elapsed
+            self.max_hold_time = max(self.max_hold_time, elapsed)
+
+    def listen(self, engine: Union[Engine, AsyncEngine]) -> None:
+        sync_engine = getattr(engine, "sync_engine", engine)
+        self.engine = sync_engine
+        event.listen(sync_engine, "connect", self.on_connect)
+        event.listen(sync_engine, "checkout", self.on_checkout)
+        event.listen(sync_engine, "checkin", self.on_checkin)
+
+    def metrics(self) -> PoolMetrics:
+        pool = self.engine.pool
+        is_queue_pool = isinstance(pool, QueuePool)
+        return PoolMetrics(
+            engine=self.name,
+            pool=type(pool).__name__,
+            size=pool.size() if is_queue_pool else None,
+            max_overflow=pool._max_overflow if is_queue_pool else None,
+            checked_out=self.checked_out,
+            max_checked_out=self.max_checked_out,
+            checkouts=self.checkouts,
+            timeouts=self.timeouts,
+            connections=self.connections,
+            checkout_time_avg=_average_ms(self.checkout_time, self.checkouts),
+            checkout_time_max=self.max_checkout_time * 1000,
+            hold_time_avg=_average_ms(self.hold_time, self.checkins),
+            hold_time_max=self.max_hold_time * 1000,
+        )
+
+
+def _average_ms(total: float, count: int) -> float:
+    return total / count * 1000 if count else 0.0
+
+
+class TimedPoolMixin:
+    """Measures how long each checkout waits for a connection."""
+
+    stats: PoolStats
+
+    def connect(self):
+        started_at = time.perf_counter()
+        timed_out = False
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            timed_out = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - started_at
+            self.stats.record_checkout(elapsed, timed_out)
+
+
+def timed_pool_class(pool_class: Type[Pool], stats: PoolStats) -> Type[Pool]:
+    # a pool is recreated from its class on engine.dispose(), so the stats
+    # are kept in the class
+    return type(
+        f"Timed{pool_class.__name__}",
+        (TimedPoolMixin, pool_class),
+        {"stats": stats},
+    )
 
-from .config import DATABASE_URL
+
+def get_database_echo(value: str = DATABASE_ECHO) -> Union[bool, str]:
+    value = value.lower()
+    return "debug" if value == "debug" else value in ("true", "1", "yes")
+
+
+def get_async_database_url(database_url: str) -> str:
+    """Same database, through the async driver of its backend."""
+    url = make_url(database_url)
+    drivername = ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername)
+    return str(url.set(drivername=drivername))
+
+
+def _is_sqlite_memory(url: URL) -> bool:
+    return (
+        url.database in (None, "", ":memory:")
+        or url.query.get("mode") == "memory"
+    )
+
+
+def get_connect_args(url: URL) -> Dict[str, Any]:
+    if url.get_backend_name() == "sqlite":
+        return {"check_same_thread": False}
+    if url.get_backend_name() in ("postgresql", "postgres"):
+        if not DATABASE_STATEMENT_TIMEOUT:
+            return {}
+        if url.get_driver_name() == "asyncpg":
+            return {
+                "server_settings": {
+                    "statement_timeout": str(DATABASE_STATEMENT_TIMEOUT)
+                }
+            }
+        return {
+            "options": f"-c statement_timeout={DATABASE_STATEMENT_TIMEOUT}"
+        }
+    return {}
+
+
+def get_engine_options(
+    database_url: str, stats: PoolStats, is_async: bool = False
+) -> Dict[str, Any]:
+    """
+    Options of create_engine for the database: dialect connect args and the
+    pool. SQLite files open a connection per checkout (NullPool) and
+    in-memory SQLite keeps the default pool, so neither is sized.
+    """
+    url = make_url(database_url)
+    options: Dict[str, Any] = {
+        "echo": get_database_echo(),
+        "connect_args": get_connect_args(url),
+    }
+    if url.get_backend_name() == "sqlite":
+        if not _is_sqlite_memory(url):
+            options["poolclass"] = timed_pool_class(NullPool, stats)
+        return options
+
+    pool_class = AsyncAdaptedQueuePool if is_async else QueuePool
+    options.update(
+        poolclass=timed_pool_class(pool_class, stats),
+        pool_size=DATABASE_POOL_SIZE,
+        max_overflow=DATABASE_MAX_OVERFLOW,
+        pool_timeout=DATABASE_POOL_TIMEOUT,
+        pool_recycle=DATABASE_POOL_RECYCLE,
+        pool_pre_ping=DATABASE_POOL_PRE_PING,
+    )
+    return options
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}")
+    cursor.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
+    cursor.close()
+
+
+def configure_engine(
+    engine: Union[Engine, AsyncEngine], stats: PoolStats
+) -> None:
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if sync_engine.dialect.name == "sqlite":
+        event.listen(sync_engine, "connect", set_sqlite_pragmas)
+    stats.listen(engine)
+
+
+sync_pool_stats = PoolStats("sync")
+async_pool_stats = PoolStats("async")
 
 engine = create_engine(
-    DATABASE_URL,
-    # pool_pre_ping=True,
-    echo=True,
-    connect_args={"check_same_thread": False},  # for sqlite
+    DATABASE_URL, **get_engine_options(DATABASE_URL, sync_pool_stats)
+)
+configure_engine(engine, sync_pool_stats)
+
+_async_database_url = ASYNC_DATABASE_URL or get_async_database_url(
+    DATABASE_URL
 )
+async_engine = create_async_engine(
+    _async_database_url,
+    **get_engine_options(_async_database_url, async_pool_stats, True),
+)
+configure_engine(async_engine, async_pool_stats)
+
+
+def get_pool_metrics() -> List[PoolMetrics]:
+    return [sync_pool_stats.metrics(), async_pool_stats.metrics()]
 
 
 def create_db_and_tables(engine):
+    # the cost table is only a cache of distances: one created before the
+    # metric of each cost was stored is dropped and created again
+    if inspect(engine).has_table("cost"):
+        columns = inspect(engine).get_columns("cost")
+        if "metric" not in {column["name"] for column in columns}:
+            SQLModel.metadata.tables["cost"].drop(engine)
     SQLModel.metadata.create_all(engine)
+    # create_all skips the tables that exist, along with the indexes added
+    # to them later
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
 
 
 def get_session():
@@ -20,4 +294,12 @@ def get_session():
         yield session
 
 
+async def get_async_session():
+    # the response is serialized after the handler returns, so the loaded
+    # objects must not expire (there is no lazy loading in async sessions)
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+
 ActiveSession = Depends(get_session)
+AsyncActiveSession = Depends(get_async_session)
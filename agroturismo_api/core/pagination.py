@@ -0,0 +1,164 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Callable, List, NamedTuple, Optional, Sequence
+
+from fastapi import Depends, HTTPException, Query, Response, status
+from sqlalchemy import literal, tuple_
+from sqlalchemy.sql import Select
+
+from .config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class PageParams(NamedTuple):
+    cursor: Optional[str]
+    limit: int
+
+
+def get_page_params(
+    cursor: Optional[str] = Query(
+        None, description=f"Value of the {NEXT_CURSOR_HEADER} header"
+    ),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+) -> PageParams:
+    return PageParams(cursor, limit)
+
+
+Pagination = Depends(get_page_params)
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"datetime": value.isoformat()}
+    raise TypeError(f"{type(value).__name__} is not allowed in a cursor")
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "datetime" in value:
+        return datetime.fromisoformat(value["datetime"])
+    return value
+
+
+def encode_cursor(key: str, values: Sequence[Any]) -> str:
+    payload = json.dumps(
+        {"key": key, "values": list(values)},
+        default=_encode_value,
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(key: str, cursor: str, size: int) -> List[Any]:
+    """
+    Values of the last row of the previous page. Cursors are opaque to the
+    clients, so anything that was not made by encode_cursor for the same
+    ordering is rejected.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        values = [_decode_value(value) for value in payload["values"]]
+        if payload["key"] != key or len(values) != size:
+            raise ValueError(cursor)
+        return values
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor inválido",
+        )
+
+
+class Keyset:
+    """
+    Ordering of a listing on unique sort keys (the last one is usually the
+    primary key), paginated by the values of the last row instead of an
+    offset: each page is an index range scan, however deep it is, and rows
+    inserted or deleted meanwhile do not shift the pages.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        columns: Sequence[Any],
+        values: Callable[[Any], Sequence[Any]],
+        descending: bool = False,
+    ):
+        self.key = key
+        self.columns = list(columns)
+        self.values = values
+        self.descending = descending
+
+    @classmethod
+    def of(cls, key: str, *columns, descending: bool = False) -> "Keyset":
+        """Keyset on model columns, read back from the rows attributes."""
+        names = [column.key for column in columns]
+        return cls(
+            key,
+            columns,
+            lambda row: [getattr(row, name) for name in names],
+            descending,
+        )
+
+    def apply(self, statement: Select, page: PageParams) -> Select:
+        """
+        Orders the statement by the keys, starting after the cursor, and
+        fetches one row more than the page to know if there is a next one
+        """
+        if page.cursor:
+            values = decode_cursor(self.key, page.cursor, len(self.columns))
+            if len(self.columns) == 1:
+                keys, after = self.columns[0], values[0]
+            else:
+                keys = tuple_(*self.columns)
+                after = tuple_(
+                    *(
+                        literal(value, column.type)
+                        for column, value in zip(self.columns, values)
+                    )
+                )
+            statement = statement.where(
+                keys < after if self.descending else keys > after
+            )
+        ordering = [
+            column.desc() if self.descending else column
+            for column in self.columns
+        ]
+        return statement.order_by(*ordering).limit(page.limit + 1)
+
+    def seek(self, rows: Sequence[Any], page: PageParams) -> List[Any]:
+        """
+        Same as apply, for rows already ordered by the keys in memory (the
+        columns are then only the names of the keys): the rows after the
+        cursor, one more than the page
+        """
+        rows = list(rows)
+        if page.cursor:
+            after = decode_cursor(self.key, page.cursor, len(self.columns))
+            rows = [
+                row
+                for row in rows
+                if (
+                    list(self.values(row)) < after
+                    if self.descending
+                    else list(self.values(row)) > after
+                )
+            ]
+        return rows[: page.limit + 1]
+
+    def page(
+        self, rows: Sequence[Any], page: PageParams, response: Response
+    ) -> List[Any]:
+        """
+        Rows of the page, setting the cursor of the next one in the
+        X-Next-Cursor header when there are more rows
+        """
+        rows = list(rows)
+        if len(rows) > page.limit:
+            rows = rows[: page.limit]
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+                self.key, self.values(rows[-1])
+            )
+        return rows
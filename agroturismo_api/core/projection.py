@@ -0,0 +1,67 @@
+from typing import Any, Dict, List, Optional, Sequence, Type
+
+from fastapi import HTTPException, Query, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ValidationError
+
+FIELDS_QUERY = Query(
+    None,
+    description="Comma separated fields of the response, e.g. id,name,slug",
+)
+
+
+def parse_fields(
+    fields: Optional[str], read_model: Type[BaseModel]
+) -> Optional[List[str]]:
+    """
+    Fields requested with `fields=`, in the order of the read model. None
+    means the whole model.
+    """
+    if not fields:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    invalid = requested - read_model.__fields__.keys()
+    if invalid:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Campos inválidos: {', '.join(sorted(invalid))}",
+        )
+    return [name for name in read_model.__fields__ if name in requested]
+
+
+def project(
+    read_model: Type[BaseModel], rows: Sequence[Any], fields: List[str]
+) -> List[Dict[str, Any]]:
+    """
+    Serializes only `fields` of each row, validated as in the read model.
+    Only these attributes are read, so the others need not be loaded.
+    """
+    model_fields = [read_model.__fields__[name] for name in fields]
+    projected = []
+    for row in rows:
+        values: Dict[str, Any] = {}
+        for field in model_fields:
+            value, errors = field.validate(
+                getattr(row, field.name), values, loc=field.name
+            )
+            if errors:
+                raise ValidationError([errors], read_model)
+            values[field.name] = value
+        projected.append(values)
+    return jsonable_encoder(projected)
+
+
+def projected_response(
+    read_model: Type[BaseModel],
+    rows: Sequence[Any],
+    fields: List[str],
+    response: Response,
+) -> JSONResponse:
+    """
+    Response with the projected rows, bypassing the response_model (which
+    requires every field) and keeping the headers set by the route
+    """
+    return JSONResponse(
+        project(read_model, rows, fields), headers=dict(response.headers)
+    )
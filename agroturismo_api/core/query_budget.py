@@ -0,0 +1,81 @@
+from typing import Dict, List, NamedTuple
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from ..models.local import Local
+from ..utils import QueryCounter
+from .config import API_PREFIX
+from .db import async_engine, engine
+
+# Maximum number of queries of each endpoint, whatever the number of rows.
+# With an N+1 regression the count grows with the rows in the response and
+# goes over the budget. {local_id}, {slug} and {ids} are filled with rows
+# from the database.
+QUERY_BUDGETS: Dict[str, int] = {
+    f"{API_PREFIX}/locals/": 4,
+    f"{API_PREFIX}/locals/?{{ids}}": 4,
+    f"{API_PREFIX}/locals/{{local_id}}": 4,
+    f"{API_PREFIX}/locals/find-by-slug/{{slug}}": 4,
+    f"{API_PREFIX}/locals/?search=a": 5,
+    f"{API_PREFIX}/locals/?fields=id,name,slug,latitude,longitude": 1,
+    f"{API_PREFIX}/locals/nearby?latitude=-20.5&longitude=-40.5"
+    "&radius=50": 5,
+    f"{API_PREFIX}/search/?query=a": 8,
+    f"{API_PREFIX}/reviews/": 1,
+    f"{API_PREFIX}/itineraries/public": 1,
+    # with an empty distance cache, the missing pairs are saved in a single
+    # batched insert
+    f"{API_PREFIX}/algorithms/guided-local-search?mode=heuristic&{{ids}}"
+    "&time_limit=1": 6,
+}
+
+MAX_ROUTE_LOCALS = 5
+
+
+class QueryCount(NamedTuple):
+    path: str
+    status_code: int
+    queries: int
+    budget: int
+
+    @property
+    def ok(self) -> bool:
+        return self.queries <= self.budget
+
+    def __str__(self) -> str:
+        result = "ok" if self.ok else "OVER BUDGET"
+        return (
+            f"{self.path}: {self.queries} queries (budget {self.budget}, "
+            f"status {self.status_code}) {result}"
+        )
+
+
+def check_query_budgets(
+    app: FastAPI, budgets: Dict[str, int] = QUERY_BUDGETS
+) -> List[QueryCount]:
+    """
+    Request each endpoint once and count its queries. Needs at least one
+    local in the database; the more rows, the more an N+1 stands out.
+    """
+    with Session(engine) as session:
+        locals = session.exec(select(Local).limit(MAX_ROUTE_LOCALS)).all()
+    if not locals:
+        raise ValueError("Query budgets need at least one local")
+    values = {
+        "local_id": locals[0].id,
+        "slug": locals[0].slug,
+        "ids": "&".join(f"ids={local.id}" for local in locals),
+    }
+
+    counts = []
+    with TestClient(app) as client:
+        for path, budget in budgets.items():
+            path = path.format(**values)
+            with QueryCounter(engine, async_engine) as counter:
+                response = client.get(path)
+            counts.append(
+                QueryCount(path, response.status_code, counter.count, budget)
+            )
+    return counts
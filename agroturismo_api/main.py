@@ -1,15 +1,35 @@
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.staticfiles import StaticFiles
 
 from .core.config import (
     API_PREFIX,
     APP_DESCRIPTION,
     APP_NAME,
     APP_VERSION,
+    AUTOCOMPLETE_REFRESH_INTERVAL,
+    IMAGE_UPLOAD_BACKEND,
+    IMAGE_UPLOAD_DIR,
+    IMAGE_UPLOAD_URL,
     IS_DEBUG,
 )
-from .core.db import create_db_and_tables, engine
+from .core.db import async_engine, create_db_and_tables, engine
+from .core.pagination import NEXT_CURSOR_HEADER
 from .routes import main_router
+from .routes.algorithm import (
+    ROUTE_OPTIMALITY_GAP_HEADER,
+    ROUTE_SOLVER_HEADER,
+    ROUTE_VISIT_TIMES_HEADER,
+)
+from .services.autocomplete import autocomplete_index
+from .services.image_upload import LocalUploader, image_ingest
+from .services.password_hasher import password_hasher
+from .services.route_jobs import route_job_runner
+from .services.routing_provider import routing_provider
+from .services.solver_pool import solver_pool
+from .services.text_search import text_search_index
 
 origins = [
     "http://localhost",
@@ -27,6 +47,12 @@ def get_app() -> FastAPI:
         debug=IS_DEBUG,
     )
     fast_app.include_router(main_router, prefix=API_PREFIX)
+    if IMAGE_UPLOAD_BACKEND == LocalUploader.name:
+        fast_app.mount(
+            IMAGE_UPLOAD_URL,
+            StaticFiles(directory=IMAGE_UPLOAD_DIR, check_dir=False),
+            name="uploads",
+        )
 
     fast_app.add_middleware(
         CORSMiddleware,
@@ -34,6 +60,13 @@ def get_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=[
+            ROUTE_SOLVER_HEADER,
+            ROUTE_OPTIMALITY_GAP_HEADER,
+            ROUTE_VISIT_TIMES_HEADER,
+            NEXT_CURSOR_HEADER,
+            "ETag",
+        ],
     )
 
     return fast_app
@@ -42,6 +75,29 @@ def get_app() -> FastAPI:
 app = get_app()
 
 
+background_tasks = set()
+
+
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     create_db_and_tables(engine)
+    text_search_index.setup(engine)
+    with engine.connect() as connection:
+        autocomplete_index.build(connection)
+    if AUTOCOMPLETE_REFRESH_INTERVAL > 0:
+        task = asyncio.create_task(
+            autocomplete_index.refresh_periodically(engine)
+        )
+        background_tasks.add(task)
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    for task in background_tasks:
+        task.cancel()
+    solver_pool.shutdown()
+    route_job_runner.shutdown()
+    image_ingest.shutdown()
+    password_hasher.shutdown()
+    await routing_provider.aclose()
+    await async_engine.dispose()
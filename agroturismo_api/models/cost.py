@@ -10,6 +10,9 @@ class CostBase(SQLModel):
     local_destination_id: Optional[int] = Field(
         default=None, foreign_key="local.id", primary_key=True
     )
+    # source of the values ("haversine", "osrm:driving"...), so that the
+    # straight-line and the road costs of a pair are never mixed
+    metric: str = Field(default="haversine", primary_key=True)
     distance: float = Field(default=None)  # in km
     duration: int = Field(default=None)  # in minutes
 
@@ -2,7 +2,7 @@ from typing import TYPE_CHECKING, Optional
 
 from sqlmodel import Field, Relationship, SQLModel
 
-from .image import Image
+from .image import Image, ImageGalleryRead
 
 if TYPE_CHECKING:
     from .local import Local
@@ -30,4 +30,4 @@ class GalleryLocalCreate(GalleryLocalBase):
 
 
 class GalleryLocalRead(GalleryLocalBase):
-    image: Optional[Image] = None
+    image: Optional[ImageGalleryRead] = None
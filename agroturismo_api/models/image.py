@@ -1,7 +1,9 @@
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, List, Optional
 
 from sqlmodel import Field, Relationship, SQLModel
 
+from .image_variant import ImageVariant, ImageVariantRead
+
 if TYPE_CHECKING:
     from .gallery_local import GalleryLocal
 
@@ -18,7 +20,21 @@ class Image(ImageBase, table=True):
     public_id: str
 
     gallery: Optional["GalleryLocal"] = Relationship(back_populates="image")
+    variants: List[ImageVariant] = Relationship(
+        back_populates="image",
+        sa_relationship_kwargs={
+            "cascade": "all, delete-orphan",
+            "order_by": "ImageVariant.width",
+        },
+    )
 
 
 class ImageRead(ImageBase):
     pass
+
+
+class ImageGalleryRead(ImageBase):
+    id: int
+    public_id: str
+    # resized copies, from the smallest, and the blur placeholder
+    variants: List[ImageVariantRead] = []
@@ -0,0 +1,29 @@
+from typing import TYPE_CHECKING, Optional
+
+from sqlmodel import Field, Relationship, SQLModel
+
+if TYPE_CHECKING:
+    from .image import Image
+
+
+class ImageVariantBase(SQLModel):
+    format: str  # webp or jpeg
+    width: int
+    height: int
+    url: str  # a data URI in the placeholder
+    size: int  # in bytes
+    placeholder: bool = Field(default=False)
+
+
+class ImageVariant(ImageVariantBase, table=True):
+    __tablename__ = "image_variant"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    image_id: int = Field(foreign_key="image.id", index=True)
+    public_id: Optional[str] = None
+
+    image: Optional["Image"] = Relationship(back_populates="variants")
+
+
+class ImageVariantRead(ImageVariantBase):
+    pass
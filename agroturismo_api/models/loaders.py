@@ -0,0 +1,23 @@
+from sqlalchemy.orm import joinedload, selectinload
+
+from .gallery_local import GalleryLocal
+from .image import Image
+from .local import Local
+
+# Loader profiles: the relationships serialized by each read model, loaded
+# along with the rows. Without them every row triggers more SELECTs while
+# the response is serialized (N+1), and async sessions can't load them at
+# all. Many-to-one relationships are joined, collections use selectin.
+
+GALLERY_LOCAL_READ_OPTIONS = (
+    joinedload(GalleryLocal.image).selectinload(Image.variants),
+)
+
+# by relationship, for the responses projected with `fields=`
+LOCAL_RELATIONSHIP_OPTIONS = {
+    "main_category": joinedload(Local.main_category),
+    "images": selectinload(Local.images).options(*GALLERY_LOCAL_READ_OPTIONS),
+    "tags": selectinload(Local.tags),
+}
+
+LOCAL_READ_OPTIONS = tuple(LOCAL_RELATIONSHIP_OPTIONS.values())
@@ -1,5 +1,6 @@
 from typing import TYPE_CHECKING, List, Optional
 
+from sqlalchemy import Index
 from sqlmodel import Field, Relationship, SQLModel
 
 from .category import Category
@@ -24,6 +25,12 @@ class LocalBase(SQLModel):
 
 
 class Local(LocalBase, table=True):
+    # bounding box of the nearby search: a range on latitude, filtered by
+    # longitude in the index itself
+    __table_args__ = (
+        Index("ix_local_latitude_longitude", "latitude", "longitude"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
 
     main_category: Optional[Category] = Relationship(back_populates="locals")
@@ -41,3 +48,7 @@ class LocalRead(LocalBase):
     main_category: Optional[Category] = None
     images: List[GalleryLocalRead] = []
     tags: List[TagRead] = []
+
+
+class LocalNearbyRead(LocalRead):
+    distance: float  # in km
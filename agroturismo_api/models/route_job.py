@@ -0,0 +1,71 @@
+import enum
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import JSON, Column
+from sqlmodel import Field, SQLModel
+
+
+class RouteAlgorithm(str, enum.Enum):
+    guided_local_search: str = "guided-local-search"
+    tabu_search: str = "tabu-search"
+
+
+class RouteMode(str, enum.Enum):
+    auto: str = "auto"  # exact solver for few stops, heuristic otherwise
+    heuristic: str = "heuristic"
+
+
+class RouteJobStatus(str, enum.Enum):
+    pending: str = "pending"
+    running: str = "running"
+    done: str = "done"
+    failed: str = "failed"
+    cancelled: str = "cancelled"
+
+
+class RouteParameters(SQLModel):
+    max_iterations: int = Field(default=100, gt=0)
+    max_no_improv: int = Field(default=50, gt=0)
+    alpha: float = Field(default=0.3, ge=0, le=1)  # guided-local-search
+    tabu_tenure: int = Field(default=10, gt=0)  # tabu-search
+    time_limit: Optional[float] = Field(default=None, gt=0)  # in seconds
+    mode: RouteMode = RouteMode.auto
+
+
+class RouteJobBase(SQLModel):
+    algorithm: RouteAlgorithm
+    local_ids: List[int] = Field(sa_column=Column(JSON, nullable=False))
+
+
+class RouteJob(RouteJobBase, table=True):
+    __tablename__ = "route_job"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    parameters: Dict[str, Any] = Field(sa_column=Column(JSON, nullable=False))
+    key: str = Field(unique=True, index=True)  # hash of ids and parameters
+    status: RouteJobStatus = Field(default=RouteJobStatus.pending)
+    result: Optional[List[int]] = Field(default=None, sa_column=Column(JSON))
+    cost: Optional[float] = None
+    solver: Optional[str] = None
+    optimality_gap: Optional[float] = None
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.now)
+    finished_at: Optional[datetime] = None
+
+
+class RouteJobCreate(RouteJobBase):
+    parameters: RouteParameters = RouteParameters()
+
+
+class RouteJobRead(RouteJobBase):
+    id: int
+    parameters: RouteParameters
+    status: RouteJobStatus
+    result: Optional[List[int]] = None
+    cost: Optional[float] = None
+    solver: Optional[str] = None
+    optimality_gap: Optional[float] = None
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
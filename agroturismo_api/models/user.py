@@ -3,7 +3,16 @@ from typing import Optional
 from passlib.context import CryptContext
 from sqlmodel import Field, SQLModel
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from ..core.config import PASSWORD_BCRYPT_ROUNDS
+
+# hashes with other rounds need an update, so they are redone at the login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=PASSWORD_BCRYPT_ROUNDS,
+    bcrypt__min_rounds=PASSWORD_BCRYPT_ROUNDS,
+    bcrypt__max_rounds=PASSWORD_BCRYPT_ROUNDS,
+)
 
 
 class HashedPassword(str):
@@ -27,6 +36,9 @@ class HashedPassword(str):
     @classmethod
     def validate(cls, v):
         """Accepts a plain text password and returns a hashed password."""
+        if isinstance(v, cls):
+            # already hashed, e.g. by the password hasher off the event loop
+            return v
         if not isinstance(v, str):
             raise TypeError("string required")
 
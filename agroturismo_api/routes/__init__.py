@@ -3,11 +3,13 @@ from fastapi import APIRouter
 from .admin_user import router as admin_user_router
 from .algorithm import router as algorithm_router
 from .category import router as category_router
+from .database import router as database_router
 from .image import router as image_router
 from .itinerary import router as itinerary_router
 from .local import router as local_router
 from .opening_hours import router as opening_hours_router
 from .review import router as review_router
+from .route_job import router as route_job_router
 from .search import router as search_router
 from .security import router as security_router
 from .special_opening_hours import router as special_opening_hours_router
@@ -34,6 +36,12 @@ main_router.include_router(
 )
 main_router.include_router(tag_router, prefix="/tags", tags=["Tags"])
 main_router.include_router(algorithm_router, prefix="/algorithms", tags=["Algorithms"])
+main_router.include_router(
+    route_job_router, prefix="/algorithms/jobs", tags=["Algorithms"]
+)
 main_router.include_router(search_router, prefix="/search", tags=["Search"])
 main_router.include_router(admin_user_router, prefix="/admins", tags=["Admins"])
+main_router.include_router(
+    database_router, prefix="/database", tags=["Database"]
+)
 main_router.include_router(security_router, tags=["Auth"])
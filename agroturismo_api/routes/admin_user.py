@@ -6,6 +6,7 @@ from sqlmodel import Session, select
 from ..core.db import ActiveSession
 from ..models.admin_user import AdminUser, AdminUserCreate, AdminUserRead
 from ..security import validate_username
+from ..services.password_hasher import password_hasher
 
 router = APIRouter()
 
@@ -22,9 +23,12 @@ async def list_admin_users(*, session: Session = ActiveSession):
 async def create_admin_user(
     *, admin_user_to_save: AdminUserCreate, session: Session = ActiveSession
 ):
-    validate_username(admin_user_to_save.username)
+    validate_username(admin_user_to_save.username, session)
 
-    admin_user = AdminUser(**admin_user_to_save.dict())
+    admin_user = AdminUser(
+        **admin_user_to_save.dict(exclude={"password"}),
+        password=await password_hasher.hash(admin_user_to_save.password),
+    )
     session.add(admin_user)
     session.commit()
     session.refresh(admin_user)
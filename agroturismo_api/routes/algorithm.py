@@ -1,109 +1,335 @@
-from typing import List, Tuple
-
-from fastapi import APIRouter, HTTPException, Query, status
-from sqlmodel import Session, case
+from datetime import date
+from typing import List, Optional, Tuple
 
 import numpy as np
 
-from python_tsp.distances import osrm_distance_matrix
-from python_tsp.heuristics import solve_tsp_local_search
+from fastapi import APIRouter, HTTPException, Query, Response, status
+from sqlmodel import Session
 
+from ..core.config import (
+    HELD_KARP_MAX_STOPS,
+    SOLVER_TIME_LIMIT,
+    VISIT_DURATION,
+)
 from ..core.db import ActiveSession
 from ..models.local import Local, LocalRead
-from ..services.algorithms import guided_local_search, tabu_search
+from ..models.route_job import RouteAlgorithm, RouteMode, RouteParameters
+from ..security import AuthenticatedAdminSuperUser
+from ..services.distance_cache import DistanceCache
+from ..services.route_cache import CachedRoute, route_cache
+from ..services.algorithms import solve_tsptw
+from ..services.routing import get_route_locals, solve_route
+from ..services.routing_provider import (
+    UNREACHABLE_DURATION,
+    has_unreachable_leg,
+    routing_provider,
+)
+from ..services.solver_pool import (
+    SolverPoolMetrics,
+    solve_tsp_local_search_with_time_limit,
+    solver_pool,
+)
+from ..services.time_windows import (
+    format_time,
+    load_opening_intervals,
+    parse_time,
+    travel_times,
+)
 
 router = APIRouter()
 
+# Informam qual solver calculou a rota e a distância para o ótimo
+ROUTE_SOLVER_HEADER = "X-Route-Solver"
+ROUTE_OPTIMALITY_GAP_HEADER = "X-Route-Optimality-Gap"
+# Horário de início de cada visita, na ordem da rota
+ROUTE_VISIT_TIMES_HEADER = "X-Route-Visit-Times"
 
-def get_coords(ids: List[int], session: Session) -> List[Tuple[float, float]]:
-    """
-    Função que obtém as coordenadas de uma lista de IDs de locais
-    """
-    coords = []
-    for id in ids:
-        local = session.get(Local, id)
-        if not local:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Local não encontrado",
-            )
-        coords.append((local.latitude, local.longitude))
-    return coords
+NO_ROUTE_DETAIL = "Não há rota por estrada entre todos os locais"
 
+TIME_REGEX = r"^([01]\d|2[0-3]):[0-5]\d$"
 
-@router.get("/guided-local-search", response_model=List[LocalRead])
-async def calculate_best_route_guided_local_search(
-    *, ids: List[int] = Query(None), session: Session = ActiveSession
-):
+
+def set_route_headers(response: Response, route: CachedRoute) -> None:
+    response.headers[ROUTE_SOLVER_HEADER] = route.solver
+    response.headers[ROUTE_OPTIMALITY_GAP_HEADER] = (
+        f"{route.optimality_gap:.6f}"
+    )
+
+
+def get_start_point(
+    latitude: Optional[float], longitude: Optional[float]
+) -> Optional[Tuple[float, float]]:
+    if latitude is None and longitude is None:
+        return None
+    if latitude is None or longitude is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Informe a latitude e a longitude do ponto de partida",
+        )
+    return latitude, longitude
+
+
+async def calculate_cached_route(
+    algorithm: RouteAlgorithm,
+    ids: List[int],
+    parameters: RouteParameters,
+    time_limit: Optional[float],
+    session: Session,
+    response: Response,
+    start_point: Optional[Tuple[float, float]] = None,
+    end_id: Optional[int] = None,
+) -> List[Local]:
     """
-    Função que calcula o TSP para uma lista de IDs de locais
+    Função que calcula a rota com o algoritmo dado, reaproveitando a rota
+    já calculada para o mesmo conjunto de locais e parâmetros
+
+    Com `start_point`, a rota é um caminho aberto que sai desse ponto (e
+    termina no local `end_id`, se informado) sem voltar ao início. O solver
+    usado e o gap de otimalidade são informados nos cabeçalhos da resposta.
     """
     if ids is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="IDs não informados",
         )
+    if end_id is not None and (start_point is None or end_id not in ids):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="O local de chegada deve estar entre os IDs e exige um "
+            "ponto de partida",
+        )
 
-    # Obtém as coordenadas dos locais
-    coords = get_coords(ids, session)
+    # Rota em cache: não é preciso calcular distâncias nem rodar o solver
+    cache_key = route_cache.make_key(
+        algorithm, ids, parameters, start_point, end_id
+    )
+    route = route_cache.get(cache_key)
+    if route is not None:
+        set_route_headers(response, route)
+        locals, _ = get_route_locals(route.local_ids, session)
+        return locals
+
+    generation = route_cache.generation
+
+    # Obtém os locais e as suas coordenadas, na ordem dos IDs
+    locals, coords = get_route_locals(ids, session)
+
+    # O ponto de partida entra como o ponto 0, fora do cache de distâncias
+    start = end = None
+    point_ids = ids
+    if start_point is not None:
+        coords = np.vstack([start_point, coords])
+        point_ids = [None, *ids]
+        start = 0
+        if end_id is not None:
+            end = point_ids.index(end_id)
+
+    # Obtém as distâncias do cache, calculando apenas os pares que faltam
+    dist_matrix = DistanceCache(session).get_matrix(point_ids, coords)
+
+    # Resolvendo o problema do caixeiro viajante de forma exata ou com a
+    # meta-heurística (em um processo do pool, para não bloquear o event loop)
+    solution = await solve_route(
+        solver_pool,
+        algorithm,
+        coords,
+        dist_matrix,
+        parameters,
+        time_limit or SOLVER_TIME_LIMIT,
+        start=start,
+        end=end,
+    )
 
-    # Definindo os parâmetros da meta-heurística
-    max_iterations = 100
-    max_no_improv = 50
-    alpha = 0.3
-    beta = 0.99
-
-    # Resolvendo o problema do caixeiro viajante com a meta-heurística GLS
-    best_solution, best_cost = guided_local_search(
-        coords, max_iterations, max_no_improv, alpha, beta
+    # O ponto de partida não é um local e fica fora da resposta
+    tour = solution.tour if start is None else solution.tour[1:]
+    offset = len(point_ids) - len(ids)
+    route = CachedRoute(
+        [point_ids[i] for i in tour],
+        solution.solver,
+        solution.optimality_gap,
     )
+    route_cache.put(cache_key, route, generation)
+    set_route_headers(response, route)
+
+    # Retorna a lista de locais ordenados
+    return [locals[i - offset] for i in tour]
 
-    print("### Guided Local Search", best_cost, best_solution)
 
-    locals_ids = [ids[i] for i in best_solution]
+@router.get("/guided-local-search", response_model=List[LocalRead])
+async def calculate_best_route_guided_local_search(
+    *,
+    ids: List[int] = Query(None),
+    time_limit: Optional[float] = Query(None, gt=0, le=SOLVER_TIME_LIMIT),
+    mode: RouteMode = Query(RouteMode.auto),
+    current_latitude: Optional[float] = Query(None, ge=-90, le=90),
+    current_longitude: Optional[float] = Query(None, ge=-180, le=180),
+    end_id: Optional[int] = None,
+    session: Session = ActiveSession,
+    response: Response,
+):
+    """
+    Função que calcula o TSP para uma lista de IDs de locais
 
-    # seleciona os locais ordenados
-    locals = session.query(Local).filter(Local.id.in_(locals_ids)).all()
+    Com a localização atual, calcula o caminho que sai dela sem voltar ao
+    início, terminando no local `end_id`, se informado.
+    """
+    # Definindo os parâmetros da meta-heurística
+    parameters = RouteParameters(
+        max_iterations=100, max_no_improv=50, alpha=0.3, mode=mode
+    )
 
-    # Retorna a lista de locais ordenados
-    return locals
+    return await calculate_cached_route(
+        RouteAlgorithm.guided_local_search,
+        ids,
+        parameters,
+        time_limit,
+        session,
+        response,
+        get_start_point(current_latitude, current_longitude),
+        end_id,
+    )
 
 
 @router.get("/tabu-search", response_model=List[LocalRead])
 async def calculate_best_route_tabu_search(
-    *, ids: List[int] = Query(None), session: Session = ActiveSession
+    *,
+    ids: List[int] = Query(None),
+    time_limit: Optional[float] = Query(None, gt=0, le=SOLVER_TIME_LIMIT),
+    mode: RouteMode = Query(RouteMode.auto),
+    current_latitude: Optional[float] = Query(None, ge=-90, le=90),
+    current_longitude: Optional[float] = Query(None, ge=-180, le=180),
+    end_id: Optional[int] = None,
+    session: Session = ActiveSession,
+    response: Response,
 ):
     """
     Função que calcula o TSP para uma lista de IDs de locais
+
+    Com a localização atual, calcula o caminho que sai dela sem voltar ao
+    início, terminando no local `end_id`, se informado.
+    """
+    # Definindo os parâmetros da meta-heurística
+    parameters = RouteParameters(
+        max_iterations=100, max_no_improv=50, tabu_tenure=10, mode=mode
+    )
+
+    return await calculate_cached_route(
+        RouteAlgorithm.tabu_search,
+        ids,
+        parameters,
+        time_limit,
+        session,
+        response,
+        get_start_point(current_latitude, current_longitude),
+        end_id,
+    )
+
+
+@router.get("/time-windows", response_model=List[LocalRead])
+async def calculate_route_time_windows(
+    *,
+    ids: List[int] = Query(None),
+    visit_date: date,
+    start_time: str = Query("08:00", regex=TIME_REGEX),
+    visit_duration: int = Query(VISIT_DURATION, ge=0, le=24 * 60),
+    current_latitude: Optional[float] = Query(None, ge=-90, le=90),
+    current_longitude: Optional[float] = Query(None, ge=-180, le=180),
+    end_id: Optional[int] = None,
+    time_limit: Optional[float] = Query(None, gt=0, le=SOLVER_TIME_LIMIT),
+    session: Session = ActiveSession,
+    response: Response,
+):
+    """
+    Função que calcula a rota que visita os locais dentro dos seus horários
+    de funcionamento em `visit_date`, saindo às `start_time` e passando
+    `visit_duration` minutos em cada local
+
+    Os horários de início das visitas são informados no cabeçalho
+    X-Route-Visit-Times.
     """
     if ids is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="IDs não informados",
         )
+    if end_id is not None and end_id not in ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="O local de chegada deve estar entre os IDs",
+        )
 
-    # Obtém as coordenadas dos locais
-    coords = get_coords(ids, session)
-
-    # Definindo os parâmetros da meta-heurística
-    max_iterations = 100
-    max_no_improv = 50
-    tabu_tenure = 10
+    # Obtém os locais e as suas coordenadas, na ordem dos IDs
+    locals, coords = get_route_locals(ids, session)
+
+    # Horários de funcionamento de todos os locais na data, de uma só vez
+    opens, closes = load_opening_intervals(session, ids, visit_date)
+    closed = [
+        local.name
+        for local, local_closes in zip(locals, closes)
+        if np.all(local_closes == -np.inf)
+    ]
+    if closed:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Locais fechados na data: " + ", ".join(closed),
+        )
 
-    # Resolvendo o problema do caixeiro viajante com a meta-heurística TS
-    best_solution, best_cost = tabu_search(
-        coords, max_iterations, max_no_improv, tabu_tenure
+    # Tempos de deslocamento a partir do cache de custos (Cost.duration),
+    # consultando no provedor de rotas apenas os pares que faltam; o ponto 0
+    # é a localização atual ou, sem ela, um ponto sem deslocamento
+    start_point = get_start_point(current_latitude, current_longitude)
+    point_ids, points = ids, coords
+    if start_point is not None:
+        point_ids, points = [None, *ids], np.vstack([start_point, coords])
+    distances, durations = await DistanceCache(session).get_matrices_async(
+        point_ids,
+        points,
+        routing_provider,
+        require_duration=routing_provider.provides_durations,
+    )
+    travel = travel_times(distances, durations)
+    if start_point is None:
+        travel = np.pad(travel, ((1, 0), (1, 0)))
+
+    # O ponto 0 fica sempre aberto e não tem visita
+    opens = np.vstack([np.full(opens.shape[1], np.inf), opens])
+    closes = np.vstack([np.full(closes.shape[1], -np.inf), closes])
+    opens[0, 0], closes[0, 0] = 0, np.inf
+    service = np.full(len(ids) + 1, float(visit_duration))
+    service[0] = 0
+
+    solution = await solver_pool.run(
+        solve_tsptw,
+        travel,
+        opens,
+        closes,
+        service,
+        parse_time(start_time),
+        end=None if end_id is None else ids.index(end_id) + 1,
+        held_karp_max_stops=HELD_KARP_MAX_STOPS,
+        time_limit=time_limit or SOLVER_TIME_LIMIT,
     )
 
-    print("### Tabu Search", best_cost, best_solution)
-
-    locals_ids = [ids[i] for i in best_solution]
+    if has_unreachable_leg(travel, solution.tour, UNREACHABLE_DURATION):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=NO_ROUTE_DETAIL,
+        )
+    if solution.late_points:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Não foi possível visitar todos os locais no horário de "
+            "funcionamento: "
+            + ", ".join(locals[i - 1].name for i in solution.late_points),
+        )
 
-    # seleciona os locais ordenados
-    locals = session.query(Local).filter(Local.id.in_(locals_ids)).all()
+    response.headers[ROUTE_SOLVER_HEADER] = solution.solver
+    response.headers[ROUTE_VISIT_TIMES_HEADER] = ",".join(
+        format_time(minutes) for minutes in solution.start_times[1:]
+    )
 
     # Retorna a lista de locais ordenados
-    return locals
+    return [locals[i - 1] for i in solution.tour[1:]]
 
 
 @router.get("/tsp", response_model=List[LocalRead])
@@ -112,6 +338,7 @@ async def calculate_tsp_route(
     current_latitude: float,
     current_longitude: float,
     ids: List[int] = Query(None),
+    time_limit: Optional[float] = Query(None, gt=0, le=SOLVER_TIME_LIMIT),
     session: Session = ActiveSession
 ):
     """
@@ -125,34 +352,46 @@ async def calculate_tsp_route(
 
     start_point = (current_latitude, current_longitude)
 
-    # Obtém as coordenadas dos locais
-    coords = get_coords(ids, session)
+    # Obtém os locais e as suas coordenadas, na ordem dos IDs
+    locals, coords = get_route_locals(ids, session)
 
     # Adiciona a coordenada atual no início da lista
-    coords.insert(0, start_point)
-    sources = np.array(coords)
+    coords = [start_point, *map(tuple, coords)]
+
+    # Consulta no provedor de rotas apenas os pares que ainda não estão no
+    # cache
+    distance_matrix, _ = await DistanceCache(session).get_matrices_async(
+        [None, *ids],
+        coords,
+        routing_provider,
+        require_duration=routing_provider.provides_durations,
+    )
 
-    distance_matrix = osrm_distance_matrix(
-        sources, osrm_server_address="https://router.project-osrm.org"
+    permutation, distance = await solver_pool.run(
+        solve_tsp_local_search_with_time_limit,
+        distance_matrix,
+        time_limit=time_limit or SOLVER_TIME_LIMIT,
     )
 
-    permutation, distance = solve_tsp_local_search(distance_matrix)
+    if has_unreachable_leg(distance_matrix, permutation):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=NO_ROUTE_DETAIL,
+        )
 
     permutation = list(map(lambda i: (i - 1), permutation[1:]))
-    locals_ids = [ids[i] for i in permutation]
-
-    ordering = case(
-        {_id: index for index, _id in enumerate(locals_ids)},
-        value=Local.id,
-    ) if locals_ids else Local.id
-
-    # seleciona os locais
-    locals = (
-        session.query(Local)
-        .filter(Local.id.in_(locals_ids))
-        .order_by(ordering)
-        .all()
-    )
 
     # Retorna a lista de locais ordenados
-    return locals
+    return [locals[i] for i in permutation]
+
+
+@router.get(
+    "/metrics",
+    response_model=SolverPoolMetrics,
+    dependencies=[AuthenticatedAdminSuperUser],
+)
+async def get_solver_metrics():
+    """
+    Métricas do pool de processos que executa os solvers
+    """
+    return solver_pool.metrics()
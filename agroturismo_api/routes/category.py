@@ -1,36 +1,63 @@
 from typing import List
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Request, Response, status
 from sqlmodel import Session, select
 
 from ..core.db import ActiveSession
+from ..core.pagination import Keyset, PageParams, Pagination
 from ..models.category import Category, CategoryCreate, CategoryRead
+from ..services.response_cache import response_cache
 
 router = APIRouter()
 
+CATEGORY_KEYSET = Keyset.of("id", Category.id)
+
 
 @router.get("/", response_model=List[CategoryRead])
-def list_categories(*, session: Session = ActiveSession):
+def list_categories(
+    *,
+    request: Request,
+    response: Response,
+    page: PageParams = Pagination,
+    session: Session = ActiveSession,
+):
     """
-    List all categories
+    List the categories, a page at a time
     """
-    categories = session.exec(select(Category)).all()
-    return categories
+    if cached := response_cache.lookup(request):
+        return cached
+    categories = session.exec(
+        CATEGORY_KEYSET.apply(select(Category), page)
+    ).all()
+    categories = CATEGORY_KEYSET.page(categories, page, response)
+    return response_cache.respond(
+        request, List[CategoryRead], categories, {("categories",)}, response
+    )
 
 
 @router.get("/{id}", response_model=CategoryRead)
-def get_category_by_id(*, id: int, session: Session = ActiveSession):
+def get_category_by_id(
+    *, id: int, request: Request, session: Session = ActiveSession
+):
+    if cached := response_cache.lookup(request):
+        return cached
     category = session.exec(select(Category).where(Category.id == id)).first()
     if not category:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Categoria não encontrada",
         )
-    return category
+    return response_cache.respond(
+        request, CategoryRead, category, {("category", category.id)}
+    )
 
 
 @router.get("/find-by-slug/{slug}", response_model=CategoryRead)
-def find_category_by_slug(*, slug: str, session: Session = ActiveSession):
+def find_category_by_slug(
+    *, slug: str, request: Request, session: Session = ActiveSession
+):
+    if cached := response_cache.lookup(request):
+        return cached
     category = session.exec(
         select(Category).where(Category.slug == slug)
     ).first()
@@ -39,7 +66,9 @@ def find_category_by_slug(*, slug: str, session: Session = ActiveSession):
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Categoria não encontrada",
         )
-    return category
+    return response_cache.respond(
+        request, CategoryRead, category, {("category", category.id)}
+    )
 
 
 @router.post(
@@ -73,7 +102,7 @@ def update_category(
     *,
     category_to_update: CategoryCreate,
     id: int,
-    session: Session = ActiveSession
+    session: Session = ActiveSession,
 ):
     category = session.exec(select(Category).where(Category.id == id)).first()
     if not category:
@@ -97,7 +126,7 @@ def replace_category(
     *,
     category_to_replace: CategoryCreate,
     id: int,
-    session: Session = ActiveSession
+    session: Session = ActiveSession,
 ):
     category = session.exec(select(Category).where(Category.id == id)).first()
     if not category:
@@ -0,0 +1,20 @@
+from typing import List
+
+from fastapi import APIRouter
+
+from ..core.db import PoolMetrics, get_pool_metrics
+from ..security import AuthenticatedAdminSuperUser
+
+router = APIRouter()
+
+
+@router.get(
+    "/metrics",
+    response_model=List[PoolMetrics],
+    dependencies=[AuthenticatedAdminSuperUser],
+)
+async def get_database_metrics():
+    """
+    Métricas dos pools de conexões com o banco de dados
+    """
+    return get_pool_metrics()
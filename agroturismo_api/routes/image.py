@@ -1,27 +1,15 @@
-import cloudinary
-import cloudinary.api
-import cloudinary.uploader
+import asyncio
+
 from fastapi import APIRouter, HTTPException, status
 from sqlmodel import Session, select
 
-from ..core.config import (
-    CLOUDINARY_API_KEY,
-    CLOUDINARY_API_SECRET,
-    CLOUDINARY_CLOUD_NAME,
-)
 from ..core.db import ActiveSession
 from ..models.gallery_local import GalleryLocal
 from ..models.image import Image
+from ..services.image_upload import image_ingest
 
 router = APIRouter()
 
-cloudinary.config(
-    cloud_name=CLOUDINARY_CLOUD_NAME,
-    api_key=CLOUDINARY_API_KEY,
-    api_secret=CLOUDINARY_API_SECRET,
-    secure=True,
-)
-
 
 @router.delete("/{image_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_image(*, image_id: int, session: Session = ActiveSession):
@@ -36,9 +24,13 @@ async def delete_image(*, image_id: int, session: Session = ActiveSession):
             detail="Imagem não encontrada",
         )
 
-    cloudinary_response = cloudinary.uploader.destroy(image.public_id)
-
-    print(cloudinary_response)
+    public_ids = {image.public_id}
+    public_ids.update(
+        variant.public_id for variant in image.variants if variant.public_id
+    )
+    await asyncio.gather(
+        *(image_ingest.delete(public_id) for public_id in public_ids)
+    )
 
     session.delete(gallery)
     session.delete(image)
@@ -1,9 +1,12 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, HTTPException, Query, status
+from fastapi import APIRouter, HTTPException, Query, Response, status
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from ..core.db import ActiveSession
+from ..core.config import MAX_PAGE_SIZE
+from ..core.db import ActiveSession, AsyncActiveSession
+from ..core.pagination import Keyset, PageParams
 from ..models.itinerary import Itinerary, ItineraryCreate, ItineraryRead
 from ..models.itinerary_local import ItineraryLocal
 from ..models.local import Local
@@ -12,6 +15,8 @@ from ..security import AuthenticatedTouristUser
 
 router = APIRouter()
 
+ITINERARY_KEYSET = Keyset.of("id", Itinerary.id)
+
 
 @router.post(
     "/",
@@ -77,26 +82,30 @@ async def delete_itinerary(*, id: int, session: Session = ActiveSession):
 @router.get("/public", response_model=List[Itinerary])
 async def get_public_itineraries(
     *,
+    response: Response,
     local_ids: List[int] = Query(None),
-    limit: int = 10,
-    session: Session = ActiveSession,
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    session: AsyncSession = AsyncActiveSession,
 ):
     """
-    Get public itineraries
+    Get public itineraries, a page at a time
     """
+    page = PageParams(cursor, limit)
+    statement = select(Itinerary).where(Itinerary.is_public)
     if local_ids:
-        # return itineraries that contain any of the locals in local_ids
-        itineraries = session.exec(
-            select(Itinerary)
-            .where(Itinerary.is_public)
-            .where(Itinerary.id == ItineraryLocal.itinerary_id)
-            .where(ItineraryLocal.local_id.in_(local_ids))
-            .limit(limit)
-        ).all()
-    else:
-        # return random public itineraries
-        itineraries = session.exec(
-            select(Itinerary).where(Itinerary.is_public).limit(limit)
-        ).all()
+        # return itineraries that contain any of the locals in local_ids,
+        # once each (a join would repeat them and break the cursor)
+        statement = statement.where(
+            Itinerary.id.in_(
+                select(ItineraryLocal.itinerary_id).where(
+                    ItineraryLocal.local_id.in_(local_ids)
+                )
+            )
+        )
+    itineraries = (
+        await session.exec(ITINERARY_KEYSET.apply(statement, page))
+    ).all()
+    itineraries = ITINERARY_KEYSET.page(itineraries, page, response)
 
     return itineraries
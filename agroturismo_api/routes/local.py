@@ -1,67 +1,201 @@
-from typing import Annotated, List, Union
-
-import cloudinary
-import cloudinary.api
-import cloudinary.uploader
-from fastapi import APIRouter, File, HTTPException, Query, UploadFile, status
-from sqlmodel import Session, or_, select, case
+from typing import Annotated, List, Optional, Union
+
+from fastapi import (
+    APIRouter,
+    File,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+    status,
+)
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import load_only
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from ..core.config import (
-    CLOUDINARY_API_KEY,
-    CLOUDINARY_API_SECRET,
-    CLOUDINARY_CLOUD_NAME,
+    MAX_PAGE_SIZE,
+    NEARBY_DEFAULT_RADIUS,
+    NEARBY_MAX_RADIUS,
+    SEARCH_MAX_RESULTS,
+)
+from ..core.db import ActiveSession, AsyncActiveSession
+from ..core.pagination import Keyset, PageParams, Pagination
+from ..core.projection import (
+    FIELDS_QUERY,
+    parse_fields,
+    project,
+    projected_response,
 )
-from ..core.db import ActiveSession
 from ..models.cost import Cost
 from ..models.gallery_local import GalleryLocal
 from ..models.image import Image
-from ..models.local import Local, LocalCreate, LocalRead
+from ..models.image_variant import ImageVariant
+from ..models.loaders import LOCAL_READ_OPTIONS, LOCAL_RELATIONSHIP_OPTIONS
+from ..models.local import Local, LocalCreate, LocalNearbyRead, LocalRead
+from ..services.distance_cache import DistanceCache
+from ..services.image_upload import image_ingest
+from ..services.nearby import find_nearby
+from ..services.response_cache import local_tags, response_cache
+from ..services.route_cache import route_cache
+from ..services.route_jobs import route_job_runner
+from ..services.text_search import LOCAL, rank_ordering, text_search_index
 
 router = APIRouter()
 
-cloudinary.config(
-    cloud_name=CLOUDINARY_CLOUD_NAME,
-    api_key=CLOUDINARY_API_KEY,
-    api_secret=CLOUDINARY_API_SECRET,
-    secure=True,
+LOCAL_KEYSET = Keyset.of("name", Local.name, Local.id)
+# ordenados em memória pela distância
+NEARBY_KEYSET = Keyset(
+    "distance",
+    ["distance", "id"],
+    lambda nearby: [nearby.distance, nearby.id],
 )
 
 
+def invalidate_local_routes(session: Session, local_id: int) -> None:
+    """
+    Descarta as distâncias e rotas calculadas com as coordenadas antigas
+    """
+    DistanceCache(session).invalidate(local_id)
+    route_cache.invalidate_local(local_id)
+    route_job_runner.invalidate_local(session, local_id)
+
+
+def local_options(selected: Optional[List[str]]) -> tuple:
+    """
+    Opções de carregamento dos locais: com os campos de `fields=`, só
+    essas colunas (e as da ordenação) e os relacionamentos pedidos
+    """
+    if selected is None:
+        return LOCAL_READ_OPTIONS
+    columns = {"id", "name"}.union(selected).intersection(
+        Local.__table__.c.keys()
+    )
+    return (
+        load_only(*(getattr(Local, name) for name in columns)),
+        *(
+            LOCAL_RELATIONSHIP_OPTIONS[name]
+            for name in selected
+            if name in LOCAL_RELATIONSHIP_OPTIONS
+        ),
+    )
+
+
 @router.get("/", response_model=List[LocalRead])
 async def list_locals(
     *,
+    response: Response,
     search: str = Query(None),
     ids: List[int] = Query(None),
     category_id: Union[int, None] = Query(None),
     tags: List[str] = Query(None),
-    session: Session = ActiveSession,
+    fields: Optional[str] = FIELDS_QUERY,
+    page: PageParams = Pagination,
+    session: AsyncSession = AsyncActiveSession,
 ):
-    text_search_condition = or_(
-        Local.name.ilike(f"%{search}%"),
-        Local.description.ilike(f"%{search}%"),
-        Local.address.ilike(f"%{search}%"),
-        Local.website.ilike(f"%{search}%"),
-        Local.phone.ilike(f"%{search}%"),
-    )
-
-    ordering = case(
-        {_id: index for index, _id in enumerate(ids)},
-        value=Local.id,
-    ) if ids else Local.name
+    """
+    Lista os locais por nome, ou na ordem dos IDs ou da relevância da
+    busca, em páginas: o cursor da próxima vem no header X-Next-Cursor. Com
+    `fields`, retorna só esses campos e carrega só os relacionamentos
+    pedidos.
+    """
+    selected = parse_fields(fields, LocalRead)
+    matches = None
+    if search:
+        # os mais relevantes primeiro, a não ser que a ordem venha dos IDs
+        matches = await text_search_index.search(
+            session, LOCAL, search, SEARCH_MAX_RESULTS
+        )
+        if not matches:
+            return []
+
+    keyset = LOCAL_KEYSET
+    ranking = ids or matches
+    if ranking:
+        position = {id: index for index, id in enumerate(ranking)}
+        keyset = Keyset(
+            "rank",
+            [rank_ordering(Local.id, ranking)],
+            lambda local: [position[local.id]],
+        )
 
-    locals = session.exec(
+    statement = (
         select(Local)
         .where(
-            Local.main_category_id == category_id if category_id else True,
+            (
+                Local.main_category_id == category_id
+                if category_id
+                else True
+            ),
             Local.id.in_(ids) if ids else True,
-            text_search_condition if search else True,
+            Local.id.in_(matches) if matches else True,
             # Local.tags.any(tags) if tags else True,
         )
-        .order_by(ordering)
-    ).all()
+        .options(*local_options(selected))
+    )
+    locals = (await session.exec(keyset.apply(statement, page))).all()
+    locals = keyset.page(locals, page, response)
+    if selected is not None:
+        return projected_response(LocalRead, locals, selected, response)
     return locals
 
 
+@router.get("/nearby", response_model=List[LocalNearbyRead])
+async def list_nearby_locals(
+    *,
+    latitude: float = Query(..., ge=-90, le=90),
+    longitude: float = Query(..., ge=-180, le=180),
+    radius: Optional[float] = Query(
+        None, gt=0, le=NEARBY_MAX_RADIUS, description="Em km"
+    ),
+    k: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    category_id: List[int] = Query(None),
+    fields: Optional[str] = FIELDS_QUERY,
+    response: Response,
+    page: PageParams = Pagination,
+    session: AsyncSession = AsyncActiveSession,
+):
+    """
+    Lista os locais a até `radius` km da coordenada e/ou os `k` mais
+    próximos, do mais perto para o mais longe, com a distância em km. Sem
+    nenhum dos dois, o raio é NEARBY_DEFAULT_RADIUS. Os resultados vêm em
+    páginas: o cursor da próxima vem no header X-Next-Cursor.
+    """
+    selected = parse_fields(fields, LocalRead) or list(LocalRead.__fields__)
+    if radius is None and k is None:
+        radius = NEARBY_DEFAULT_RADIUS
+    nearby = await find_nearby(
+        session,
+        latitude,
+        longitude,
+        radius=radius,
+        k=k,
+        category_ids=category_id,
+    )
+    nearby = NEARBY_KEYSET.page(
+        NEARBY_KEYSET.seek(nearby, page), page, response
+    )
+    if not nearby:
+        return JSONResponse([], headers=dict(response.headers))
+
+    ids = [local.id for local in nearby]
+    locals = (
+        await session.exec(
+            select(Local)
+            .where(Local.id.in_(ids))
+            .options(*local_options(selected))
+            .order_by(rank_ordering(Local.id, ids))
+        )
+    ).all()
+    distances = dict(nearby)
+    content = project(LocalRead, locals, selected)
+    for item, local in zip(content, locals):
+        item["distance"] = distances[local.id]
+    return JSONResponse(content, headers=dict(response.headers))
+
+
 @router.post("/", response_model=LocalRead, status_code=status.HTTP_201_CREATED)
 async def create_local(*, local_to_save: LocalCreate, session: Session = ActiveSession):
     local = Local(**local_to_save.dict())
@@ -72,25 +206,35 @@ async def create_local(*, local_to_save: LocalCreate, session: Session = ActiveS
 
 
 @router.get("/{id}", response_model=LocalRead)
-async def get_local_by_id(*, id: int, session: Session = ActiveSession):
-    local = session.get(Local, id)
+async def get_local_by_id(
+    *, id: int, request: Request, session: Session = ActiveSession
+):
+    if cached := response_cache.lookup(request):
+        return cached
+    local = session.get(Local, id, options=LOCAL_READ_OPTIONS)
     if not local:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Local não encontrado",
         )
-    return local
+    return response_cache.respond(request, LocalRead, local, local_tags(local))
 
 
 @router.get("/find-by-slug/{slug}", response_model=LocalRead)
-async def find_local_by_slug(*, slug: str, session: Session = ActiveSession):
-    local = session.exec(select(Local).where(Local.slug == slug)).first()
+async def find_local_by_slug(
+    *, slug: str, request: Request, session: Session = ActiveSession
+):
+    if cached := response_cache.lookup(request):
+        return cached
+    local = session.exec(
+        select(Local).where(Local.slug == slug).options(*LOCAL_READ_OPTIONS)
+    ).first()
     if not local:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Local não encontrado",
         )
-    return local
+    return response_cache.respond(request, LocalRead, local, local_tags(local))
 
 
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -101,6 +245,7 @@ async def delete_local(*, id: int, session: Session = ActiveSession):
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Local não encontrado",
         )
+    invalidate_local_routes(session, local.id)
     session.delete(local)
     session.commit()
     return None
@@ -117,10 +262,15 @@ async def update_local(
             detail="Local não encontrado",
         )
 
+    coords = (local.latitude, local.longitude)
+
     patch_data = local_patch.dict(exclude_unset=True)
     for key, value in patch_data.items():
         setattr(local, key, value)
 
+    if (local.latitude, local.longitude) != coords:
+        invalidate_local_routes(session, local.id)
+
     session.add(local)
     session.commit()
     session.refresh(local)
@@ -138,6 +288,12 @@ async def replace_local(
             detail="Local não encontrado",
         )
 
+    if (local.latitude, local.longitude) != (
+        local_to_update.latitude,
+        local_to_update.longitude,
+    ):
+        invalidate_local_routes(session, local.id)
+
     local = Local(**local_to_update.dict(), id=id)
 
     session.add(local)
@@ -163,34 +319,32 @@ async def create_local_gallery(
             detail="Local não encontrado",
         )
 
-    for index, image_file in enumerate(image_files):
-        filename_without_extension = image_file.filename.split(".")[0]
-        cloudinary_response = cloudinary.uploader.upload(
-            folder=f"agroturismo/locais/{local.slug}",
-            public_id=filename_without_extension,
-            file=image_file.file,
-            overwrite=True,
-        )
-
-        image = Image(
-            url=cloudinary_response["url"],
-            width=cloudinary_response["width"],
-            height=cloudinary_response["height"],
-            public_id=cloudinary_response["public_id"],
-        )
-
-        session.add(image)
-        session.commit()
-
-        gallery_local = GalleryLocal(
-            local_id=local.id, image_id=image.id, arrangement=index
+    # imagens processadas e enviadas em paralelo, fora do event loop, e
+    # todas as linhas gravadas em uma única transação
+    uploaded = await image_ingest.upload(
+        image_files, folder=f"agroturismo/locais/{local.slug}"
+    )
+    session.add_all(
+        GalleryLocal(
+            local_id=local.id,
+            image=Image(
+                **ingested.image._asdict(),
+                variants=[
+                    ImageVariant(**variant._asdict())
+                    for variant in ingested.variants
+                ],
+            ),
+            arrangement=index,
         )
-
-        session.add(gallery_local)
+        for index, ingested in enumerate(uploaded)
+    )
+    try:
         session.commit()
+    except Exception:
+        session.rollback()
+        await image_ingest.discard(uploaded)
+        raise
 
-    session.add(local)
-    session.commit()
-    session.refresh(local)
-
-    return local
+    return session.get(
+        Local, local_id, options=LOCAL_READ_OPTIONS, populate_existing=True
+    )
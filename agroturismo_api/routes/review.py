@@ -1,14 +1,21 @@
 from typing import List
 
-from fastapi import APIRouter, HTTPException, Query, status
-from sqlmodel import Session, desc, select
+from fastapi import APIRouter, HTTPException, Query, Response, status
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from ..core.db import ActiveSession
+from ..core.db import ActiveSession, AsyncActiveSession
+from ..core.pagination import Keyset, PageParams, Pagination
 from ..models.review import Review, ReviewCreate, ReviewRead
 from ..security import AuthenticatedTouristUser
 
 router = APIRouter()
 
+# the most recent first
+REVIEW_KEYSET = Keyset.of(
+    "created_at", Review.created_at, Review.id, descending=True
+)
+
 
 @router.post(
     "/",
@@ -52,20 +59,19 @@ async def delete_review(*, id: int, session: Session = ActiveSession):
 @router.get("/", response_model=List[ReviewRead])
 async def read_reviews(
     *,
-    session: Session = ActiveSession,
+    response: Response,
+    session: AsyncSession = AsyncActiveSession,
     local_id: int = Query(None),
-    tourist_id: int = Query(None)
+    tourist_id: int = Query(None),
+    page: PageParams = Pagination,
 ):
     """
-    Read reviews
+    Read reviews, the most recent first, a page at a time
     """
-    reviews = session.exec(
-        select(Review)
-        .where(
-            Review.local_id == local_id if local_id else True,
-            Review.tourist_id == tourist_id if tourist_id else True,
-        )
-        .order_by(desc(Review.created_at))
-    ).all()
+    statement = select(Review).where(
+        Review.local_id == local_id if local_id else True,
+        Review.tourist_id == tourist_id if tourist_id else True,
+    )
+    reviews = (await session.exec(REVIEW_KEYSET.apply(statement, page))).all()
 
-    return reviews
+    return REVIEW_KEYSET.page(reviews, page, response)
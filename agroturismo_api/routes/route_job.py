@@ -0,0 +1,56 @@
+from fastapi import APIRouter, HTTPException, Response, status
+from sqlmodel import Session
+
+from ..core.db import ActiveSession
+from ..models.route_job import RouteJob, RouteJobCreate, RouteJobRead
+from ..services.route_jobs import route_job_runner
+
+router = APIRouter()
+
+
+def get_route_job_or_404(id: int, session: Session) -> RouteJob:
+    job = session.get(RouteJob, id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Cálculo de rota não encontrado",
+        )
+    return job
+
+
+@router.post(
+    "/", response_model=RouteJobRead, status_code=status.HTTP_202_ACCEPTED
+)
+async def create_route_job(
+    *,
+    job_to_save: RouteJobCreate,
+    response: Response,
+    session: Session = ActiveSession,
+):
+    """
+    Agenda o cálculo de uma rota em segundo plano. Uma submissão idêntica a
+    outra pendente, em execução ou concluída há pouco retorna o job
+    existente.
+    """
+    job, created = await route_job_runner.submit(session, job_to_save)
+    if not created:
+        response.status_code = status.HTTP_200_OK
+    return job
+
+
+@router.get("/{id}", response_model=RouteJobRead)
+async def get_route_job(*, id: int, session: Session = ActiveSession):
+    """
+    Consulta o status e o resultado de um cálculo de rota
+    """
+    job = get_route_job_or_404(id, session)
+    return route_job_runner.refresh(session, job)
+
+
+@router.delete("/{id}", response_model=RouteJobRead)
+async def cancel_route_job(*, id: int, session: Session = ActiveSession):
+    """
+    Cancela um cálculo de rota pendente ou em execução
+    """
+    job = get_route_job_or_404(id, session)
+    return route_job_runner.cancel(session, job)
@@ -1,13 +1,29 @@
-from typing import List, Union
+from typing import List, Sequence, Union
 
 from fastapi import APIRouter, HTTPException, Query, status
 from pydantic import BaseModel
-from sqlmodel import Session, or_, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from ..core.db import ActiveSession
+from ..core.config import (
+    AUTOCOMPLETE_LIMIT,
+    AUTOCOMPLETE_MAX_LIMIT,
+    SEARCH_MAX_RESULTS,
+    SEARCH_RESULT_LIMIT,
+)
+from ..core.db import AsyncActiveSession
 from ..models.category import Category, CategoryRead
+from ..models.loaders import LOCAL_READ_OPTIONS
 from ..models.local import Local, LocalRead
 from ..models.tag import Tag, TagRead
+from ..services.autocomplete import Suggestion, autocomplete_index
+from ..services.text_search import (
+    CATEGORY,
+    LOCAL,
+    TAG,
+    rank_ordering,
+    text_search_index,
+)
 
 router = APIRouter()
 
@@ -18,49 +34,68 @@ class SearchResults(BaseModel):
     tags: List[TagRead]
 
 
+async def load_ranked(
+    session: AsyncSession, model, ids: List[int], options: Sequence = ()
+) -> list:
+    """
+    Carrega as linhas dos IDs encontrados pela busca, na mesma ordem
+    """
+    if not ids:
+        return []
+    return (
+        await session.exec(
+            select(model)
+            .where(model.id.in_(ids))
+            .options(*options)
+            .order_by(rank_ordering(model.id, ids))
+        )
+    ).all()
+
+
 @router.get("/", response_model=SearchResults)
 async def search(
     *,
     query: str = Query(None),
     category_id: Union[int, None] = Query(None),
     tags: List[str] = Query(None),
-    session: Session = ActiveSession,
+    limit: int = Query(SEARCH_RESULT_LIMIT, ge=1, le=SEARCH_MAX_RESULTS),
+    session: AsyncSession = AsyncActiveSession,
 ):
+    """
+    Busca os locais, categorias e tags com todas as palavras do texto,
+    ordenados pela relevância
+    """
     if not query:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Search text is required",
         )
 
-    category_text_search_condition = or_(
-        Category.name.ilike(f"%{query}%"),
-        Category.slug.ilike(f"%{query}%"),
+    local_ids = await text_search_index.search(session, LOCAL, query, limit)
+    category_ids = await text_search_index.search(
+        session, CATEGORY, query, limit
     )
+    tag_ids = await text_search_index.search(session, TAG, query, limit)
 
-    local_text_search_condition = or_(
-        Local.name.ilike(f"%{query}%"),
-        Local.slug.ilike(f"%{query}%"),
-        Local.description.ilike(f"%{query}%"),
-        Local.address.ilike(f"%{query}%"),
-        Local.website.ilike(f"%{query}%"),
-        Local.phone.ilike(f"%{query}%"),
-        Local.main_category.has(category_text_search_condition),
+    locals = await load_ranked(session, Local, local_ids, LOCAL_READ_OPTIONS)
+    return SearchResults(
+        locals=locals,
+        categories=await load_ranked(session, Category, category_ids),
+        tags=await load_ranked(session, Tag, tag_ids),
     )
 
-    tag_text_search_condition = or_(
-        Tag.content.ilike(f"%{query}%"),
-    )
-
-    locals = session.exec(
-        select(Local).where(local_text_search_condition).order_by(Local.name)
-    ).all()
 
-    categories = session.exec(
-        select(Category).where(category_text_search_condition).order_by(Category.name)
-    ).all()
-
-    tags = session.exec(
-        select(Tag).where(tag_text_search_condition).order_by(Tag.content)
-    ).all()
-
-    return SearchResults(locals=locals, categories=categories, tags=tags)
+@router.get("/autocomplete", response_model=List[Suggestion])
+async def autocomplete(
+    *,
+    query: str = Query(..., min_length=1),
+    types: List[str] = Query(None, regex=f"^({LOCAL}|{CATEGORY}|{TAG})$"),
+    limit: int = Query(AUTOCOMPLETE_LIMIT, ge=1, le=AUTOCOMPLETE_MAX_LIMIT),
+    fuzzy: bool = Query(True),
+):
+    """
+    Sugestões de locais, categorias e tags cujas palavras começam com as
+    palavras digitadas, tolerando erros de digitação. Servidas pelo índice
+    em memória, sem consultar o banco.
+    """
+    return autocomplete_index.search(query, limit, types, fuzzy)
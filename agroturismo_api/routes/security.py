@@ -1,4 +1,5 @@
 from datetime import timedelta
+from functools import partial
 
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
@@ -9,35 +10,54 @@ from ..core.config import (
     REFRESH_TOKEN_EXPIRE_MINUTES,
 )
 from ..core.db import ActiveSession
-from ..models.user import User, UserPasswordPatch, UserRead, get_password_hash
+from ..models.user import User, UserPasswordPatch, UserRead
 from ..security import (
     AuthenticatedFreshUser,
     AuthenticatedUser,
+    LoginRateLimit,
     RefreshToken,
     Token,
     authenticate_user,
+    count_failed_login,
     create_access_token,
     create_refresh_token,
     get_current_user,
     get_user,
     validate_token,
 )
+from ..services.password_hasher import (
+    PasswordHasher,
+    get_password_hasher,
+    password_hasher,
+)
 
 router = APIRouter()
 
 
-@router.post("/token", response_model=Token)
+@router.post("/token", response_model=Token, dependencies=[LoginRateLimit])
 async def login_for_access_token(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
+    session: Session = ActiveSession,
+    hasher: PasswordHasher = Depends(get_password_hasher),
 ):
-    user = authenticate_user(get_user, form_data.username, form_data.password)
+    user = await authenticate_user(
+        partial(get_user, session=session),
+        form_data.username,
+        form_data.password,
+        hasher,
+    )
 
     if not user:
+        count_failed_login(request, form_data.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Senha ou usuário incorretos",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if session.is_modified(user):
+        # password rehashed with the current parameters
+        session.commit()
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -58,8 +78,10 @@ async def login_for_access_token(
 
 
 @router.post("/refresh-token", response_model=Token)
-async def refresh_token(form_data: RefreshToken):
-    user = await validate_token(token=form_data.refresh_token)
+async def refresh_token(
+    form_data: RefreshToken, session: Session = ActiveSession
+):
+    user = await validate_token(token=form_data.refresh_token, session=session)
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -105,7 +127,7 @@ async def update_user_password(
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
 
     # Check the user can update the password
-    current_user: User = get_current_user(request=request)
+    current_user: User = get_current_user(request=request, session=session)
     if user.id != current_user.id:
         raise HTTPException(
             status_code=403,
@@ -118,7 +140,7 @@ async def update_user_password(
         )
 
     # Update the password
-    user.password = get_password_hash(user_patch.password)
+    user.password = await password_hasher.hash(user_patch.password)
 
     # Commit the session
     session.commit()
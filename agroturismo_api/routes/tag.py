@@ -1,19 +1,34 @@
 from typing import List
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Request, Response, status
 from sqlmodel import Session, select
 
 from ..core.db import ActiveSession
+from ..core.pagination import Keyset, PageParams, Pagination
 from ..models.tag import Tag, TagCreate, TagRead
 from ..security import AuthenticatedAdminSuperUser
+from ..services.response_cache import response_cache
 
 router = APIRouter()
 
+TAG_KEYSET = Keyset.of("id", Tag.id)
+
 
 @router.get("/", response_model=List[TagRead])
-def list_tags(*, session: Session = ActiveSession):
-    tags = session.exec(select(Tag)).all()
-    return tags
+def list_tags(
+    *,
+    request: Request,
+    response: Response,
+    page: PageParams = Pagination,
+    session: Session = ActiveSession,
+):
+    if cached := response_cache.lookup(request):
+        return cached
+    tags = session.exec(TAG_KEYSET.apply(select(Tag), page)).all()
+    tags = TAG_KEYSET.page(tags, page, response)
+    return response_cache.respond(
+        request, List[TagRead], tags, {("tags",)}, response
+    )
 
 
 @router.post(
@@ -30,6 +45,13 @@ def create_tag(*, tag_to_save: TagCreate, session: Session = ActiveSession):
 
 
 @router.get("/{id}", response_model=TagRead)
-def get_tag(*, id: int, session: Session = ActiveSession):
+def get_tag(*, id: int, request: Request, session: Session = ActiveSession):
+    if cached := response_cache.lookup(request):
+        return cached
     tag = session.get(Tag, id)
-    return tag
+    if not tag:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Tag não encontrada",
+        )
+    return response_cache.respond(request, TagRead, tag, {("tag", tag.id)})
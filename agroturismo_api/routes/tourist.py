@@ -6,6 +6,7 @@ from sqlmodel import Session, select
 from ..core.db import ActiveSession
 from ..models.tourist import Tourist, TouristCreate, TouristRead
 from ..security import validate_username
+from ..services.password_hasher import password_hasher
 
 router = APIRouter()
 
@@ -22,9 +23,12 @@ async def list_tourists(*, session: Session = ActiveSession):
 async def create_tourist(
     *, tourist_to_save: TouristCreate, session: Session = ActiveSession
 ):
-    validate_username(tourist_to_save.username)
+    validate_username(tourist_to_save.username, session)
 
-    tourist = Tourist(**tourist_to_save.dict())
+    tourist = Tourist(
+        **tourist_to_save.dict(exclude={"password"}),
+        password=await password_hasher.hash(tourist_to_save.password),
+    )
     session.add(tourist)
     session.commit()
     session.refresh(tourist)
@@ -2,20 +2,37 @@ from datetime import datetime, timedelta
 from typing import Callable, Optional, Union
 
 from fastapi import Depends, HTTPException, Request, status
-from fastapi.security import OAuth2PasswordBearer
+from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
 from pydantic import BaseModel
 from sqlalchemy.orm import with_polymorphic
 from sqlmodel import Session, SQLModel
 
-from .core.config import ALGORITHM, SECRET_KEY
-from .core.db import engine
+from .core.config import (
+    ALGORITHM,
+    CLIENT_IP_HEADER,
+    LOGIN_RATE_LIMIT_PER_CLIENT,
+    LOGIN_RATE_LIMIT_PER_USERNAME,
+    LOGIN_RATE_LIMIT_WINDOW,
+    SECRET_KEY,
+)
+from .core.db import ActiveSession, engine
 from .models.admin_user import AdminUser
 from .models.tourist import Tourist
-from .models.user import User, verify_password
+from .models.user import User
+from .services.password_hasher import PasswordHasher, password_hasher
+from .services.principal_cache import principal_cache
+from .services.rate_limiter import RateLimiter, retry_after_header
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/token")
 
+login_rate_limiter = RateLimiter(
+    LOGIN_RATE_LIMIT_PER_USERNAME, LOGIN_RATE_LIMIT_WINDOW
+)
+client_login_rate_limiter = RateLimiter(
+    LOGIN_RATE_LIMIT_PER_CLIENT, LOGIN_RATE_LIMIT_WINDOW
+)
+
 
 class Token(SQLModel):
     access_token: str
@@ -33,47 +50,103 @@ class TokenData(BaseModel):
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
+    issued_at = datetime.utcnow()
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = issued_at + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire, "scope": "access_token"})
+        expire = issued_at + timedelta(minutes=15)
+    to_encode.update(
+        {"exp": expire, "iat": issued_at, "scope": "access_token"}
+    )
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
 def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
+    issued_at = datetime.utcnow()
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = issued_at + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire, "scope": "refresh_token"})
+        expire = issued_at + timedelta(minutes=15)
+    to_encode.update(
+        {"exp": expire, "iat": issued_at, "scope": "refresh_token"}
+    )
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
-def authenticate_user(
-    get_user: Callable, username: str, password: str
+async def authenticate_user(
+    get_user: Callable,
+    username: str,
+    password: str,
+    hasher: PasswordHasher = password_hasher,
 ) -> Union[User, bool]:
     user = get_user(username)
     if not user:
         return False
-    if not verify_password(password, user.password):
+    valid, new_hash = await hasher.verify_and_update(password, user.password)
+    if not valid:
         return False
+    if new_hash:
+        # hashed with old parameters: the caller commits the new hash
+        user.password = new_hash
     return user
 
 
-def get_user(username: str) -> Optional[User]:
-    user_manager = with_polymorphic(User, [Tourist, AdminUser])
-    with Session(engine) as session:
-        return (
-            session.query(user_manager).where(user_manager.username == username).first()
+def get_client_ip(request: Request) -> Optional[str]:
+    # behind a proxy, the connection comes from the proxy and the client IP
+    # is in the header it sets
+    if CLIENT_IP_HEADER:
+        client_ip = request.headers.get(CLIENT_IP_HEADER)
+        if client_ip:
+            return client_ip.strip()
+    return request.client.host if request.client else None
+
+
+def limit_login_attempts(
+    request: Request, form_data: OAuth2PasswordRequestForm = Depends()
+) -> None:
+    retry_after = max(
+        login_rate_limiter.retry_after(form_data.username),
+        client_login_rate_limiter.retry_after(get_client_ip(request)),
+    )
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Muitas tentativas de login, tente novamente mais tarde",
+            headers={"Retry-After": retry_after_header(retry_after)},
         )
 
 
+def count_failed_login(request: Request, username: str) -> None:
+    # only the failed logins use up the attempts
+    login_rate_limiter.hit(username)
+    client_login_rate_limiter.hit(get_client_ip(request))
+
+
+LoginRateLimit = Depends(limit_login_attempts)
+
+
+def get_user(
+    username: str, session: Optional[Session] = None
+) -> Optional[User]:
+    user_manager = with_polymorphic(User, [Tourist, AdminUser])
+    if session is None:
+        with Session(engine) as session:
+            return get_user(username, session)
+    return (
+        session.query(user_manager)
+        .where(user_manager.username == username)
+        .first()
+    )
+
+
 def get_current_user(
-    token: str = Depends(oauth2_scheme), request: Request = None, fresh=False
+    token: str = Depends(oauth2_scheme),
+    request: Request = None,
+    fresh=False,
+    session: Session = ActiveSession,
 ) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -98,10 +171,16 @@ def get_current_user(
     except JWTError:
         raise credentials_exception
 
-    user = get_user(username=token_data.username)
-
+    # the same token always gets the same user, until the cache expires or
+    # the user is changed
+    key = (token_data.username, payload.get("iat"))
+    user = principal_cache.get(key, session)
     if user is None:
-        raise credentials_exception
+        generation = principal_cache.generation
+        user = get_user(token_data.username, session)
+        if user is None:
+            raise credentials_exception
+        principal_cache.put(key, user, generation)
     if fresh and (not payload["fresh"] and not isinstance(user, AdminUser)):
         raise credentials_exception
 
@@ -120,9 +199,11 @@ AuthenticatedUser = Depends(get_current_active_user)
 
 
 def get_current_fresh_user(
-    token: str = Depends(oauth2_scheme), request: Request = None
+    token: str = Depends(oauth2_scheme),
+    request: Request = None,
+    session: Session = ActiveSession,
 ) -> User:
-    return get_current_user(token, request, True)
+    return get_current_user(token, request, True, session)
 
 
 AuthenticatedFreshUser = Depends(get_current_fresh_user)
@@ -170,13 +251,17 @@ async def get_current_tourist_user(
 AuthenticatedTouristUser = Depends(get_current_tourist_user)
 
 
-async def validate_token(token: str = Depends(oauth2_scheme)) -> User:
-    user = get_current_user(token=token)
+async def validate_token(
+    token: str = Depends(oauth2_scheme), session: Session = ActiveSession
+) -> User:
+    user = get_current_user(token=token, session=session)
     return user
 
 
-def validate_username(username: str) -> None:
-    user = get_user(username=username)
+def validate_username(
+    username: str, session: Optional[Session] = None
+) -> None:
+    user = get_user(username, session)
 
     if user:
         raise HTTPException(
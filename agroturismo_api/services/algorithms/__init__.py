@@ -1,4 +1,17 @@
+from .auto import RouteSolution, solve_tsp_auto
+from .exact import branch_and_bound, held_karp, one_tree_lower_bound
 from .guided_local_search import guided_local_search
 from .tabu_search import tabu_search
+from .time_windows import TimeWindowSolution, solve_tsptw
 
-__all__ = ["guided_local_search", "tabu_search"]
+__all__ = [
+    "RouteSolution",
+    "TimeWindowSolution",
+    "branch_and_bound",
+    "guided_local_search",
+    "held_karp",
+    "one_tree_lower_bound",
+    "solve_tsp_auto",
+    "solve_tsptw",
+    "tabu_search",
+]
@@ -0,0 +1,112 @@
+import time
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from ...utils import calculate_distance_matrix
+from .exact import branch_and_bound, held_karp, one_tree_lower_bound
+
+HELD_KARP = "held-karp"
+BRANCH_AND_BOUND = "branch-and-bound"
+
+
+class RouteSolution(NamedTuple):
+    tour: List[int]
+    cost: float
+    solver: str  # held-karp, branch-and-bound ou o nome da heurística
+    lower_bound: float
+    optimality_gap: float  # (custo - limite inferior) / custo
+
+
+def optimality_gap(cost: float, lower_bound: float) -> float:
+    if cost <= 0:
+        return 0.0
+    return max(0.0, (cost - lower_bound) / cost)
+
+
+def rooted_path_matrix(
+    dist_matrix: np.ndarray, start: int, end: Optional[int] = None
+) -> Tuple[np.ndarray, List[int]]:
+    """
+    Função que prepara o caminho aberto para os solvers exatos: `start`
+    passa a ser o ponto 0 e a volta para ele não tem custo (ou só é possível
+    a partir de `end`). Retorna a matriz e a ordem original dos pontos.
+    """
+    num_points = dist_matrix.shape[0]
+    order = [start] + [point for point in range(num_points) if point != start]
+    rooted = dist_matrix[np.ix_(order, order)]
+    if end is None:
+        rooted[:, 0] = 0
+    else:
+        rooted[:, 0] = np.inf
+        rooted[order.index(end), 0] = 0
+    return rooted, order
+
+
+def solve_tsp_auto(
+    coords,
+    heuristic: Callable[..., Tuple[List[int], float]],
+    heuristic_name: str,
+    held_karp_max_stops: int,
+    branch_and_bound_max_stops: int,
+    time_limit: Optional[float] = None,
+    dist_matrix=None,
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+) -> RouteSolution:
+    """
+    Função que escolhe o solver pelo número de pontos: Held-Karp até
+    `held_karp_max_stops`, a heurística seguida de branch and bound até
+    `branch_and_bound_max_stops` e apenas a heurística acima disso
+
+    Se o branch and bound não provar a otimalidade no tempo que sobrou, a
+    melhor rota encontrada é retornada com a distância para o limite
+    inferior da 1-árvore. Passar 0 nos dois limites desativa os métodos
+    exatos. Com `start`, a solução é um caminho aberto a partir desse ponto
+    (terminando em `end`, se informado).
+    """
+    started_at = time.perf_counter()
+    if dist_matrix is None:
+        dist_matrix = calculate_distance_matrix(coords)
+    dist_matrix = np.asarray(dist_matrix, dtype=np.float64)
+    num_points = dist_matrix.shape[0]
+
+    # os solvers exatos aceitam matrizes assimétricas, então o caminho
+    # aberto é uma rota circular cuja volta ao início não custa nada
+    order = list(range(num_points))
+    exact_matrix = dist_matrix
+    if start is not None:
+        exact_matrix, order = rooted_path_matrix(dist_matrix, start, end)
+
+    def solution(tour, cost, solver, lower_bound):
+        tour = [order[point] for point in tour]
+        gap = optimality_gap(cost, lower_bound)
+        return RouteSolution(tour, cost, solver, lower_bound, gap)
+
+    if num_points <= held_karp_max_stops:
+        tour, cost = held_karp(exact_matrix)
+        return solution(tour, cost, HELD_KARP, cost)
+
+    tour, cost = heuristic(
+        coords,
+        time_limit=time_limit,
+        dist_matrix=dist_matrix,
+        start=start,
+        end=end,
+    )
+    position = {point: index for index, point in enumerate(order)}
+    tour = [position[point] for point in tour]
+
+    if num_points <= branch_and_bound_max_stops:
+        remaining = None
+        if time_limit is not None:
+            remaining = time_limit - (time.perf_counter() - started_at)
+        if remaining is None or remaining > 0:
+            tour, cost, optimal = branch_and_bound(
+                exact_matrix, tour, time_limit=remaining
+            )
+            if optimal:
+                return solution(tour, cost, BRANCH_AND_BOUND, cost)
+
+    lower_bound = min(one_tree_lower_bound(exact_matrix, cost), cost)
+    return solution(tour, cost, heuristic_name, lower_bound)
@@ -0,0 +1,245 @@
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from ...utils import calculate_solution_cost
+
+EPSILON = 1e-9
+
+
+def _small_tour(dist_matrix: np.ndarray) -> Tuple[List[int], float]:
+    """
+    Função que resolve as instâncias com até 3 pontos, cujas rotas possíveis
+    são apenas a ida e a volta
+    """
+    tour = list(range(dist_matrix.shape[0]))
+    cost = calculate_solution_cost(tour, dist_matrix) if tour else 0.0
+    if len(tour) == 3:
+        reverse = [0, 2, 1]
+        reverse_cost = calculate_solution_cost(reverse, dist_matrix)
+        if reverse_cost < cost:
+            return reverse, reverse_cost
+    return tour, cost
+
+
+def held_karp(dist_matrix) -> Tuple[List[int], float]:
+    """
+    Função que resolve o caixeiro viajante de forma exata pela programação
+    dinâmica de Held-Karp, vetorizada com NumPy
+
+    O estado dp[mask, j] é o menor custo de sair do ponto 0, visitar os
+    pontos do conjunto `mask` (bit j = ponto j + 1) e terminar no ponto
+    j + 1. Usa O(2^n * n) de memória, então serve apenas para poucos pontos.
+    """
+    dist_matrix = np.asarray(dist_matrix, dtype=np.float64)
+    num_points = dist_matrix.shape[0]
+    if num_points <= 3:
+        return _small_tour(dist_matrix)
+
+    m = num_points - 1
+    full = 1 << m
+    between = dist_matrix[1:, 1:]
+    bits = np.arange(m)
+
+    dp = np.full((full, m), np.inf)
+    parent = np.full((full, m), -1, dtype=np.int16)
+    dp[1 << bits, bits] = dist_matrix[0, 1:]
+
+    masks = np.arange(full)
+    popcount = np.zeros(full, dtype=np.int16)
+    for bit in bits:
+        popcount += (masks >> bit) & 1
+
+    for size in range(2, m + 1):
+        layer = masks[popcount == size]
+        for j in bits:
+            with_j = layer[(layer >> j) & 1 == 1]
+            # dp[prev, k] só é finito quando k está em prev, então os
+            # pontos fora do conjunto nunca são escolhidos
+            candidates = dp[with_j ^ (1 << j)] + between[:, j]
+            best = np.argmin(candidates, axis=1)
+            dp[with_j, j] = candidates[np.arange(len(with_j)), best]
+            parent[with_j, j] = best
+
+    closing = dp[full - 1] + dist_matrix[1:, 0]
+    last = int(np.argmin(closing))
+    cost = float(closing[last])
+
+    path = []
+    mask, j = full - 1, last
+    while j != -1:
+        path.append(j + 1)
+        mask, j = mask ^ (1 << j), int(parent[mask, j])
+    return [0] + path[::-1], cost
+
+
+def _minimum_spanning_tree(weights: np.ndarray) -> Tuple[float, np.ndarray]:
+    """
+    Função que calcula o custo e o grau de cada vértice da árvore geradora
+    mínima (algoritmo de Prim, O(n^2))
+    """
+    num_points = weights.shape[0]
+    degree = np.zeros(num_points, dtype=np.int64)
+    if num_points <= 1:
+        return 0.0, degree
+
+    in_tree = np.zeros(num_points, dtype=bool)
+    in_tree[0] = True
+    best = weights[0].copy()
+    parent = np.zeros(num_points, dtype=np.int64)
+    total = 0.0
+    for _ in range(num_points - 1):
+        candidates = np.where(in_tree, np.inf, best)
+        v = int(np.argmin(candidates))
+        total += candidates[v]
+        degree[v] += 1
+        degree[parent[v]] += 1
+        in_tree[v] = True
+        closer = weights[v] < best
+        best = np.where(closer, weights[v], best)
+        parent = np.where(closer, v, parent)
+    return total, degree
+
+
+def _one_tree(weights: np.ndarray) -> Tuple[float, np.ndarray]:
+    """
+    Função que calcula a 1-árvore: a árvore geradora mínima dos pontos
+    1..n-1 mais as duas arestas mais baratas do ponto 0
+    """
+    tree_cost, tree_degree = _minimum_spanning_tree(weights[1:, 1:])
+    cheapest = np.argpartition(weights[0, 1:], 1)[:2]
+    degree = np.zeros(weights.shape[0], dtype=np.int64)
+    degree[1:] = tree_degree
+    degree[0] = 2
+    degree[cheapest + 1] += 1
+    return tree_cost + weights[0, 1:][cheapest].sum(), degree
+
+
+def one_tree_lower_bound(
+    dist_matrix,
+    upper_bound: Optional[float] = None,
+    iterations: int = 100,
+) -> float:
+    """
+    Função que calcula um limite inferior para o custo da melhor rota pela
+    1-árvore com otimização por subgradiente (limite de Held-Karp)
+
+    Para matrizes assimétricas, o limite é calculado sobre min(d[i][j],
+    d[j][i]), que continua sendo válido.
+    """
+    dist_matrix = np.asarray(dist_matrix, dtype=np.float64)
+    num_points = dist_matrix.shape[0]
+    if num_points <= 3:
+        return _small_tour(dist_matrix)[1]
+
+    weights = np.minimum(dist_matrix, dist_matrix.T)
+    np.fill_diagonal(weights, np.inf)
+    pi = np.zeros(num_points)
+    best_bound = -np.inf
+    step_scale = 2.0
+    no_improv = 0
+
+    for _ in range(iterations):
+        tree_cost, degree = _one_tree(weights + pi[:, None] + pi[None, :])
+        bound = tree_cost - 2 * pi.sum()
+        if bound > best_bound + EPSILON:
+            best_bound = bound
+            no_improv = 0
+        else:
+            no_improv += 1
+            if no_improv >= 10:
+                step_scale /= 2
+                no_improv = 0
+
+        subgradient = degree - 2
+        norm = float(subgradient @ subgradient)
+        if norm == 0:
+            # a 1-árvore é uma rota: o limite é exato
+            break
+        target = upper_bound if upper_bound is not None else 1.05 * bound
+        if target <= bound:
+            break
+        pi += step_scale * (target - bound) / norm * subgradient
+
+    return float(best_bound)
+
+
+def branch_and_bound(
+    dist_matrix,
+    initial_solution: Optional[List[int]] = None,
+    time_limit: Optional[float] = None,
+) -> Tuple[List[int], float, bool]:
+    """
+    Função que resolve o caixeiro viajante de forma exata por branch and
+    bound, estendendo o caminho a partir do ponto 0 em profundidade
+
+    O limite inferior de um caminho parcial é o seu custo mais a árvore
+    geradora mínima dos pontos ainda não visitados e as arestas mais baratas
+    que a ligam ao fim do caminho e ao ponto 0. Retorna a melhor rota, o seu
+    custo e se a otimalidade foi provada antes de `time_limit` se esgotar.
+    """
+    started_at = time.perf_counter()
+    dist_matrix = np.asarray(dist_matrix, dtype=np.float64)
+    num_points = dist_matrix.shape[0]
+    if num_points <= 3:
+        tour, cost = _small_tour(dist_matrix)
+        return tour, cost, True
+
+    symmetric = np.minimum(dist_matrix, dist_matrix.T)
+    if initial_solution is None:
+        initial_solution = list(range(num_points))
+    start = initial_solution.index(0)
+    best_tour = initial_solution[start:] + initial_solution[:start]
+    best_cost = calculate_solution_cost(best_tour, dist_matrix)
+
+    dist = dist_matrix.tolist()
+    visited = np.zeros(num_points, dtype=bool)
+    visited[0] = True
+    path = [0]
+    timed_out = False
+
+    def lower_bound(last: int, path_cost: float) -> float:
+        remaining = np.flatnonzero(~visited)
+        tree_cost, _ = _minimum_spanning_tree(
+            symmetric[np.ix_(remaining, remaining)]
+        )
+        return (
+            path_cost
+            + tree_cost
+            + dist_matrix[last, remaining].min()
+            + dist_matrix[remaining, 0].min()
+        )
+
+    def search(last: int, path_cost: float) -> None:
+        nonlocal best_tour, best_cost, timed_out
+        if len(path) == num_points:
+            cost = path_cost + dist[last][0]
+            if cost < best_cost - EPSILON:
+                best_tour, best_cost = path[:], cost
+            return
+        if (
+            time_limit is not None
+            and time.perf_counter() - started_at >= time_limit
+        ):
+            timed_out = True
+            return
+        if lower_bound(last, path_cost) >= best_cost - EPSILON:
+            return
+
+        for point in sorted(
+            np.flatnonzero(~visited).tolist(), key=dist[last].__getitem__
+        ):
+            cost = path_cost + dist[last][point]
+            if cost >= best_cost - EPSILON:
+                continue
+            visited[point] = True
+            path.append(point)
+            search(point, cost)
+            path.pop()
+            visited[point] = False
+            if timed_out:
+                return
+
+    search(0, 0.0)
+    return best_tour, float(best_cost), not timed_out
@@ -1,14 +1,20 @@
 import random
-from typing import List, Tuple
+import time
+from typing import List, Optional, Tuple
 
 import numpy as np
 
-from ...utils import (
-    calculate_distance_matrix,
-    calculate_solution_cost,
-    generate_random_solution,
+from ...utils import calculate_distance_matrix, calculate_solution_cost
+from .local_search import (
+    anchor_tour,
+    as_distance_rows,
+    as_path_solution,
+    build_neighbor_lists,
+    local_search,
+    open_path_matrix,
 )
-from .local_search import local_search
+
+DEFAULT_PENALTY_FACTOR = 0.3
 
 
 def construct_initial_solution(dist_matrix, alpha):
@@ -18,8 +24,12 @@ def construct_initial_solution(dist_matrix, alpha):
     num_points = dist_matrix.shape[0]
     candidate_list = list(range(num_points))
     solution = []
-    current_point = random.choice(candidate_list)
-    candidate_list.remove(current_point)
+
+    # remove o candidato trocando-o pelo último da lista, em O(1)
+    index = random.randrange(num_points)
+    current_point = candidate_list[index]
+    candidate_list[index] = candidate_list[-1]
+    candidate_list.pop()
     solution.append(current_point)
     while candidate_list:
         distances = dist_matrix[current_point][candidate_list]
@@ -31,7 +41,8 @@ def construct_initial_solution(dist_matrix, alpha):
             eligible_indices = [np.argmin(distances)]
         index = random.choice(eligible_indices)
         current_point = candidate_list[index]
-        candidate_list.remove(current_point)
+        candidate_list[index] = candidate_list[-1]
+        candidate_list.pop()
         solution.append(current_point)
     return solution
 
@@ -41,34 +52,98 @@ def guided_local_search(
     max_iterations: int,
     max_no_improv: int,
     alpha: float,
-    beta: float,
+    penalty_factor: float = DEFAULT_PENALTY_FACTOR,
+    time_limit: Optional[float] = None,
+    dist_matrix=None,
+    start: Optional[int] = None,
+    end: Optional[int] = None,
 ):
     """
     Função que implementa a meta-heurística GLS para o problema do caixeiro viajante
+
+    A partir da solução construída com o `alpha` dado, a cada iteração as
+    arestas do ótimo local com maior utilidade d(a, b) / (1 + p(a, b)) são
+    penalizadas e a busca local continua sobre o custo aumentado
+    d(a, b) + lambda * p(a, b), reexaminando apenas as pontas das arestas
+    penalizadas. O lambda é `penalty_factor` vezes o custo médio de uma
+    aresta do primeiro ótimo local. Uma matriz de distâncias já calculada
+    pode ser informada em `dist_matrix`.
+
+    Com `start`, a solução é um caminho aberto que sai desse ponto (e
+    termina em `end`, se informado), retornado sem a volta ao início.
     """
-    num_points = len(coords)
-    dist_matrix = calculate_distance_matrix(coords)
-    best_solution = generate_random_solution(num_points)
-    best_cost = calculate_solution_cost(best_solution, dist_matrix)
+    started_at = time.perf_counter()
+    if dist_matrix is None:
+        dist_matrix = calculate_distance_matrix(coords)
+    dist_matrix = np.asarray(dist_matrix)
+    if len(dist_matrix) == 0:
+        return [], 0.0
+
+    fixed_edges = set()
+    if start is not None:
+        dist_matrix, fixed_edges = open_path_matrix(dist_matrix, start, end)
+    num_points = len(dist_matrix)
+    dist = as_distance_rows(dist_matrix)
+    neighbor_lists = build_neighbor_lists(dist_matrix)
+
+    solution = construct_initial_solution(dist_matrix, alpha)
+    if start is not None:
+        solution = anchor_tour(solution, start, end)
+    solution, cost = local_search(
+        solution, dist, neighbor_lists=neighbor_lists, fixed_edges=fixed_edges
+    )
+    best_solution, best_cost = solution[:], cost
+    if num_points < 4:
+        return as_path_solution(best_solution, best_cost, start)
+
+    penalty_weight = penalty_factor * cost / num_points
+    penalties = [[0] * num_points for _ in range(num_points)]
+    augmented = [row[:] for row in dist]
     no_improv = 0
 
     for i in range(max_iterations):
-        candidate_solution = construct_initial_solution(dist_matrix, alpha)
-        candidate_solution, candidate_cost = local_search(
-            candidate_solution, dist_matrix
-        )
-        candidate_solution, candidate_cost = local_search(
-            candidate_solution, dist_matrix
+        if (
+            time_limit is not None
+            and time.perf_counter() - started_at >= time_limit
+        ):
+            break
+
+        edges = list(zip(solution, solution[1:] + solution[:1]))
+        utilities = [dist[a][b] / (1 + penalties[a][b]) for a, b in edges]
+        max_utility = max(utilities)
+
+        active = []
+        for (a, b), utility in zip(edges, utilities):
+            if utility < max_utility:
+                continue
+            penalties[a][b] += 1
+            penalties[b][a] = penalties[a][b]
+            augmented[a][b] = dist[a][b] + penalty_weight * penalties[a][b]
+            augmented[b][a] = dist[b][a] + penalty_weight * penalties[b][a]
+            active.extend((a, b))
+
+        solution, _ = local_search(
+            solution,
+            augmented,
+            neighbor_lists=neighbor_lists,
+            active=active,
+            fixed_edges=fixed_edges,
         )
+        cost = calculate_solution_cost(solution, dist)
 
-        if candidate_cost < best_cost:
-            best_solution = candidate_solution
-            best_cost = candidate_cost
+        if cost < best_cost:
+            best_solution = solution[:]
+            best_cost = cost
             no_improv = 0
         else:
             no_improv += 1
-        alpha *= beta
         if no_improv >= max_no_improv:
             break
 
-    return best_solution, best_cost
+    solution, cost = local_search(
+        best_solution,
+        dist,
+        neighbor_lists=neighbor_lists,
+        fixed_edges=fixed_edges,
+    )
+    return as_path_solution(solution, cost, start)
@@ -1,29 +1,430 @@
-import copy
+from collections import deque
+from typing import Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
 
 from ...utils import calculate_solution_cost
 
+TWO_OPT = "2-opt"
+SWAP = "swap"
+OR_OPT = "or-opt"
+
+DEFAULT_NEIGHBORHOODS = (TWO_OPT, OR_OPT, SWAP)
+DEFAULT_NUM_NEIGHBORS = 10
+MAX_SEGMENT_LENGTH = 3  # tamanho máximo do segmento movido pelo or-opt
+EPSILON = 1e-9
+
+Edge = Tuple[int, int]
 
-def local_search(solution, dist_matrix):
+
+def as_distance_rows(dist_matrix) -> List[List[float]]:
     """
-    Função que realiza a busca local para uma solução dada
+    Função que converte a matriz de distâncias em listas do Python, bem mais
+    rápidas que um array NumPy para acessos escalares
     """
-    best_cost = calculate_solution_cost(solution, dist_matrix)
-    improved = True
-    while improved:
-        improved = False
-        for i in range(len(solution) - 1):
-            for j in range(i + 1, len(solution)):
-                new_solution = copy.deepcopy(solution)
-                new_solution[i], new_solution[j] = (
-                    new_solution[j],
-                    new_solution[i],
-                )
-                new_cost = calculate_solution_cost(new_solution, dist_matrix)
-                if new_cost < best_cost:
-                    solution = new_solution
-                    best_cost = new_cost
-                    improved = True
+    if isinstance(dist_matrix, np.ndarray):
+        return dist_matrix.tolist()
+    return dist_matrix
+
+
+def build_neighbor_lists(
+    dist_matrix, num_neighbors: Optional[int] = DEFAULT_NUM_NEIGHBORS
+) -> List[List[int]]:
+    """
+    Função que monta, para cada ponto, a lista dos vizinhos mais próximos
+    ordenada pela distância
+    """
+    dist_matrix = np.array(dist_matrix, dtype=np.float64)
+    num_points = dist_matrix.shape[0]
+    if num_points < 2:
+        return [[] for _ in range(num_points)]
+    if num_neighbors is None or num_neighbors >= num_points:
+        num_neighbors = num_points - 1
+
+    np.fill_diagonal(dist_matrix, np.inf)
+    if num_neighbors < num_points - 1:
+        nearest = np.argpartition(dist_matrix, num_neighbors, axis=1)
+        nearest = nearest[:, :num_neighbors]
+    else:
+        nearest = np.tile(np.arange(num_points), (num_points, 1))
+    rows = np.arange(num_points)[:, np.newaxis]
+    order = np.argsort(dist_matrix[rows, nearest], axis=1, kind="stable")
+    return nearest[rows, order][:, :num_neighbors].tolist()
+
+
+def open_path_matrix(
+    dist_matrix, start: int, end: Optional[int] = None
+) -> Tuple[np.ndarray, Set[Edge]]:
+    """
+    Função que transforma o caminho aberto que sai de `start` (e termina em
+    `end`, se informado) em uma rota circular
+
+    É adicionado um ponto virtual, com distância zero para todos os outros,
+    cujas arestas até `start` e `end` ficam fixas. Assim a aresta de volta
+    ao início não tem custo e as variações de custo dos movimentos continuam
+    sendo calculadas em O(1).
+    """
+    dist_matrix = np.asarray(dist_matrix, dtype=np.float64)
+    num_points = dist_matrix.shape[0]
+    matrix = np.zeros((num_points + 1, num_points + 1))
+    matrix[:num_points, :num_points] = dist_matrix
+
+    fixed_edges = set()
+    for point in (start,) if end is None else (start, end):
+        fixed_edges.update(((num_points, point), (point, num_points)))
+    return matrix, fixed_edges
+
+
+def anchor_tour(
+    tour: List[int], start: int, end: Optional[int] = None
+) -> List[int]:
+    """
+    Função que reordena a rota de `open_path_matrix` para que o ponto virtual
+    (o último índice) fique entre `end` e `start`
+    """
+    virtual = len(tour) - 1
+    pinned = (virtual, start, end)
+    middle = [point for point in tour if point not in pinned]
+    if end is None or end == start:
+        return [start, *middle, virtual]
+    return [start, *middle, end, virtual]
+
+
+def tour_to_path(tour: List[int], start: int) -> List[int]:
+    """
+    Função que converte a rota com o ponto virtual no caminho aberto que
+    começa em `start`
+    """
+    virtual = len(tour) - 1
+    index = tour.index(virtual)
+    path = tour[index + 1 :] + tour[:index]
+    if path and path[0] != start:
+        path.reverse()
+    return path
+
+
+def as_path_solution(
+    tour: List[int], cost: float, start: Optional[int]
+) -> Tuple[List[int], float]:
+    """
+    Função que converte a solução encontrada com `open_path_matrix` no
+    caminho aberto, cujo custo é o mesmo (as arestas do ponto virtual não
+    têm custo). Sem `start`, a rota circular é retornada como está.
+    """
+    if start is None:
+        return tour, cost
+    return tour_to_path(tour, start), cost
+
+
+def tour_positions(tour: List[int]) -> List[int]:
+    """
+    Função que retorna a posição de cada ponto na rota
+    """
+    pos = [0] * len(tour)
+    for index, point in enumerate(tour):
+        pos[point] = index
+    return pos
+
+
+def reverse_segment(tour: List[int], pos: List[int], i: int, j: int) -> None:
+    """
+    Função que inverte o trecho da rota entre as posições i e j (inclusive),
+    considerando a rota circular e invertendo sempre o lado mais curto
+    """
+    n = len(tour)
+    length = (j - i) % n + 1
+    if 2 * length > n:
+        i, j = (j + 1) % n, (i - 1) % n
+        length = n - length
+    for _ in range(length // 2):
+        a, b = tour[i], tour[j]
+        tour[i], tour[j] = b, a
+        pos[b], pos[a] = i, j
+        i = (i + 1) % n
+        j = (j - 1) % n
+
+
+def two_opt_delta(dist, a: int, b: int, c: int, d: int) -> float:
+    """
+    Função que calcula a variação do custo ao trocar as arestas (a, b) e
+    (c, d) pelas arestas (a, c) e (b, d)
+    """
+    return dist[a][c] + dist[b][d] - dist[a][b] - dist[c][d]
+
+
+def swap_delta(tour: List[int], dist, i: int, j: int) -> float:
+    """
+    Função que calcula a variação do custo ao trocar de lugar os pontos das
+    posições i e j
+    """
+    n = len(tour)
+    if i == j:
+        return 0.0
+    if (j + 1) % n == i:
+        i, j = j, i
+    a, c = tour[i], tour[j]
+    prev_a, next_c = tour[i - 1], tour[(j + 1) % n]
+    if (i + 1) % n == j:
+        # pontos adjacentes: prev_a, a, c, next_c -> prev_a, c, a, next_c
+        return (
+            dist[prev_a][c]
+            + dist[c][a]
+            + dist[a][next_c]
+            - dist[prev_a][a]
+            - dist[a][c]
+            - dist[c][next_c]
+        )
+    next_a, prev_c = tour[(i + 1) % n], tour[j - 1]
+    return (
+        dist[prev_a][c]
+        + dist[c][next_a]
+        + dist[prev_c][a]
+        + dist[a][next_c]
+        - dist[prev_a][a]
+        - dist[a][next_a]
+        - dist[prev_c][c]
+        - dist[c][next_c]
+    )
+
+
+def swap_edges(tour: List[int], i: int, j: int):
+    """
+    Função que retorna as arestas removidas e adicionadas ao trocar de lugar
+    os pontos das posições i e j
+    """
+    n = len(tour)
+    if (j + 1) % n == i:
+        i, j = j, i
+    a, c = tour[i], tour[j]
+    prev_a, next_c = tour[i - 1], tour[(j + 1) % n]
+    if (i + 1) % n == j:
+        removed = ((prev_a, a), (c, next_c))
+        added = ((prev_a, c), (a, next_c))
+    else:
+        next_a, prev_c = tour[(i + 1) % n], tour[j - 1]
+        removed = ((prev_a, a), (a, next_a), (prev_c, c), (c, next_c))
+        added = ((prev_a, c), (c, next_a), (prev_c, a), (a, next_c))
+    return removed, added
+
+
+def apply_swap(tour: List[int], pos: List[int], i: int, j: int) -> None:
+    a, c = tour[i], tour[j]
+    tour[i], tour[j] = c, a
+    pos[c], pos[a] = i, j
+
+
+def or_opt_delta(
+    tour: List[int],
+    pos: List[int],
+    dist,
+    i: int,
+    length: int,
+    c: int,
+    reverse: bool,
+) -> float:
+    """
+    Função que calcula a variação do custo ao mover o segmento de `length`
+    pontos iniciado na posição i para logo depois do ponto c
+    """
+    n = len(tour)
+    first, last = tour[i], tour[(i + length - 1) % n]
+    prev, nxt = tour[i - 1], tour[(i + length) % n]
+    d = tour[(pos[c] + 1) % n]
+    if reverse:
+        added = dist[c][last] + dist[first][d]
+    else:
+        added = dist[c][first] + dist[last][d]
+    return (
+        dist[prev][nxt]
+        + added
+        - dist[prev][first]
+        - dist[last][nxt]
+        - dist[c][d]
+    )
+
+
+def apply_or_opt(
+    tour: List[int],
+    pos: List[int],
+    i: int,
+    length: int,
+    c: int,
+    reverse: bool,
+) -> None:
+    n = len(tour)
+    segment = [tour[(i + k) % n] for k in range(length)]
+    if reverse:
+        segment.reverse()
+    rest = [tour[(i + length + k) % n] for k in range(n - length)]
+    insert_at = (pos[c] - i - length) % n + 1
+    tour[:] = rest[:insert_at] + segment + rest[insert_at:]
+    for index, point in enumerate(tour):
+        pos[point] = index
+
+
+def _improve_two_opt(tour, pos, dist, neighbor_lists, a, fixed):
+    n = len(tour)
+    i = pos[a]
+
+    # nova aresta (a, c) no lugar de (a, sucessor de a)
+    b = tour[(i + 1) % n]
+    d_ab = -1.0 if (a, b) in fixed else dist[a][b]
+    for c in neighbor_lists[a]:
+        if dist[a][c] >= d_ab:
+            break
+        j = pos[c]
+        d = tour[(j + 1) % n]
+        if c == b or d == a or (c, d) in fixed:
+            continue
+        if two_opt_delta(dist, a, b, c, d) < -EPSILON:
+            reverse_segment(tour, pos, (i + 1) % n, j)
+            return (a, b, c, d)
+
+    # nova aresta (a, c) no lugar de (antecessor de a, a)
+    b = tour[i - 1]
+    d_ab = -1.0 if (b, a) in fixed else dist[b][a]
+    for c in neighbor_lists[a]:
+        if dist[a][c] >= d_ab:
+            break
+        j = pos[c]
+        d = tour[j - 1]
+        if c == b or d == a or (d, c) in fixed:
+            continue
+        if two_opt_delta(dist, b, a, d, c) < -EPSILON:
+            reverse_segment(tour, pos, j, (i - 1) % n)
+            return (a, b, c, d)
+
+    return None
+
+
+def _improve_swap(tour, pos, dist, neighbor_lists, a, fixed):
+    n = len(tour)
+    i = pos[a]
+    for c in neighbor_lists[a]:
+        j = pos[c]
+        if swap_delta(tour, dist, i, j) < -EPSILON:
+            if fixed and any(
+                edge in fixed for edge in swap_edges(tour, i, j)[0]
+            ):
+                continue
+            touched = (
+                a,
+                c,
+                tour[i - 1],
+                tour[(i + 1) % n],
+                tour[j - 1],
+                tour[(j + 1) % n],
+            )
+            apply_swap(tour, pos, i, j)
+            return touched
+    return None
+
+
+def _improve_or_opt(tour, pos, dist, neighbor_lists, a, fixed):
+    n = len(tour)
+    i = pos[a]
+    for length in range(1, min(MAX_SEGMENT_LENGTH, n - 3) + 1):
+        segment = [tour[(i + k) % n] for k in range(length)]
+        last = segment[-1]
+        prev, nxt = tour[i - 1], tour[(i + length) % n]
+        if (prev, a) in fixed or (last, nxt) in fixed:
+            continue
+        removal_gain = dist[prev][a] + dist[last][nxt] - dist[prev][nxt]
+        if removal_gain <= EPSILON:
+            continue
+
+        # a ponta do segmento `end` passa a ficar ligada ao ponto c
+        for end in (a, last) if length > 1 else (a,):
+            for c in neighbor_lists[end]:
+                if dist[c][end] >= removal_gain:
                     break
-            if improved:
+                if c in segment:
+                    continue
+                prev_c = tour[pos[c] - 1]
+                candidates = (
+                    (c, end == last),  # entre c e o seu sucessor
+                    (prev_c, end == a),  # entre o antecessor de c e c
+                )
+                for after, reverse in candidates:
+                    if after == prev or after in segment:
+                        continue
+                    if (after, tour[(pos[after] + 1) % n]) in fixed:
+                        continue
+                    delta = or_opt_delta(
+                        tour, pos, dist, i, length, after, reverse
+                    )
+                    if delta < -EPSILON:
+                        touched = (
+                            prev,
+                            nxt,
+                            a,
+                            last,
+                            after,
+                            tour[(pos[after] + 1) % n],
+                        )
+                        apply_or_opt(tour, pos, i, length, after, reverse)
+                        return touched
+    return None
+
+
+NEIGHBORHOOD_MOVES = {
+    TWO_OPT: _improve_two_opt,
+    SWAP: _improve_swap,
+    OR_OPT: _improve_or_opt,
+}
+
+
+def local_search(
+    solution: List[int],
+    dist_matrix,
+    neighborhoods: Sequence[str] = DEFAULT_NEIGHBORHOODS,
+    neighbor_lists: Optional[List[List[int]]] = None,
+    active: Optional[Iterable[int]] = None,
+    fixed_edges: Optional[Set[Edge]] = None,
+) -> Tuple[List[int], float]:
+    """
+    Função que realiza a busca local para uma solução dada
+
+    A rota é alterada no próprio lugar e cada movimento (2-opt, swap e
+    or-opt) é avaliado pela variação do custo em O(1). Os vizinhos de cada
+    ponto são limitados por `neighbor_lists` e os "don't look bits" fazem
+    com que apenas os pontos em `active` (por padrão, todos) e os afetados
+    por alguma melhoria sejam reexaminados. Os movimentos que removeriam
+    alguma aresta de `fixed_edges` (nos dois sentidos) não são aplicados.
+    """
+    tour = solution
+    num_points = len(tour)
+    if num_points == 0:
+        return tour, 0.0
+
+    dist = as_distance_rows(dist_matrix)
+    if num_points < 4:
+        # com até 3 pontos todas as rotas circulares têm o mesmo custo
+        return tour, calculate_solution_cost(tour, dist)
+
+    if neighbor_lists is None:
+        neighbor_lists = build_neighbor_lists(dist_matrix)
+    moves = [NEIGHBORHOOD_MOVES[name] for name in neighborhoods]
+    fixed = fixed_edges or set()
+    pos = tour_positions(tour)
+
+    queue = deque()
+    queued = [False] * num_points
+    for point in range(num_points) if active is None else active:
+        if not queued[point]:
+            queued[point] = True
+            queue.append(point)
+
+    while queue:
+        point = queue.popleft()
+        queued[point] = False
+        for move in moves:
+            touched = move(tour, pos, dist, neighbor_lists, point, fixed)
+            if touched:
+                for touched_point in touched:
+                    if not queued[touched_point]:
+                        queued[touched_point] = True
+                        queue.append(touched_point)
                 break
-    return solution, best_cost
+
+    return tour, calculate_solution_cost(tour, dist)
@@ -1,11 +1,26 @@
-from typing import List, Tuple
+import time
+from typing import List, Optional, Tuple
 
 from ...utils import (
     calculate_distance_matrix,
     calculate_solution_cost,
     generate_random_solution,
 )
-from .local_search import local_search
+from .local_search import (
+    EPSILON,
+    anchor_tour,
+    apply_swap,
+    as_distance_rows,
+    as_path_solution,
+    build_neighbor_lists,
+    local_search,
+    open_path_matrix,
+    reverse_segment,
+    swap_delta,
+    swap_edges,
+    tour_positions,
+    two_opt_delta,
+)
 
 
 def tabu_search(
@@ -13,36 +28,122 @@ def tabu_search(
     max_iterations: int,
     max_no_improv: int,
     tabu_tenure: int,
+    time_limit: Optional[float] = None,
+    dist_matrix=None,
+    start: Optional[int] = None,
+    end: Optional[int] = None,
 ):
     """
     Função que implementa a meta-heurística TS para o problema do caixeiro viajante
+
+    A cada iteração é aplicado o melhor movimento (2-opt ou swap) da
+    vizinhança, avaliado pela variação do custo. As arestas removidas ficam
+    proibidas de voltar à rota por `tabu_tenure` iterações, exceto quando o
+    movimento leva a uma solução melhor que a melhor conhecida (aspiração).
+    A busca para após `max_iterations`, `max_no_improv` iterações sem
+    melhoria ou quando `time_limit` (em segundos) se esgota. Uma matriz de
+    distâncias já calculada pode ser informada em `dist_matrix`.
+
+    Com `start`, a solução é um caminho aberto que sai desse ponto (e
+    termina em `end`, se informado), retornado sem a volta ao início.
     """
-    num_points = len(coords)
-    dist_matrix = calculate_distance_matrix(coords)
-    best_solution = generate_random_solution(num_points)
-    best_cost = calculate_solution_cost(best_solution, dist_matrix)
+    started_at = time.perf_counter()
+    if dist_matrix is None:
+        dist_matrix = calculate_distance_matrix(coords)
+    fixed_edges = set()
+    if start is not None:
+        dist_matrix, fixed_edges = open_path_matrix(dist_matrix, start, end)
+    num_points = len(dist_matrix)
+    dist = as_distance_rows(dist_matrix)
+    neighbor_lists = build_neighbor_lists(dist_matrix)
+
+    solution = generate_random_solution(num_points)
+    if start is not None:
+        solution = anchor_tour(solution, start, end)
+    solution, cost = local_search(
+        solution, dist, neighbor_lists=neighbor_lists, fixed_edges=fixed_edges
+    )
+    best_solution, best_cost = solution[:], cost
+    if num_points < 4:
+        return as_path_solution(best_solution, best_cost, start)
+
+    pos = tour_positions(solution)
+    # iteração até a qual a aresta (a, b) não pode voltar à rota
+    tabu_until = [0] * (num_points * num_points)
     no_improv = 0
-    tabu_list = []
 
-    for i in range(max_iterations):
-        candidate_solution = generate_random_solution(num_points)
-        candidate_solution, candidate_cost = local_search(
-            candidate_solution, dist_matrix
-        )
+    for iteration in range(1, max_iterations + 1):
+        if (
+            time_limit is not None
+            and time.perf_counter() - started_at >= time_limit
+        ):
+            break
 
-        if candidate_cost < best_cost:
-            best_solution = candidate_solution
-            best_cost = candidate_cost
-            no_improv = 0
-        else:
-            no_improv += 1
+        best_move = None
+        best_delta = float("inf")
+        for a in range(num_points):
+            i = pos[a]
+            b = solution[(i + 1) % num_points]
+            for c in neighbor_lists[a]:
+                j = pos[c]
+                d = solution[(j + 1) % num_points]
+                if (
+                    c != b
+                    and d != a
+                    and (a, b) not in fixed_edges
+                    and (c, d) not in fixed_edges
+                ):
+                    delta = two_opt_delta(dist, a, b, c, d)
+                    if delta < best_delta and (
+                        (
+                            tabu_until[a * num_points + c] <= iteration
+                            and tabu_until[b * num_points + d] <= iteration
+                        )
+                        or cost + delta < best_cost - EPSILON
+                    ):
+                        best_delta = delta
+                        best_move = (reverse_segment, (i + 1) % num_points, j)
+
+                delta = swap_delta(solution, dist, i, j)
+                if delta < best_delta:
+                    removed, added = swap_edges(solution, i, j)
+                    if fixed_edges and any(
+                        edge in fixed_edges for edge in removed
+                    ):
+                        continue
+                    if cost + delta < best_cost - EPSILON or all(
+                        tabu_until[x * num_points + y] <= iteration
+                        for x, y in added
+                    ):
+                        best_delta = delta
+                        best_move = (apply_swap, i, j)
+
+        if best_move is None:
+            break
 
-        tabu_list.append((best_solution, best_cost))
+        apply_move, i, j = best_move
+        if apply_move is reverse_segment:
+            removed = (
+                (solution[i - 1], solution[i]),
+                (solution[j], solution[(j + 1) % num_points]),
+            )
+        else:
+            removed, _ = swap_edges(solution, i, j)
+        apply_move(solution, pos, i, j)
+        cost += best_delta
 
-        if len(tabu_list) > tabu_tenure:
-            tabu_list.pop(0)
+        for x, y in removed:
+            tabu_until[x * num_points + y] = iteration + tabu_tenure
+            tabu_until[y * num_points + x] = iteration + tabu_tenure
 
+        if cost < best_cost - EPSILON:
+            best_solution, best_cost = solution[:], cost
+            no_improv = 0
+        else:
+            no_improv += 1
         if no_improv >= max_no_improv:
             break
 
-    return best_solution, best_cost
+    return as_path_solution(
+        best_solution, calculate_solution_cost(best_solution, dist), start
+    )
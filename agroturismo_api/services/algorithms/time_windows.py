@@ -0,0 +1,331 @@
+import time
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from .auto import HELD_KARP
+from .local_search import EPSILON, MAX_SEGMENT_LENGTH
+
+TIME_WINDOWS_LOCAL_SEARCH = "time-windows-local-search"
+
+# (atraso total, fim da última visita, tempo total de deslocamento)
+ScheduleKey = Tuple[float, float, float]
+
+
+class TimeWindowSolution(NamedTuple):
+    tour: List[int]  # começa no ponto de partida (0)
+    start_times: List[float]  # início da visita em cada posição, em minutos
+    finish_time: float
+    travel_time: float
+    late_points: List[int]  # pontos que só podem ser visitados fora do horário
+    solver: str
+
+
+def service_start(
+    arrival: float, opens: List[float], latest: List[float]
+) -> Tuple[float, float]:
+    """
+    Função que retorna quando a visita começa e quanto ela atrasa, para a
+    chegada dada: a visita começa no primeiro intervalo em que ainda cabe,
+    esperando a abertura se preciso; se não couber em nenhum, começa na
+    chegada e o atraso é contado a partir do último horário possível
+    """
+    for open_at, latest_start in zip(opens, latest):
+        if arrival <= latest_start:
+            return max(arrival, open_at), 0.0
+    return arrival, arrival - max(latest)
+
+
+def _is_better(a: ScheduleKey, b: ScheduleKey) -> bool:
+    for x, y in zip(a, b):
+        if x < y - EPSILON:
+            return True
+        if x > y + EPSILON:
+            return False
+    return False
+
+
+class Schedule:
+    """
+    Horários de uma rota que sai do ponto 0, guardados por posição para que
+    um movimento seja avaliado a partir da primeira posição alterada
+
+    Como esperar a abertura é permitido, os horários das rotas costumam
+    voltar a coincidir logo depois do trecho alterado; a partir daí o
+    restante da rota é igual e a avaliação termina sem percorrê-lo.
+    """
+
+    def __init__(self, route, travel, opens, latest, service, start_time):
+        self.route = route
+        self.travel = travel
+        self.opens = opens
+        self.latest = latest
+        self.service = service
+        self.start_time = start_time
+        n = len(route)
+        self.starts = [0.0] * n
+        self.ready = [0.0] * n  # fim da visita em cada posição
+        self.late = [0.0] * n  # atraso acumulado
+        self.moved = [0.0] * n  # deslocamento acumulado
+        self.rebuild(0)
+
+    @property
+    def key(self) -> ScheduleKey:
+        return self.late[-1], self.ready[-1], self.moved[-1]
+
+    def rebuild(self, first: int) -> None:
+        route = self.route
+        if first == 0:
+            self.starts[0] = self.start_time
+            self.ready[0] = self.start_time + self.service[route[0]]
+            first = 1
+        t, late, moved = (
+            self.ready[first - 1],
+            self.late[first - 1],
+            self.moved[first - 1],
+        )
+        for p in range(first, len(route)):
+            prev, node = route[p - 1], route[p]
+            moved += self.travel[prev][node]
+            start, lateness = service_start(
+                t + self.travel[prev][node],
+                self.opens[node],
+                self.latest[node],
+            )
+            late += lateness
+            t = start + self.service[node]
+            self.starts[p], self.ready[p] = start, t
+            self.late[p], self.moved[p] = late, moved
+
+    def evaluate(self, first: int, changed: List[int]) -> ScheduleKey:
+        """
+        Avalia a rota em que as posições a partir de `first` passam a ter os
+        pontos `changed`, seguidos do restante da rota atual
+        """
+        route, travel = self.route, self.travel
+        t = self.ready[first - 1]
+        late = self.late[first - 1]
+        moved = self.moved[first - 1]
+        prev = route[first - 1]
+        for node in changed:
+            moved += travel[prev][node]
+            start, lateness = service_start(
+                t + travel[prev][node], self.opens[node], self.latest[node]
+            )
+            late += lateness
+            t = start + self.service[node]
+            prev = node
+
+        for p in range(first + len(changed), len(route)):
+            if prev == route[p - 1] and abs(t - self.ready[p - 1]) <= EPSILON:
+                # daqui em diante os horários são os mesmos da rota atual
+                return (
+                    late + self.late[-1] - self.late[p - 1],
+                    self.ready[-1],
+                    moved + self.moved[-1] - self.moved[p - 1],
+                )
+            node = route[p]
+            moved += travel[prev][node]
+            start, lateness = service_start(
+                t + travel[prev][node], self.opens[node], self.latest[node]
+            )
+            late += lateness
+            t = start + self.service[node]
+            prev = node
+        return late, t, moved
+
+    def apply(self, first: int, changed: List[int]) -> None:
+        self.route[first : first + len(changed)] = changed
+        self.rebuild(first)
+
+
+def _moves(route: List[int], i: int, last: int):
+    """
+    Gera os movimentos da posição i como (primeira posição alterada, novos
+    pontos a partir dela): realocação do segmento de até MAX_SEGMENT_LENGTH
+    pontos que começa em i, inversão de trechos (2-opt) e troca de pontos
+    """
+    for length in range(1, MAX_SEGMENT_LENGTH + 1):
+        if i + length - 1 > last:
+            break
+        segment = route[i : i + length]
+        for p in range(0, last + 1):
+            if i - 1 <= p <= i + length - 1:
+                continue
+            if p > i:
+                yield i, route[i + length : p + 1] + segment
+            else:
+                yield p + 1, segment + route[p + 1 : i]
+    for j in range(i + 1, last + 1):
+        yield i, route[i : j + 1][::-1]
+        if j > i + 1:
+            yield i, [route[j]] + route[i + 1 : j] + [route[i]]
+
+
+def time_windows_local_search(
+    schedule: Schedule,
+    fixed_end: bool,
+    time_limit: Optional[float] = None,
+) -> Schedule:
+    """
+    Função que aplica o primeiro movimento que melhora a rota até chegar a
+    um ótimo local, comparando primeiro o atraso, depois o fim da última
+    visita e por último o tempo de deslocamento
+
+    As posições são percorridas em ciclo, continuando de onde a última
+    melhoria parou, até uma volta inteira sem melhorias.
+    """
+    deadline = None
+    if time_limit is not None:
+        deadline = time.perf_counter() + time_limit
+    last = len(schedule.route) - 1 - (1 if fixed_end else 0)
+    i, without_improvement = 1, 0
+    while without_improvement < last:
+        improved = False
+        for first, changed in _moves(schedule.route, i, last):
+            if _is_better(schedule.evaluate(first, changed), schedule.key):
+                schedule.apply(first, changed)
+                improved = True
+                break
+        if deadline is not None and time.perf_counter() >= deadline:
+            break
+        without_improvement = 0 if improved else without_improvement + 1
+        i = i % last + 1
+    return schedule
+
+
+def held_karp_time_windows(
+    travel: np.ndarray,
+    opens: np.ndarray,
+    latest: np.ndarray,
+    service: np.ndarray,
+    start_time: float,
+    end: Optional[int] = None,
+) -> Optional[List[int]]:
+    """
+    Função que encontra de forma exata a rota que sai do ponto 0 e termina
+    as visitas o mais cedo possível dentro dos horários, pela programação
+    dinâmica de Held-Karp sobre o menor horário de término em cada estado
+
+    Como chegar mais cedo nunca atrasa as visitas seguintes, basta guardar o
+    menor horário de término de cada estado. Retorna None quando não há rota
+    que respeite todos os horários.
+    """
+    num_points = travel.shape[0]
+    m = num_points - 1
+    if m == 0:
+        return [0]
+
+    full = 1 << m
+    between = travel[1:, 1:]
+    bits = np.arange(m)
+    last = None if end is None else end - 1
+
+    def ready_at(arrival: np.ndarray, point: np.ndarray) -> np.ndarray:
+        start = np.full(np.shape(arrival), np.inf)
+        # os primeiros intervalos têm preferência, então são aplicados por
+        # último
+        for k in reversed(range(opens.shape[1])):
+            fits = arrival <= latest[point, k]
+            start = np.where(fits, np.maximum(arrival, opens[point, k]), start)
+        return start + service[point]
+
+    dp = np.full((full, m), np.inf)
+    parent = np.full((full, m), -1, dtype=np.int16)
+    dp[1 << bits, bits] = ready_at(start_time + travel[0, 1:], bits + 1)
+
+    masks = np.arange(full)
+    popcount = np.zeros(full, dtype=np.int16)
+    for bit in bits:
+        popcount += (masks >> bit) & 1
+
+    for size in range(2, m + 1):
+        layer = masks[popcount == size]
+        for j in bits:
+            with_j = layer[(layer >> j) & 1 == 1]
+            candidates = dp[with_j ^ (1 << j)] + between[:, j]
+            if last is not None:
+                # o ponto final não pode ser seguido por outro
+                candidates[:, last] = np.inf
+            best = np.argmin(candidates, axis=1)
+            arrival = candidates[np.arange(len(with_j)), best]
+            dp[with_j, j] = ready_at(arrival, j + 1)
+            parent[with_j, j] = best
+
+    j = int(np.argmin(dp[full - 1])) if last is None else last
+    if not np.isfinite(dp[full - 1, j]):
+        return None
+
+    path = []
+    mask = full - 1
+    while j != -1:
+        path.append(j + 1)
+        mask, j = mask ^ (1 << j), int(parent[mask, j])
+    return [0] + path[::-1]
+
+
+def solve_tsptw(
+    travel,
+    opens,
+    closes,
+    service,
+    start_time: float,
+    end: Optional[int] = None,
+    held_karp_max_stops: int = 0,
+    time_limit: Optional[float] = None,
+) -> TimeWindowSolution:
+    """
+    Função que calcula a rota que sai do ponto 0 no horário `start_time` e
+    visita todos os pontos dentro dos seus horários de funcionamento
+
+    `travel` tem os tempos de deslocamento (minutos), `opens` e `closes` os
+    intervalos de funcionamento de cada ponto (minutos desde a meia-noite,
+    um intervalo por coluna, com inf/-inf nos que não existem) e `service`
+    a duração de cada visita. Até `held_karp_max_stops` pontos a rota é
+    exata; acima disso parte da ordem pelo fechamento e é melhorada pela
+    busca local. A rota termina em `end`, se informado.
+    """
+    travel = np.asarray(travel, dtype=np.float64)
+    opens = np.asarray(opens, dtype=np.float64)
+    service = np.asarray(service, dtype=np.float64)
+    latest = np.asarray(closes, dtype=np.float64) - service[:, np.newaxis]
+    num_points = travel.shape[0]
+
+    route, solver = None, TIME_WINDOWS_LOCAL_SEARCH
+    if num_points - 1 <= held_karp_max_stops:
+        route = held_karp_time_windows(
+            travel, opens, latest, service, start_time, end
+        )
+        solver = HELD_KARP
+    if route is None:
+        # ordem inicial: quem fecha primeiro é visitado primeiro
+        stops = [point for point in range(1, num_points) if point != end]
+        stops.sort(key=lambda point: np.max(latest[point]))
+        route = [0, *stops] + ([] if end is None else [end])
+        solver = TIME_WINDOWS_LOCAL_SEARCH
+
+    schedule = Schedule(
+        route,
+        travel.tolist(),
+        opens.tolist(),
+        latest.tolist(),
+        service.tolist(),
+        start_time,
+    )
+    # com a rota exata, a busca local só reduz o deslocamento sem atrasar o
+    # fim das visitas
+    time_windows_local_search(schedule, end is not None, time_limit)
+
+    late_points = [
+        schedule.route[p]
+        for p in range(1, num_points)
+        if schedule.late[p] - schedule.late[p - 1] > EPSILON
+    ]
+    return TimeWindowSolution(
+        schedule.route,
+        schedule.starts,
+        schedule.ready[-1],
+        schedule.moved[-1],
+        late_points,
+        solver,
+    )
@@ -0,0 +1,340 @@
+import asyncio
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.engine import Connection
+
+from ..core.config import AUTOCOMPLETE_REFRESH_INTERVAL
+from ..models.category import Category
+from ..models.local import Local
+from ..models.tag import Tag
+from .session_changes import CommitListener, FlushChanges
+from .text_search import CATEGORY, LOCAL, TAG, fold_text, search_terms
+
+Key = Tuple[str, int]  # (tipo, id)
+
+# máximo de candidatos por palavra quando a busca tem mais de uma
+MAX_TERM_CANDIDATES = 1000
+
+# atributos indexados de cada modelo
+INDEXED_ATTRIBUTES = {
+    Local: ("name", "slug"),
+    Category: ("name", "slug"),
+    Tag: ("content",),
+}
+
+
+class Suggestion(BaseModel):
+    type: str
+    id: int
+    name: str
+    slug: Optional[str] = None
+
+
+class _Entry(NamedTuple):
+    suggestion: Suggestion
+    words: Tuple[str, ...]
+
+
+class _Node:
+    __slots__ = ("children", "keys")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        # entradas com uma palavra que termina neste nó
+        self.keys: Set[Key] = set()
+
+
+def max_distance(term: str) -> int:
+    """
+    Função que define quantos erros de digitação são tolerados em uma
+    palavra, de acordo com o seu tamanho
+    """
+    if len(term) < 4:
+        return 0
+    return 1 if len(term) < 8 else 2
+
+
+class AutocompleteIndex(CommitListener):
+    """
+    Índice em memória dos nomes e slugs dos locais, categorias e tags, sem
+    acentos, para o autocompletar da busca
+
+    As palavras ficam em uma trie: a busca percorre os nós que começam com
+    cada palavra digitada, tolerando erros de digitação pela distância de
+    edição calculada ao longo da trie, e as palavras mais curtas (mais
+    próximas do que foi digitado) vêm primeiro. Cada processo tem o seu
+    índice, atualizado pelas suas escritas e reconstruído a cada
+    AUTOCOMPLETE_REFRESH_INTERVAL segundos para receber as dos outros.
+    """
+
+    def __init__(self):
+        self._root = _Node()
+        self._entries: Dict[Key, _Entry] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, suggestion: Suggestion) -> None:
+        key = (suggestion.type, suggestion.id)
+        words = tuple(
+            dict.fromkeys(
+                search_terms(fold_text(suggestion.name))
+                + search_terms(fold_text(suggestion.slug or ""))
+            )
+        )
+        with self._lock:
+            self.remove(*key)
+            self._entries[key] = _Entry(suggestion, words)
+            for word in words:
+                node = self._root
+                for char in word:
+                    node = node.children.setdefault(char, _Node())
+                node.keys.add(key)
+
+    def remove(self, entity_type: str, entity_id: int) -> None:
+        key = (entity_type, entity_id)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return
+            for word in entry.words:
+                self._remove_word(word, key)
+
+    def _remove_word(self, word: str, key: Key) -> None:
+        path = [self._root]
+        for char in word:
+            node = path[-1].children.get(char)
+            if node is None:
+                return
+            path.append(node)
+        path[-1].keys.discard(key)
+        # remove os nós que ficaram vazios, de baixo para cima
+        for depth in range(len(word), 0, -1):
+            node = path[depth]
+            if node.keys or node.children:
+                break
+            del path[depth - 1].children[word[depth - 1]]
+
+    def replace_all(self, suggestions: Iterable[Suggestion]) -> None:
+        index = AutocompleteIndex()
+        for suggestion in suggestions:
+            index.add(suggestion)
+        with self._lock:
+            self._root, self._entries = index._root, index._entries
+
+    def _collect(
+        self,
+        node: _Node,
+        score: Tuple[int, int],
+        found: Dict[Key, Tuple[int, int]],
+        limit: int,
+    ) -> None:
+        # busca em largura: as palavras mais curtas primeiro
+        distance, extra = score
+        queue = deque([(node, extra)])
+        while queue and len(found) < limit:
+            node, extra = queue.popleft()
+            for key in node.keys:
+                if found.get(key, (distance + 1, 0)) > (distance, extra):
+                    found[key] = (distance, extra)
+                    if len(found) >= limit:
+                        return
+            for child in node.children.values():
+                queue.append((child, extra + 1))
+
+    def _match_term(
+        self, term: str, limit: int, fuzzy: bool
+    ) -> Dict[Key, Tuple[int, int]]:
+        """
+        Entradas com uma palavra que começa com `term`, com a pontuação
+        (erros de digitação, letras a mais) da melhor palavra
+        """
+        found: Dict[Key, Tuple[int, int]] = {}
+        node = self._root
+        for char in term:
+            node = node.children.get(char)
+            if node is None:
+                break
+        else:
+            self._collect(node, (0, 0), found, limit)
+
+        k = max_distance(term) if fuzzy else 0
+        if k == 0 or len(found) >= limit:
+            return found
+
+        # distância de edição (com transposições) entre o termo e cada
+        # prefixo da trie, uma linha da programação dinâmica por nó. A
+        # primeira letra tem que estar certa, o que limita a busca a uma
+        # subárvore
+        first_node = self._root.children.get(term[0])
+        if first_node is None:
+            return found
+        first_row = list(range(len(term) + 1))
+        stack = [(first_node, term[0], first_row, "", None)]
+        while stack:
+            node, char, previous_row, previous_char, before_row = stack.pop()
+            row = [previous_row[0] + 1]
+            for j in range(1, len(term) + 1):
+                cost = min(
+                    row[j - 1] + 1,
+                    previous_row[j] + 1,
+                    previous_row[j - 1] + (term[j - 1] != char),
+                )
+                if (
+                    j > 1
+                    and term[j - 1] == previous_char
+                    and term[j - 2] == char
+                ):
+                    cost = min(cost, before_row[j - 2] + 1)
+                row.append(cost)
+            if row[-1] <= k:
+                # o prefixo até aqui corresponde ao termo: toda a subárvore
+                self._collect(node, (row[-1], 0), found, limit)
+                if len(found) >= limit:
+                    break
+                continue
+            if min(row) <= k:
+                stack.extend(
+                    (child, next_char, row, char, previous_row)
+                    for next_char, child in node.children.items()
+                )
+        return found
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        types: Optional[Iterable[str]] = None,
+        fuzzy: bool = True,
+    ) -> List[Suggestion]:
+        """
+        Retorna as entradas que têm, para cada palavra da busca, uma palavra
+        que começa com ela (com erros de digitação, se `fuzzy`)
+        """
+        terms = search_terms(fold_text(query))
+        if not terms:
+            return []
+        types = set(types) if types else None
+        # com uma só palavra a busca em largura já traz as melhores; com
+        # mais, as palavras são cruzadas e precisam de mais candidatos
+        term_limit = (
+            limit if len(terms) == 1 and not types else MAX_TERM_CANDIDATES
+        )
+
+        with self._lock:
+            scores: Optional[Dict[Key, Tuple[int, int]]] = None
+            for term in terms:
+                found = self._match_term(term, term_limit, fuzzy)
+                if scores is None:
+                    scores = found
+                else:
+                    scores = {
+                        key: (
+                            scores[key][0] + found[key][0],
+                            scores[key][1] + found[key][1],
+                        )
+                        for key in scores.keys() & found.keys()
+                    }
+            entries = [
+                (score, self._entries[key].suggestion)
+                for key, score in scores.items()
+                if types is None or key[0] in types
+            ]
+
+        entries.sort(
+            key=lambda item: (item[0], len(item[1].name), item[1].name)
+        )
+        return [suggestion for _, suggestion in entries[:limit]]
+
+    def build(self, connection: Connection) -> None:
+        """
+        Reconstrói o índice a partir do banco
+        """
+        local, category = Local.__table__, Category.__table__
+        tag = Tag.__table__
+        suggestions = [
+            Suggestion(type=LOCAL, id=row.id, name=row.name, slug=row.slug)
+            for row in connection.execute(
+                select(local.c.id, local.c.name, local.c.slug)
+            )
+        ]
+        suggestions += [
+            Suggestion(type=CATEGORY, id=row.id, name=row.name, slug=row.slug)
+            for row in connection.execute(
+                select(category.c.id, category.c.name, category.c.slug)
+            )
+        ]
+        suggestions += [
+            Suggestion(type=TAG, id=row.id, name=row.content)
+            for row in connection.execute(select(tag.c.id, tag.c.content))
+        ]
+        self.replace_all(suggestions)
+
+    async def refresh_periodically(self, engine) -> None:
+        """
+        Reconstrói o índice a cada AUTOCOMPLETE_REFRESH_INTERVAL segundos,
+        fora do event loop
+        """
+        loop = asyncio.get_running_loop()
+
+        def rebuild():
+            with engine.connect() as connection:
+                self.build(connection)
+
+        while True:
+            await asyncio.sleep(AUTOCOMPLETE_REFRESH_INTERVAL)
+            await loop.run_in_executor(None, rebuild)
+
+    # Atualização incremental: as alterações de cada flush são guardadas na
+    # sessão e só entram no índice quando a transação é confirmada
+
+    info_key = "autocomplete"
+
+    def watched_attributes(self, instance) -> Iterable[str]:
+        return INDEXED_ATTRIBUTES.get(type(instance), ())
+
+    def collect(self, changes: FlushChanges):
+        for instance in changes.new + changes.dirty:
+            suggestion = _suggestion(instance)
+            if suggestion is not None:
+                yield (suggestion.type, suggestion.id), suggestion
+        for instance in changes.deleted:
+            suggestion = _suggestion(instance)
+            if suggestion is not None:
+                yield (suggestion.type, suggestion.id), None
+
+    def apply(self, pending: Dict[Key, Optional[Suggestion]]) -> None:
+        for key, suggestion in pending.items():
+            if suggestion is None:
+                self.remove(*key)
+            else:
+                self.add(suggestion)
+
+
+def _suggestion(instance) -> Optional[Suggestion]:
+    if getattr(instance, "id", None) is None:
+        return None
+    if isinstance(instance, Local):
+        return Suggestion(
+            type=LOCAL, id=instance.id, name=instance.name, slug=instance.slug
+        )
+    if isinstance(instance, Category):
+        return Suggestion(
+            type=CATEGORY,
+            id=instance.id,
+            name=instance.name,
+            slug=instance.slug,
+        )
+    if isinstance(instance, Tag):
+        return Suggestion(type=TAG, id=instance.id, name=instance.content)
+    return None
+
+
+autocomplete_index = AutocompleteIndex()
+
+autocomplete_index.listen()
@@ -0,0 +1,378 @@
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import (
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import numpy as np
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, delete, or_, select
+
+from ..core.config import DISTANCE_CACHE_SIZE
+from ..models.cost import Cost
+from ..utils import calculate_distance_matrix
+from .routing_provider import HaversineProvider, RoutingProvider
+
+# (distância em km, duração em minutos ou None quando é só uma estimativa)
+CachedCost = Tuple[float, Optional[int]]
+PairKey = Tuple[int, int]
+# (origem, destino, métrica)
+CostKey = Tuple[int, int, str]
+
+HAVERSINE_METRIC = HaversineProvider.name
+
+# recebe as coordenadas de origem e de destino e retorna as matrizes
+# retangulares de distâncias (km) e de durações (minutos, opcional)
+ComputeCosts = Callable[
+    [np.ndarray, np.ndarray], Tuple[np.ndarray, Optional[np.ndarray]]
+]
+
+
+class _MatrixRequest(NamedTuple):
+    ids: Sequence[Optional[int]]
+    metric: str
+    coords: np.ndarray
+    distances: np.ndarray
+    durations: np.ndarray
+    missing: np.ndarray
+    stored: Dict[PairKey, Cost]
+    blocks: List[Tuple[np.ndarray, np.ndarray]]  # (linhas, colunas)
+
+
+def haversine_costs(origins, destinations):
+    """
+    Função que calcula as distâncias em linha reta, sem duração
+    """
+    return calculate_distance_matrix(origins, destinations), None
+
+
+class PairLRUCache:
+    """
+    Cache LRU em memória dos pares (origem, destino) mais consultados, de
+    cada métrica
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[CostKey, CachedCost]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: CostKey) -> Optional[CachedCost]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key: CostKey, value: CachedCost) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard_local(self, local_id: int) -> None:
+        with self._lock:
+            for key in [k for k in self._data if local_id in k[:2]]:
+                del self._data[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+pair_cache = PairLRUCache(DISTANCE_CACHE_SIZE)
+
+
+class DistanceCache:
+    """
+    Cache de distâncias e durações entre locais, persistido na tabela `cost`
+    e com um LRU em memória na frente para os pares mais usados
+
+    Cada custo guarda a sua métrica (a linha reta ou o provedor de rotas que
+    o calculou), e uma matriz só usa os custos da métrica pedida.
+    """
+
+    def __init__(self, session: Session, lru: PairLRUCache = pair_cache):
+        self.session = session
+        self.lru = lru
+
+    def load(
+        self, ids: Sequence[int], metric: str = HAVERSINE_METRIC
+    ) -> Dict[PairKey, Cost]:
+        """
+        Carrega, com uma única consulta, os custos já salvos entre os locais
+        na métrica informada
+        """
+        ids = list(set(ids))
+        if not ids:
+            return {}
+        costs = self.session.exec(
+            select(Cost).where(
+                Cost.metric == metric,
+                Cost.local_origin_id.in_(ids),
+                Cost.local_destination_id.in_(ids),
+            )
+        ).all()
+        return {
+            (cost.local_origin_id, cost.local_destination_id): cost
+            for cost in costs
+        }
+
+    def get_matrices(
+        self,
+        ids: Sequence[Optional[int]],
+        coords,
+        compute: ComputeCosts = haversine_costs,
+        metric: str = HAVERSINE_METRIC,
+        require_duration: bool = False,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Retorna as matrizes de distâncias (km) e durações (minutos, NaN quando
+        desconhecida) entre os pontos, calculando com `compute` apenas os
+        pares que não estão no cache da `metric` que ele calcula. Pontos com
+        id None (por exemplo, a posição atual do usuário) são sempre
+        calculados e nunca salvos.
+        """
+        request = self._plan(ids, coords, metric, require_duration)
+        blocks = [
+            compute(request.coords[rows], request.coords[cols])
+            for rows, cols in request.blocks
+        ]
+        return self._complete(request, blocks)
+
+    async def get_matrices_async(
+        self,
+        ids: Sequence[Optional[int]],
+        coords,
+        provider: RoutingProvider,
+        require_duration: bool = False,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Igual a `get_matrices`, mas com os pares que faltam obtidos do
+        provedor de rotas, com os blocos consultados em paralelo
+        """
+        request = self._plan(ids, coords, provider.metric, require_duration)
+        blocks = await asyncio.gather(
+            *(
+                provider.table(request.coords[rows], request.coords[cols])
+                for rows, cols in request.blocks
+            )
+        )
+        return self._complete(request, blocks)
+
+    def _plan(
+        self,
+        ids: Sequence[Optional[int]],
+        coords,
+        metric: str,
+        require_duration: bool,
+    ) -> "_MatrixRequest":
+        """
+        Preenche as matrizes com o que já está no cache e define os blocos
+        (linhas x colunas) que ainda precisam ser calculados
+        """
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        num_points = len(ids)
+        distances = np.zeros((num_points, num_points))
+        durations = np.full((num_points, num_points), np.nan)
+        np.fill_diagonal(durations, 0)
+        missing = ~np.eye(num_points, dtype=bool)
+
+        def usable(value: Optional[CachedCost]) -> bool:
+            return value is not None and (
+                not require_duration or value[1] is not None
+            )
+
+        def fill(i: int, j: int, value: CachedCost) -> None:
+            distances[i, j] = value[0]
+            if value[1] is not None:
+                durations[i, j] = value[1]
+            missing[i, j] = False
+
+        uncached = [i for i, id in enumerate(ids) if id is None]
+        lookups = []
+        for i, origin_id in enumerate(ids):
+            for j, destination_id in enumerate(ids):
+                if i == j or origin_id is None or destination_id is None:
+                    continue
+                if origin_id == destination_id:
+                    missing[i, j] = False
+                    continue
+                value = self.lru.get((origin_id, destination_id, metric))
+                if usable(value):
+                    fill(i, j, value)
+                else:
+                    lookups.append((i, j))
+
+        stored = {}
+        if lookups:
+            stored = self.load(
+                [ids[i] for i, _ in lookups] + [ids[j] for _, j in lookups],
+                metric,
+            )
+            for i, j in lookups:
+                cost = stored.get((ids[i], ids[j]))
+                if cost is None:
+                    continue
+                value = (cost.distance, cost.duration)
+                self.lru.put((ids[i], ids[j], metric), value)
+                if usable(value):
+                    fill(i, j, value)
+
+        # as linhas dos pontos sem id são calculadas inteiras; o restante
+        # em um único bloco com as linhas e colunas que ainda faltam
+        blocks = []
+        if uncached:
+            blocks.append((np.array(uncached), np.arange(num_points)))
+        rest = missing.copy()
+        rest[uncached] = False
+        rows = np.flatnonzero(rest.any(axis=1))
+        if rows.size:
+            blocks.append((rows, np.flatnonzero(rest[rows].any(axis=0))))
+        return _MatrixRequest(
+            ids, metric, coords, distances, durations, missing, stored, blocks
+        )
+
+    def _complete(
+        self, request: "_MatrixRequest", results
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        distances, durations = request.distances, request.durations
+        computed_pairs = []
+        for (rows, cols), block in zip(request.blocks, results):
+            computed_pairs += self._fill_block(
+                distances, durations, request.missing, block, rows, cols
+            )
+
+        ids = request.ids
+        self._store(
+            [
+                (ids[i], ids[j], distances[i, j], durations[i, j])
+                for i, j in computed_pairs
+                if ids[i] is not None and ids[j] is not None
+            ],
+            request.stored,
+            request.metric,
+        )
+        return distances, durations
+
+    def get_matrix(
+        self,
+        ids: Sequence[Optional[int]],
+        coords,
+        compute: ComputeCosts = haversine_costs,
+        metric: str = HAVERSINE_METRIC,
+        require_duration: bool = False,
+    ) -> np.ndarray:
+        distances, _ = self.get_matrices(
+            ids, coords, compute, metric, require_duration
+        )
+        return distances
+
+    def fill_haversine(self, ids: Sequence[int], coords) -> None:
+        """
+        Preenche a tabela `cost` com as distâncias em linha reta que faltam
+        """
+        self.get_matrices(ids, coords)
+
+    def fill_from_table(
+        self,
+        ids: Sequence[int],
+        metric: str,
+        distances,
+        durations=None,
+    ) -> None:
+        """
+        Salva uma matriz de distâncias (km) e durações (minutos) obtida de um
+        serviço de rotas no formato do OSRM, na `metric` desse serviço
+        """
+        distances = np.asarray(distances, dtype=np.float64)
+        if durations is None:
+            durations = np.full(distances.shape, np.nan)
+        durations = np.asarray(durations, dtype=np.float64)
+        self._store(
+            [
+                (origin_id, destination_id, distances[i, j], durations[i, j])
+                for i, origin_id in enumerate(ids)
+                for j, destination_id in enumerate(ids)
+                if origin_id != destination_id
+            ],
+            self.load(ids, metric),
+            metric,
+        )
+
+    def invalidate(self, local_id: int) -> None:
+        """
+        Remove os custos de/para um local, por exemplo quando as suas
+        coordenadas mudam
+        """
+        self.lru.discard_local(local_id)
+        self.session.exec(
+            delete(Cost).where(
+                or_(
+                    Cost.local_origin_id == local_id,
+                    Cost.local_destination_id == local_id,
+                )
+            )
+        )
+
+    @staticmethod
+    def _fill_block(distances, durations, missing, block, rows, cols):
+        block_distances, block_durations = block
+        index = np.ix_(rows, cols)
+        block_missing = missing[index]
+        distances[index] = np.where(
+            block_missing, block_distances, distances[index]
+        )
+        if block_durations is not None:
+            durations[index] = np.where(
+                block_missing, block_durations, durations[index]
+            )
+        missing[index] = False
+        r, c = np.nonzero(block_missing)
+        return list(zip(rows[r].tolist(), cols[c].tolist()))
+
+    def _store(self, rows, stored: Dict[PairKey, Cost], metric: str) -> None:
+        for origin_id, destination_id, distance, duration in rows:
+            if not np.isfinite(distance):
+                continue
+            duration = int(round(duration)) if np.isfinite(duration) else None
+            key = (origin_id, destination_id)
+            cost = stored.get(key)
+            if cost is None:
+                cost = Cost(
+                    local_origin_id=origin_id,
+                    local_destination_id=destination_id,
+                    metric=metric,
+                )
+            cost.distance = float(distance)
+            if duration is not None or cost.duration is None:
+                cost.duration = duration
+            self.session.add(cost)
+            self.lru.put((*key, metric), (cost.distance, cost.duration))
+
+        if not rows:
+            return
+        # salvar custos não altera os demais objetos da sessão, então não há
+        # por que expirá-los (e recarregá-los um a um depois do commit)
+        expire_on_commit = self.session.expire_on_commit
+        self.session.expire_on_commit = False
+        try:
+            self.session.commit()
+        except IntegrityError:
+            # outra requisição salvou os mesmos pares ao mesmo tempo
+            self.session.rollback()
+        finally:
+            self.session.expire_on_commit = expire_on_commit
@@ -0,0 +1,153 @@
+import base64
+import io
+from typing import BinaryIO, List, NamedTuple, Optional, Sequence
+
+from PIL import Image, ImageFilter, ImageOps, UnidentifiedImageError
+
+from ..core.config import (
+    IMAGE_JPEG_QUALITY,
+    IMAGE_PLACEHOLDER_WIDTH,
+    IMAGE_VARIANT_FORMATS,
+    IMAGE_VARIANT_WIDTHS,
+    IMAGE_WEBP_QUALITY,
+)
+
+FORMAT_EXTENSIONS = {"webp": "webp", "jpeg": "jpg"}
+FORMAT_MEDIA_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg"}
+PLACEHOLDER_QUALITY = 40
+PLACEHOLDER_BLUR_RADIUS = 1
+
+
+class InvalidImageError(ValueError):
+    pass
+
+
+class EncodedVariant(NamedTuple):
+    format: str
+    width: int
+    height: int
+    content: bytes
+
+    @property
+    def extension(self) -> str:
+        return FORMAT_EXTENSIONS[self.format]
+
+    def data_uri(self) -> str:
+        content = base64.b64encode(self.content).decode()
+        return f"data:{FORMAT_MEDIA_TYPES[self.format]};base64,{content}"
+
+
+class ProcessedImage(NamedTuple):
+    variants: List[EncodedVariant]  # da menor para a maior
+    placeholder: EncodedVariant
+
+
+def variant_widths(original_width: int, widths: Sequence[int]) -> List[int]:
+    """
+    Função que escolhe as larguras das cópias de uma imagem: as menores que
+    o original e, no lugar das maiores, o próprio original (sem ampliar)
+    """
+    widths = sorted(set(widths))
+    chosen = [width for width in widths if width < original_width]
+    if len(chosen) < len(widths):
+        chosen.append(min(original_width, widths[-1]))
+    return chosen
+
+
+def _to_rgb(image: Image.Image) -> Image.Image:
+    # JPEG não tem transparência: o fundo transparente vira branco
+    if image.mode in ("RGBA", "LA") or (
+        image.mode == "P" and "transparency" in image.info
+    ):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def encode(
+    image: Image.Image,
+    format: str,
+    icc_profile: Optional[bytes] = None,
+    quality: Optional[int] = None,
+) -> EncodedVariant:
+    """
+    Função que codifica a imagem sem os metadados (EXIF, XMP e
+    comentários). Só o perfil de cor é mantido, para não alterar as cores.
+    """
+    options = {}
+    if icc_profile:
+        options["icc_profile"] = icc_profile
+    if format == "jpeg":
+        options.update(
+            quality=quality or IMAGE_JPEG_QUALITY,
+            optimize=True,
+            progressive=True,
+        )
+    elif format == "webp":
+        options.update(quality=quality or IMAGE_WEBP_QUALITY, method=4)
+    else:
+        raise ValueError(f"Formato de imagem não suportado: {format}")
+
+    buffer = io.BytesIO()
+    image.save(buffer, format=format.upper(), **options)
+    return EncodedVariant(format, image.width, image.height, buffer.getvalue())
+
+
+def process_image(
+    file: BinaryIO,
+    widths: Sequence[int] = tuple(map(int, IMAGE_VARIANT_WIDTHS)),
+    formats: Sequence[str] = tuple(IMAGE_VARIANT_FORMATS),
+    placeholder_width: int = IMAGE_PLACEHOLDER_WIDTH,
+) -> ProcessedImage:
+    """
+    Decodifica a imagem uma única vez e gera as cópias redimensionadas em
+    cada formato, além de uma miniatura borrada para mostrar enquanto as
+    cópias carregam
+
+    A orientação do EXIF é aplicada aos pixels antes de descartá-lo. Os
+    JPEGs grandes já são decodificados em escala reduzida (draft) e cada
+    cópia é reduzida a partir da anterior, maior, em vez do original.
+    """
+    try:
+        with Image.open(file) as original:
+            largest = max(widths)
+            original.draft("RGB", (largest, largest))
+            icc_profile = original.info.get("icc_profile")
+            image = _to_rgb(ImageOps.exif_transpose(original))
+    except (
+        UnidentifiedImageError,
+        Image.DecompressionBombError,
+        OSError,
+    ) as error:
+        raise InvalidImageError(str(error)) from error
+
+    resized = []
+    source = image
+    for width in reversed(variant_widths(image.width, widths)):
+        height = max(1, round(image.height * width / image.width))
+        if source.size != (width, height):
+            source = source.resize(
+                (width, height), Image.LANCZOS, reducing_gap=3.0
+            )
+        resized.append(source)
+    resized.reverse()
+
+    variants = [
+        encode(sized, format, icc_profile)
+        for sized in resized
+        for format in formats
+    ]
+
+    smallest = resized[0]
+    placeholder_height = max(
+        1, round(smallest.height * placeholder_width / smallest.width)
+    )
+    placeholder = smallest.resize(
+        (placeholder_width, placeholder_height), Image.BOX
+    ).filter(ImageFilter.GaussianBlur(PLACEHOLDER_BLUR_RADIUS))
+    return ProcessedImage(
+        variants=variants,
+        placeholder=encode(placeholder, "jpeg", quality=PLACEHOLDER_QUALITY),
+    )
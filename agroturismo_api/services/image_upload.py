@@ -0,0 +1,334 @@
+import asyncio
+import io
+import os
+import shutil
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, List, NamedTuple, Optional, Sequence
+
+import cloudinary
+import cloudinary.uploader
+from fastapi import HTTPException, UploadFile, status
+
+from ..core.config import (
+    CLOUDINARY_API_KEY,
+    CLOUDINARY_API_SECRET,
+    CLOUDINARY_CLOUD_NAME,
+    IMAGE_UPLOAD_BACKEND,
+    IMAGE_UPLOAD_CHUNK_SIZE,
+    IMAGE_UPLOAD_CONCURRENCY,
+    IMAGE_UPLOAD_DIR,
+    IMAGE_UPLOAD_URL,
+)
+from .image_processing import InvalidImageError, process_image
+
+# bloco de cópia do armazenamento local
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class UploadedImage(NamedTuple):
+    url: str
+    width: int
+    height: int
+    public_id: str
+
+
+class UploadedVariant(NamedTuple):
+    format: str
+    width: int
+    height: int
+    url: str
+    size: int  # em bytes
+    public_id: Optional[str]
+    placeholder: bool = False
+
+
+class IngestedImage(NamedTuple):
+    image: UploadedImage  # a maior cópia, de preferência em JPEG
+    variants: List[UploadedVariant]  # a miniatura e as cópias, da menor
+
+    @property
+    def public_ids(self) -> List[str]:
+        return [
+            variant.public_id for variant in self.variants if variant.public_id
+        ]
+
+
+def public_id_of(filename: str) -> str:
+    """
+    Função que gera o public_id de uma imagem a partir do nome do arquivo,
+    com a extensão, para que as cópias em formatos diferentes não se
+    sobrescrevam
+    """
+    return filename.replace(".", "-")
+
+
+class ImageUploader:
+    """
+    Destino das imagens enviadas. Os métodos são bloqueantes e rodam no
+    pool de threads do ImageIngest.
+    """
+
+    name: str = ""
+
+    def upload(
+        self, file: BinaryIO, folder: str, filename: str
+    ) -> UploadedImage:
+        raise NotImplementedError
+
+    def delete(self, public_id: str) -> None:
+        raise NotImplementedError
+
+
+class CloudinaryUploader(ImageUploader):
+    """
+    Envia as imagens para o Cloudinary em blocos de `chunk_size` bytes,
+    lidos direto do arquivo recebido, sem carregá-lo inteiro na memória
+    """
+
+    name = "cloudinary"
+
+    def __init__(self, chunk_size: int = IMAGE_UPLOAD_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        cloudinary.config(
+            cloud_name=CLOUDINARY_CLOUD_NAME,
+            api_key=CLOUDINARY_API_KEY,
+            api_secret=CLOUDINARY_API_SECRET,
+            secure=True,
+        )
+
+    def upload(
+        self, file: BinaryIO, folder: str, filename: str
+    ) -> UploadedImage:
+        response = cloudinary.uploader.upload_large(
+            file,
+            folder=folder,
+            public_id=public_id_of(filename),
+            overwrite=True,
+            chunk_size=self.chunk_size,
+        )
+        return UploadedImage(
+            url=response["url"],
+            width=response["width"],
+            height=response["height"],
+            public_id=response["public_id"],
+        )
+
+    def delete(self, public_id: str) -> None:
+        cloudinary.uploader.destroy(public_id)
+
+
+class LocalUploader(ImageUploader):
+    """
+    Guarda as imagens em um diretório local, copiando o arquivo em blocos.
+    Serve para desenvolvimento, testes e benchmarks sem o Cloudinary;
+    `delay` simula o tempo de envio de cada imagem.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        directory: str = IMAGE_UPLOAD_DIR,
+        base_url: str = IMAGE_UPLOAD_URL,
+        delay: float = 0.0,
+    ):
+        self.directory = Path(directory)
+        self.base_url = base_url.rstrip("/")
+        self.delay = delay
+
+    def upload(
+        self, file: BinaryIO, folder: str, filename: str
+    ) -> UploadedImage:
+        public_id = f"{folder}/{os.path.basename(filename)}"
+        path = self.directory / public_id
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as destination:
+            shutil.copyfileobj(file, destination, COPY_BUFFER_SIZE)
+        if self.delay:
+            time.sleep(self.delay)
+        return UploadedImage(
+            url=f"{self.base_url}/{public_id}",
+            width=0,
+            height=0,
+            public_id=public_id,
+        )
+
+    def delete(self, public_id: str) -> None:
+        try:
+            os.remove(self.directory / public_id)
+        except FileNotFoundError:
+            pass
+
+
+IMAGE_UPLOADERS = {
+    CloudinaryUploader.name: CloudinaryUploader,
+    LocalUploader.name: LocalUploader,
+}
+
+
+def get_image_uploader(name: str = IMAGE_UPLOAD_BACKEND) -> ImageUploader:
+    try:
+        return IMAGE_UPLOADERS[name]()
+    except KeyError:
+        raise ValueError(f"Destino de imagens desconhecido: {name}")
+
+
+class ImageIngest:
+    """
+    Envia as imagens em paralelo, até `max_workers` ao mesmo tempo, em um
+    pool de threads próprio, sem bloquear o event loop e sem ocupar o pool
+    usado pelas rotas síncronas
+    """
+
+    def __init__(self, uploader: ImageUploader, max_workers: int):
+        self.uploader = uploader
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="image-upload",
+            )
+        return self._executor
+
+    def ingest(
+        self, file: BinaryIO, folder: str, filename: str
+    ) -> IngestedImage:
+        """
+        Processa uma imagem e envia as suas cópias (bloqueante, roda no
+        pool). Se um envio falhar, as cópias já enviadas são apagadas.
+
+        Os nomes levam um sufixo único, para que um envio nunca sobrescreva
+        (nem, ao ser descartado, apague) as cópias de outra imagem enviada
+        com o mesmo nome de arquivo.
+        """
+        processed = process_image(file)
+        stem = os.path.splitext(os.path.basename(filename))[0]
+        stem = f"{stem}-{uuid.uuid4().hex[:12]}"
+        variants: List[UploadedVariant] = []
+        try:
+            for variant in processed.variants:
+                uploaded = self.uploader.upload(
+                    io.BytesIO(variant.content),
+                    folder,
+                    f"{stem}-{variant.width}w.{variant.extension}",
+                )
+                variants.append(
+                    UploadedVariant(
+                        format=variant.format,
+                        width=variant.width,
+                        height=variant.height,
+                        url=uploaded.url,
+                        size=len(variant.content),
+                        public_id=uploaded.public_id,
+                    )
+                )
+        except Exception:
+            for uploaded_variant in variants:
+                self._delete_quietly(uploaded_variant.public_id)
+            raise
+
+        largest = max(
+            variants,
+            key=lambda variant: (variant.format == "jpeg", variant.width),
+        )
+        placeholder = processed.placeholder
+        variants.insert(
+            0,
+            UploadedVariant(
+                format=placeholder.format,
+                width=placeholder.width,
+                height=placeholder.height,
+                url=placeholder.data_uri(),
+                size=len(placeholder.content),
+                public_id=None,
+                placeholder=True,
+            ),
+        )
+        return IngestedImage(
+            image=UploadedImage(
+                url=largest.url,
+                width=largest.width,
+                height=largest.height,
+                public_id=largest.public_id,
+            ),
+            variants=variants,
+        )
+
+    def _delete_quietly(self, public_id: str) -> None:
+        try:
+            self.uploader.delete(public_id)
+        except Exception:
+            pass
+
+    async def upload(
+        self, files: Sequence[UploadFile], folder: str
+    ) -> List[IngestedImage]:
+        """
+        Processa e envia os arquivos, retornando as imagens na mesma ordem.
+        Se algum falhar, as imagens já enviadas são apagadas.
+        """
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            *(
+                loop.run_in_executor(
+                    self.executor,
+                    self.ingest,
+                    file.file,
+                    folder,
+                    file.filename or "imagem",
+                )
+                for file in files
+            ),
+            return_exceptions=True,
+        )
+        ingested = [
+            result for result in results if isinstance(result, IngestedImage)
+        ]
+        if len(ingested) == len(results):
+            return ingested
+
+        await self.discard(ingested)
+        for file, result in zip(files, results):
+            if isinstance(result, InvalidImageError):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Arquivo de imagem inválido: {file.filename}",
+                )
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="Erro ao enviar as imagens, tente novamente",
+        )
+
+    async def delete(self, public_id: str) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            self.executor, self.uploader.delete, public_id
+        )
+
+    async def discard(self, images: Sequence[IngestedImage]) -> None:
+        """
+        Apaga imagens enviadas que não foram salvas no banco
+        """
+        await asyncio.gather(
+            *(
+                self.delete(public_id)
+                for image in images
+                for public_id in image.public_ids
+            ),
+            return_exceptions=True,
+        )
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+image_ingest = ImageIngest(get_image_uploader(), IMAGE_UPLOAD_CONCURRENCY)
@@ -0,0 +1,159 @@
+import math
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import and_, or_, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..core.config import NEARBY_INITIAL_RADIUS, NEARBY_MAX_RADIUS
+from ..models.local import Local
+from ..utils.haversine_distance import EARTH_RADIUS_KM, haversine_distances
+
+KM_PER_DEGREE = EARTH_RADIUS_KM * math.pi / 180
+
+
+class BoundingBox(NamedTuple):
+    min_latitude: float
+    max_latitude: float
+    # faixas de longitude: duas quando a caixa cruza o antimeridiano
+    longitudes: Tuple[Tuple[float, float], ...]
+
+
+class NearbyLocal(NamedTuple):
+    id: int
+    distance: float  # em km
+
+
+def bounding_box(
+    latitude: float, longitude: float, radius: float
+) -> BoundingBox:
+    """
+    Função que calcula a caixa de latitudes e longitudes que contém o
+    círculo de `radius` km em volta da coordenada
+    """
+    delta_latitude = radius / KM_PER_DEGREE
+    min_latitude = latitude - delta_latitude
+    max_latitude = latitude + delta_latitude
+    if min_latitude <= -90 or max_latitude >= 90:
+        # o círculo contém um polo: todas as longitudes
+        return BoundingBox(
+            max(min_latitude, -90), min(max_latitude, 90), ((-180, 180),)
+        )
+
+    # um grau de longitude encolhe com o cosseno da latitude, então a
+    # largura é calculada na latitude mais distante do equador
+    widest = math.radians(max(abs(min_latitude), abs(max_latitude)))
+    delta_longitude = min(delta_latitude / math.cos(widest), 180)
+    west, east = longitude - delta_longitude, longitude + delta_longitude
+    if delta_longitude >= 180:
+        longitudes = ((-180, 180),)
+    elif west < -180:
+        longitudes = ((west + 360, 180), (-180, east))
+    elif east > 180:
+        longitudes = ((west, 180), (-180, east - 360))
+    else:
+        longitudes = ((west, east),)
+    return BoundingBox(min_latitude, max_latitude, longitudes)
+
+
+def bounding_box_filter(box: BoundingBox):
+    """
+    Condição da caixa sobre as colunas indexadas (latitude, longitude)
+    """
+    return and_(
+        Local.latitude.between(box.min_latitude, box.max_latitude),
+        or_(
+            *(
+                Local.longitude.between(west, east)
+                for west, east in box.longitudes
+            )
+        ),
+    )
+
+
+def rank_by_distance(
+    latitude: float,
+    longitude: float,
+    ids: np.ndarray,
+    coords: np.ndarray,
+    radius: Optional[float],
+    k: Optional[int],
+) -> List[NearbyLocal]:
+    """
+    Função que ordena os candidatos pela distância haversine exata,
+    calculada de uma vez para todos, mantendo os que estão no raio e os `k`
+    mais próximos
+    """
+    if len(ids) == 0:
+        return []
+    distances = haversine_distances(
+        latitude, longitude, coords[:, 0], coords[:, 1]
+    )
+    if radius is not None:
+        inside = distances <= radius
+        ids, distances = ids[inside], distances[inside]
+    if k is not None and k < len(ids):
+        # seleção parcial: só os k mais próximos são ordenados
+        nearest = np.argpartition(distances, k - 1)[:k]
+        ids, distances = ids[nearest], distances[nearest]
+    # empates pelo id, para que a ordem sirva de cursor
+    order = np.lexsort((ids, distances))
+    return [
+        NearbyLocal(int(id), float(distance))
+        for id, distance in zip(ids[order], distances[order])
+    ]
+
+
+async def _candidates(
+    session: AsyncSession,
+    latitude: float,
+    longitude: float,
+    radius: float,
+    category_ids: Optional[Sequence[int]],
+) -> Tuple[np.ndarray, np.ndarray]:
+    # só as colunas do índice (latitude, longitude) e o id, que o SQLite
+    # lê do próprio índice
+    statement = select(Local.id, Local.latitude, Local.longitude).where(
+        bounding_box_filter(bounding_box(latitude, longitude, radius))
+    )
+    if category_ids:
+        statement = statement.where(Local.main_category_id.in_(category_ids))
+    rows = (await session.execute(statement)).all()
+    data = np.array(rows, dtype=np.float64).reshape(-1, 3)
+    return data[:, 0].astype(np.int64), data[:, 1:]
+
+
+async def find_nearby(
+    session: AsyncSession,
+    latitude: float,
+    longitude: float,
+    radius: Optional[float] = None,
+    k: Optional[int] = None,
+    category_ids: Optional[Sequence[int]] = None,
+) -> List[NearbyLocal]:
+    """
+    Locais a até `radius` km da coordenada e/ou os `k` mais próximos, do
+    mais perto para o mais longe
+
+    Os candidatos vêm de uma caixa sobre o índice (latitude, longitude) e
+    são ordenados pela distância exata. Sem raio, a caixa começa com
+    NEARBY_INITIAL_RADIUS km e dobra até conter `k` locais dentro do
+    círculo, o que garante que nenhum local mais próximo ficou de fora.
+    """
+    if radius is not None:
+        ids, coords = await _candidates(
+            session, latitude, longitude, radius, category_ids
+        )
+        return rank_by_distance(latitude, longitude, ids, coords, radius, k)
+
+    search_radius = NEARBY_INITIAL_RADIUS
+    while True:
+        ids, coords = await _candidates(
+            session, latitude, longitude, search_radius, category_ids
+        )
+        nearby = rank_by_distance(
+            latitude, longitude, ids, coords, search_radius, k
+        )
+        if len(nearby) >= k or search_radius >= NEARBY_MAX_RADIUS:
+            return nearby
+        search_radius = min(search_radius * 2, NEARBY_MAX_RADIUS)
@@ -0,0 +1,102 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from ..core.config import PASSWORD_HASH_MAX_QUEUE, PASSWORD_HASH_WORKERS
+from ..models.user import HashedPassword, pwd_context
+
+
+class PasswordHasher:
+    """
+    Gera e confere os hashes bcrypt em um pool de threads próprio, fora do
+    event loop, com até `max_workers` hashes ao mesmo tempo
+
+    O bcrypt libera o GIL enquanto calcula o hash, então as threads rodam em
+    paralelo de verdade. Quando há mais de `max_queue` pedidos esperando, os
+    novos são recusados em vez de acumular logins atrasados.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.running = 0
+        self.queued = 0
+        self.rejected = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="password-hash",
+            )
+        return self._executor
+
+    @property
+    def slots(self) -> asyncio.Semaphore:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+        return self._slots
+
+    @property
+    def is_full(self) -> bool:
+        return self.running + self.queued >= self.max_workers + self.max_queue
+
+    async def run(self, func: Callable, *args):
+        if self.is_full:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Muitas requisições de login, tente novamente",
+            )
+
+        self.queued += 1
+        try:
+            await self.slots.acquire()
+        finally:
+            self.queued -= 1
+
+        self.running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.executor, partial(func, *args)
+            )
+        finally:
+            self.running -= 1
+            self.slots.release()
+
+    async def hash(self, password: str) -> HashedPassword:
+        return HashedPassword(await self.run(pwd_context.hash, password))
+
+    async def verify_and_update(
+        self, password: str, hashed_password: str
+    ) -> Tuple[bool, Optional[HashedPassword]]:
+        """
+        Confere a senha e, se o hash foi gerado com outros parâmetros (custo
+        ou algoritmo), retorna também um novo hash com os atuais
+        """
+        valid, new_hash = await self.run(
+            pwd_context.verify_and_update, password, hashed_password
+        )
+        return valid, HashedPassword(new_hash) if new_hash else None
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._slots = None
+
+
+password_hasher = PasswordHasher(
+    PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE
+)
+
+
+def get_password_hasher() -> PasswordHasher:
+    return password_hasher
@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlmodel import Session
+
+from ..core.config import PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL
+from ..models.user import User
+from .session_changes import CommitListener, FlushChanges
+
+# (nome de usuário, momento em que o token foi emitido)
+PrincipalKey = Tuple[str, Optional[int]]
+
+
+def detached_copy(user: User) -> User:
+    """
+    Função que copia as colunas de um usuário (e da sua subclasse) para uma
+    instância fora de qualquer sessão, como se tivesse acabado de ser lida
+    do banco. O construtor não é chamado, para não gerar o hash da senha de
+    novo.
+    """
+    mapper = inspect(user).mapper
+    copy = mapper.class_manager.new_instance()
+    for attribute in mapper.column_attrs:
+        setattr(copy, attribute.key, getattr(user, attribute.key))
+    make_transient_to_detached(copy)
+    return copy
+
+
+class PrincipalCache(CommitListener):
+    """
+    Cache LRU com TTL dos usuários autenticados, indexado pelo nome de
+    usuário e pelo momento de emissão do token (iat)
+
+    Os usuários ficam fora de qualquer sessão e cada requisição recebe uma
+    cópia ligada à sua própria sessão (merge sem consulta), então uma
+    requisição não altera o usuário das outras. Alterações de um usuário
+    (senha, desativação, exclusão) o removem do cache quando a transação é
+    confirmada; o TTL limita por quanto tempo um processo que não recebeu a
+    alteração pode aceitar o usuário antigo.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.generation = 0
+        self._data: "OrderedDict[PrincipalKey, Tuple[float, User]]" = (
+            OrderedDict()
+        )
+        self._keys_by_user: Dict[int, Set[PrincipalKey]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: PrincipalKey, session: Session) -> Optional[User]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._data.move_to_end(key)
+        return session.merge(user, load=False)
+
+    def put(self, key: PrincipalKey, user: User, generation: int) -> None:
+        """
+        Salva o usuário, a menos que algum usuário tenha sido alterado desde
+        `generation` (lida antes de consultar o banco)
+        """
+        if self.maxsize <= 0:
+            return
+        copy = detached_copy(user)
+        with self._lock:
+            if generation != self.generation:
+                return
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (time.monotonic() + self.ttl, copy)
+            self._keys_by_user.setdefault(copy.id, set()).add(key)
+            while len(self._data) > self.maxsize:
+                self._remove(next(iter(self._data)))
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            self.generation += 1
+            for key in self._keys_by_user.pop(user_id, set()):
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+            self._keys_by_user.clear()
+
+    def _remove(self, key: PrincipalKey) -> None:
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return
+        keys = self._keys_by_user.get(entry[1].id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[entry[1].id]
+
+    # Invalidação: os usuários alterados em cada flush são guardados na
+    # sessão e só saem do cache quando a transação é confirmada
+
+    info_key = "principal_cache"
+
+    def collect(self, changes: FlushChanges):
+        for instance in changes.dirty + changes.deleted:
+            if isinstance(instance, User) and instance.id is not None:
+                yield instance.id, None
+
+    def apply(self, pending: Dict[int, None]) -> None:
+        for user_id in pending:
+            self.invalidate_user(user_id)
+
+
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
+
+principal_cache.listen()
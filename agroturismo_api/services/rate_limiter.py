@@ -0,0 +1,72 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Tuple
+
+
+class RateLimiter:
+    """
+    Limita as tentativas de cada chave a `limit` por `window` segundos
+    (token bucket: a cota volta aos poucos, não toda de uma vez)
+
+    Guarda no máximo `maxsize` chaves, descartando as usadas há mais tempo.
+    Cada processo tem os seus contadores.
+    """
+
+    def __init__(self, limit: int, window: float, maxsize: int = 10_000):
+        self.limit = limit
+        self.window = window
+        self.maxsize = maxsize
+        self._buckets: "OrderedDict[Hashable, Tuple[float, float]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        return self.limit / self.window  # tentativas por segundo
+
+    def _refill(self, key: Hashable, now: float) -> float:
+        tokens, updated_at = self._buckets.get(key, (self.limit, now))
+        return min(self.limit, tokens + (now - updated_at) * self.rate)
+
+    def retry_after(self, key: Hashable) -> float:
+        """
+        Retorna 0 se a próxima tentativa é permitida ou, se não, em quantos
+        segundos ela será, sem contar uma tentativa
+        """
+        if self.limit <= 0:
+            return 0.0
+        with self._lock:
+            tokens = self._refill(key, time.monotonic())
+        return 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+
+    def hit(self, key: Hashable) -> float:
+        """
+        Conta uma tentativa. Retorna 0 se ela é permitida ou, se não, em
+        quantos segundos a próxima será
+        """
+        if self.limit <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            tokens = self._refill(key, now)
+            self._buckets.pop(key, None)
+            retry_after = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                retry_after = (1 - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+def retry_after_header(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
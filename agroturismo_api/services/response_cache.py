@@ -0,0 +1,272 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import (
+    Any,
+    Dict,
+    Hashable,
+    Iterable,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from fastapi import Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import parse_obj_as
+from sqlalchemy import inspect
+from ..core.config import (
+    RESPONSE_CACHE_MAX_AGE,
+    RESPONSE_CACHE_MAX_BYTES,
+    RESPONSE_CACHE_TTL,
+)
+from ..models.category import Category
+from ..models.gallery_local import GalleryLocal
+from ..models.image import Image
+from ..models.image_variant import ImageVariant
+from ..models.local import Local
+from ..models.tag import Tag
+from ..models.tag_local import TagLocal
+from .session_changes import CommitListener, FlushChanges
+
+# (tipo, id) de uma linha, ou (tipo,) de uma listagem inteira
+CacheTag = Tuple[Hashable, ...]
+CacheKey = Tuple[str, str]
+
+# headers das respostas guardados junto com o corpo
+CACHED_HEADERS = ("x-next-cursor",)
+
+# relacionamentos que fazem parte das respostas, além das colunas
+WATCHED_RELATIONSHIPS = {Local: ("main_category", "tags")}
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    headers: Dict[str, str]
+    tags: Set[CacheTag]
+    expires_at: float
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Função que confere o If-None-Match da requisição (uma lista de ETags,
+    comparadas sem o prefixo W/, ou *)
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = {
+        candidate.strip().removeprefix("W/")
+        for candidate in if_none_match.split(",")
+    }
+    return "*" in candidates or etag in candidates
+
+
+class ResponseCache(CommitListener):
+    """
+    Cache LRU dos corpos já serializados das leituras do catálogo, indexado
+    pelo caminho e pelos parâmetros da requisição, limitado a `max_bytes`
+
+    Cada resposta leva um ETag forte (o hash do corpo) e as requisições com
+    o mesmo ETag no If-None-Match recebem 304 sem corpo. Cada entrada tem as
+    tags das linhas usadas na resposta, e as alterações dessas linhas a
+    removem quando a transação é confirmada. Cada processo tem o seu cache;
+    o TTL limita por quanto tempo um processo que não recebeu a alteração
+    pode devolver a resposta antiga.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float, max_age: int):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.cache_control = f"public, max-age={max_age}"
+        self.generation = 0
+        self.size = 0  # em bytes
+        self._data: "OrderedDict[CacheKey, CachedResponse]" = OrderedDict()
+        self._keys_by_tag: Dict[CacheTag, Set[CacheKey]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @staticmethod
+    def make_key(request: Request) -> CacheKey:
+        return (
+            request.url.path,
+            str(sorted(request.query_params.multi_items())),
+        )
+
+    def lookup(self, request: Request) -> Optional[Response]:
+        """
+        Resposta guardada para a requisição, ou 304 se o cliente já a tem.
+        Sem ela, anota na requisição a geração do cache, conferida ao
+        guardar a resposta nova.
+        """
+        key = self.make_key(request)
+        with self._lock:
+            request.state.response_cache_generation = self.generation
+            cached = self._data.get(key)
+            if cached is None:
+                return None
+            if cached.expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._data.move_to_end(key)
+        return self._response(request, cached)
+
+    def respond(
+        self,
+        request: Request,
+        read_model: Any,
+        content: Any,
+        tags: Iterable[CacheTag],
+        response: Optional[Response] = None,
+    ) -> Response:
+        """
+        Serializa `content` com o `read_model` (como o response_model da
+        rota), guarda o corpo com as `tags` e responde, com 304 se o cliente
+        já tem essa versão. Os headers de `response` usados pela rota (como
+        o cursor da próxima página) são mantidos.
+        """
+        body = JSONResponse(
+            jsonable_encoder(parse_obj_as(read_model, content))
+        ).body
+        headers = {
+            name: value
+            for name, value in (response.headers if response else {}).items()
+            if name in CACHED_HEADERS
+        }
+        cached = CachedResponse(
+            body=body,
+            etag=make_etag(body),
+            headers=headers,
+            tags=set(tags),
+            expires_at=time.monotonic() + self.ttl,
+        )
+        generation = getattr(request.state, "response_cache_generation", None)
+        self._put(self.make_key(request), cached, generation)
+        return self._response(request, cached)
+
+    def _response(self, request: Request, cached: CachedResponse) -> Response:
+        headers = {
+            "ETag": cached.etag,
+            "Cache-Control": self.cache_control,
+        }
+        if etag_matches(request, cached.etag):
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED, headers=headers
+            )
+        return Response(
+            content=cached.body,
+            media_type="application/json",
+            headers={**cached.headers, **headers},
+        )
+
+    def _put(
+        self, key: CacheKey, cached: CachedResponse, generation: Optional[int]
+    ) -> None:
+        # a resposta não é guardada se alguma linha foi alterada desde a
+        # consulta (a geração é lida antes dela)
+        if len(cached.body) > self.max_bytes:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._remove(key)
+            self._data[key] = cached
+            self.size += len(cached.body)
+            for tag in cached.tags:
+                self._keys_by_tag.setdefault(tag, set()).add(key)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._data)))
+
+    def invalidate(self, tags: Iterable[CacheTag]) -> None:
+        with self._lock:
+            self.generation += 1
+            for tag in tags:
+                for key in self._keys_by_tag.pop(tag, set()):
+                    self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+            self._keys_by_tag.clear()
+            self.size = 0
+
+    def _remove(self, key: CacheKey) -> None:
+        cached = self._data.pop(key, None)
+        if cached is None:
+            return
+        self.size -= len(cached.body)
+        for tag in cached.tags:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+    # Invalidação: as tags das linhas alteradas em cada flush são guardadas
+    # na sessão e só saem do cache quando a transação é confirmada
+
+    info_key = "response_cache"
+
+    def watched_attributes(self, instance) -> Iterable[str]:
+        mapper = inspect(instance).mapper
+        return set(mapper.column_attrs.keys()).union(
+            WATCHED_RELATIONSHIPS.get(type(instance), ())
+        )
+
+    def collect(self, changes: FlushChanges):
+        for instance in changes.new + changes.dirty + changes.deleted:
+            for tag in instance_tags(instance):
+                yield tag, None
+
+    def apply(self, pending: Dict[CacheTag, None]) -> None:
+        self.invalidate(pending)
+
+
+def instance_tags(instance) -> Set[CacheTag]:
+    """
+    Função que retorna as tags invalidadas pela alteração de uma linha
+    """
+    if isinstance(instance, Local):
+        return {("local", instance.id)}
+    if isinstance(instance, Category):
+        return {("category", instance.id), ("categories",)}
+    if isinstance(instance, Tag):
+        return {("tag", instance.id), ("tags",)}
+    if isinstance(instance, TagLocal):
+        return {("local", instance.local_id)}
+    if isinstance(instance, GalleryLocal):
+        return {("local", instance.local_id)}
+    if isinstance(instance, Image):
+        return {("image", instance.id)}
+    if isinstance(instance, ImageVariant):
+        return {("image", instance.image_id)}
+    return set()
+
+
+def local_tags(local: Local) -> Set[CacheTag]:
+    """
+    Função que retorna as tags das linhas usadas na resposta de um local:
+    ele, a categoria, as tags e as imagens
+    """
+    tags = {("local", local.id), ("category", local.main_category_id)}
+    tags.update(("tag", tag.id) for tag in local.tags)
+    tags.update(("image", gallery.image_id) for gallery in local.images)
+    return tags
+
+
+response_cache = ResponseCache(
+    RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TTL, RESPONSE_CACHE_MAX_AGE
+)
+
+response_cache.listen()
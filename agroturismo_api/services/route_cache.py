@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import (
+    Dict,
+    Hashable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+from ..core.config import ROUTE_CACHE_SIZE, ROUTE_CACHE_TTL
+from ..models.route_job import RouteAlgorithm, RouteParameters
+
+RouteKey = Tuple[Hashable, ...]
+
+
+class CachedRoute(NamedTuple):
+    local_ids: List[int]
+    solver: str
+    optimality_gap: float
+
+
+class RouteCache:
+    """
+    Cache LRU com TTL das rotas já calculadas, indexado pelo conjunto de
+    locais, pelo algoritmo e pelos seus parâmetros
+
+    Cada processo tem o seu cache; o TTL limita por quanto tempo um processo
+    que não recebeu a alteração de um local pode devolver a rota antiga.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.generation = 0
+        self._data: "OrderedDict[RouteKey, Tuple[float, CachedRoute]]" = (
+            OrderedDict()
+        )
+        self._keys_by_local: Dict[int, Set[RouteKey]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(
+        algorithm: RouteAlgorithm,
+        ids: Sequence[int],
+        parameters: RouteParameters,
+        start: Optional[Tuple[float, float]] = None,
+        end: Optional[int] = None,
+    ) -> RouteKey:
+        """
+        O tempo limite não faz parte da chave: qualquer rota já calculada
+        para os mesmos locais e parâmetros serve. O ponto de partida e o
+        local de chegada dos caminhos abertos fazem parte dela.
+        """
+        return (
+            start,
+            end,
+            algorithm.value,
+            tuple(sorted(ids)),
+            parameters.max_iterations,
+            parameters.max_no_improv,
+            parameters.alpha,
+            parameters.tabu_tenure,
+            parameters.mode.value,
+        )
+
+    def get(self, key: RouteKey) -> Optional[CachedRoute]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, route = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._data.move_to_end(key)
+            return route
+
+    def put(self, key: RouteKey, route: CachedRoute, generation: int) -> None:
+        """
+        Salva a rota, a menos que algum local tenha sido alterado desde
+        `generation` (lida antes de calcular a rota)
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (time.monotonic() + self.ttl, route)
+            for local_id in set(route.local_ids):
+                self._keys_by_local.setdefault(local_id, set()).add(key)
+            while len(self._data) > self.maxsize:
+                self._remove(next(iter(self._data)))
+
+    def invalidate_local(self, local_id: int) -> None:
+        with self._lock:
+            self.generation += 1
+            for key in self._keys_by_local.pop(local_id, set()):
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+            self._keys_by_local.clear()
+
+    def _remove(self, key: RouteKey) -> None:
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return
+        for local_id in set(entry[1].local_ids):
+            keys = self._keys_by_local.get(local_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_local[local_id]
+
+
+route_cache = RouteCache(ROUTE_CACHE_SIZE, ROUTE_CACHE_TTL)
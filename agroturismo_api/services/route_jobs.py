@@ -0,0 +1,268 @@
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Dict, Tuple
+
+import numpy as np
+from fastapi import HTTPException, status
+from sqlmodel import Session, select
+
+from ..core.config import (
+    ROUTE_CACHE_TTL,
+    ROUTE_JOB_MAX_QUEUE,
+    ROUTE_JOB_TIME_LIMIT,
+    ROUTE_JOB_WORKERS,
+)
+from ..core.db import engine
+from ..models.route_job import (
+    RouteAlgorithm,
+    RouteJob,
+    RouteJobCreate,
+    RouteJobStatus,
+    RouteParameters,
+)
+from .distance_cache import DistanceCache
+from .routing import get_route_locals, solve_route
+from .solver_pool import HARD_LIMIT_GRACE_SECONDS, SolverPool
+
+ACTIVE_STATUSES = (RouteJobStatus.pending, RouteJobStatus.running)
+FINISHED_STATUSES = (
+    RouteJobStatus.done,
+    RouteJobStatus.failed,
+    RouteJobStatus.cancelled,
+)
+
+# pool próprio, para que as rotas grandes não disputem com as síncronas
+route_job_pool = SolverPool(ROUTE_JOB_WORKERS, ROUTE_JOB_MAX_QUEUE)
+
+
+def route_job_key(job: RouteJobCreate) -> str:
+    """
+    Função que calcula o hash que identifica submissões idênticas
+    """
+    payload = json.dumps(
+        {
+            "algorithm": job.algorithm.value,
+            "local_ids": sorted(job.local_ids),
+            "parameters": job.parameters.dict(),
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class RouteJobRunner:
+    """
+    Executa os jobs de rota em segundo plano e salva o resultado na tabela
+    `route_job`, de onde as consultas de status são respondidas
+    """
+
+    def __init__(self, pool: SolverPool):
+        self.pool = pool
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    def is_stale(self, job: RouteJob) -> bool:
+        """
+        Um job ativo que não pertence a este processo e já passou do tempo
+        limite foi interrompido (por exemplo, por um restart do servidor)
+        """
+        if job.status not in ACTIVE_STATUSES or job.id in self._tasks:
+            return False
+        limit = timedelta(
+            seconds=2 * (ROUTE_JOB_TIME_LIMIT + HARD_LIMIT_GRACE_SECONDS)
+        )
+        return datetime.now() - job.created_at > limit
+
+    @staticmethod
+    def is_reusable(job: RouteJob) -> bool:
+        """
+        Um job ativo é sempre reaproveitado; um concluído, só até
+        ROUTE_CACHE_TTL segundos depois, como as rotas do route_cache
+        """
+        if job.status in ACTIVE_STATUSES:
+            return True
+        if job.status != RouteJobStatus.done or job.finished_at is None:
+            return False
+        age = datetime.now() - job.finished_at
+        return age < timedelta(seconds=ROUTE_CACHE_TTL)
+
+    def invalidate_local(self, session: Session, local_id: int) -> None:
+        """
+        Desliga da sua chave os jobs concluídos que passam pelo local, para
+        que a próxima submissão idêntica calcule a rota de novo. O job
+        continua disponível pelo id, com o resultado antigo.
+        """
+        since = datetime.now() - timedelta(seconds=ROUTE_CACHE_TTL)
+        jobs = session.exec(
+            select(RouteJob).where(
+                RouteJob.status == RouteJobStatus.done,
+                RouteJob.finished_at >= since,
+            )
+        ).all()
+        for job in jobs:
+            if local_id in job.local_ids:
+                job.key = f"{job.key}-{job.id}"
+                session.add(job)
+
+    def refresh(self, session: Session, job: RouteJob) -> RouteJob:
+        if self.is_stale(job):
+            job.status = RouteJobStatus.failed
+            job.error = "O cálculo da rota foi interrompido"
+            job.finished_at = datetime.now()
+            session.add(job)
+            session.commit()
+            session.refresh(job)
+        return job
+
+    async def submit(
+        self, session: Session, job_to_save: RouteJobCreate
+    ) -> Tuple[RouteJob, bool]:
+        """
+        Cria o job e agenda a sua execução. Se já existir um job idêntico
+        pendente, em execução ou concluído há pouco (ROUTE_CACHE_TTL), ele
+        é retornado no lugar, junto com False indicando que nada novo foi
+        criado.
+        """
+        if not job_to_save.local_ids:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="IDs não informados",
+            )
+
+        key = route_job_key(job_to_save)
+        job = session.exec(select(RouteJob).where(RouteJob.key == key)).first()
+        if job:
+            job = self.refresh(session, job)
+            if self.is_reusable(job):
+                return job, False
+
+        if self.pool.is_full:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Muitas rotas sendo calculadas, tente novamente",
+            )
+
+        _, coords = get_route_locals(
+            job_to_save.local_ids, session, options=()
+        )
+        dist_matrix = DistanceCache(session).get_matrix(
+            job_to_save.local_ids, coords
+        )
+
+        if job is None:
+            job = RouteJob(
+                algorithm=job_to_save.algorithm,
+                local_ids=job_to_save.local_ids,
+                parameters=job_to_save.parameters.dict(),
+                key=key,
+            )
+        else:
+            job.local_ids = job_to_save.local_ids
+            job.status = RouteJobStatus.pending
+            job.result = job.cost = job.error = job.finished_at = None
+            job.solver = job.optimality_gap = None
+            job.created_at = datetime.now()
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+
+        job_id = job.id
+        task = asyncio.create_task(
+            self._run(
+                job_id,
+                job_to_save.algorithm,
+                job_to_save.local_ids,
+                coords,
+                dist_matrix,
+                job_to_save.parameters,
+            )
+        )
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._forget(job_id, task))
+        return job, True
+
+    def _forget(self, job_id: int, task: asyncio.Task) -> None:
+        # um job cancelado e submetido de novo já tem outra task registrada
+        if self._tasks.get(job_id) is task:
+            del self._tasks[job_id]
+
+    def cancel(self, session: Session, job: RouteJob) -> RouteJob:
+        job = self.refresh(session, job)
+        if job.status in FINISHED_STATUSES:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="O cálculo da rota já foi finalizado",
+            )
+
+        task = self._tasks.get(job.id)
+        if task:
+            task.cancel()
+        job.status = RouteJobStatus.cancelled
+        job.finished_at = datetime.now()
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+        return job
+
+    async def _run(
+        self,
+        job_id: int,
+        algorithm: RouteAlgorithm,
+        local_ids,
+        coords: np.ndarray,
+        dist_matrix: np.ndarray,
+        parameters: RouteParameters,
+    ) -> None:
+        self._update(job_id, status=RouteJobStatus.running)
+        time_limit = min(
+            parameters.time_limit or ROUTE_JOB_TIME_LIMIT, ROUTE_JOB_TIME_LIMIT
+        )
+        try:
+            solution = await solve_route(
+                self.pool,
+                algorithm,
+                coords,
+                dist_matrix,
+                parameters,
+                time_limit,
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            self._update(
+                job_id,
+                status=RouteJobStatus.failed,
+                error=str(getattr(exc, "detail", exc)),
+                finished_at=datetime.now(),
+            )
+            return
+
+        self._update(
+            job_id,
+            status=RouteJobStatus.done,
+            result=[local_ids[i] for i in solution.tour],
+            cost=float(solution.cost),
+            solver=solution.solver,
+            optimality_gap=solution.optimality_gap,
+            finished_at=datetime.now(),
+        )
+
+    @staticmethod
+    def _update(job_id: int, **values) -> None:
+        with Session(engine) as session:
+            job = session.get(RouteJob, job_id)
+            if not job or job.status == RouteJobStatus.cancelled:
+                return
+            for key, value in values.items():
+                setattr(job, key, value)
+            session.add(job)
+            session.commit()
+
+    def shutdown(self) -> None:
+        for task in list(self._tasks.values()):
+            task.cancel()
+        self.pool.shutdown()
+
+
+route_job_runner = RouteJobRunner(route_job_pool)
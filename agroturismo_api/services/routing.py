@@ -0,0 +1,100 @@
+from functools import partial
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from fastapi import HTTPException, status
+from sqlmodel import Session, select
+
+from ..core.config import BRANCH_AND_BOUND_MAX_STOPS, HELD_KARP_MAX_STOPS
+from ..models.loaders import LOCAL_READ_OPTIONS
+from ..models.local import Local
+from ..models.route_job import RouteAlgorithm, RouteMode, RouteParameters
+from .algorithms import (
+    RouteSolution,
+    guided_local_search,
+    solve_tsp_auto,
+    tabu_search,
+)
+from .solver_pool import SolverPool
+
+
+def get_route_locals(
+    ids: Sequence[int],
+    session: Session,
+    options: Sequence = LOCAL_READ_OPTIONS,
+) -> Tuple[List[Local], np.ndarray]:
+    """
+    Função que obtém, com uma única consulta, os locais de uma rota na ordem
+    dos IDs informados e as suas coordenadas como um array (n, 2)
+
+    As mesmas linhas são reaproveitadas na resposta, com os relacionamentos
+    de LocalRead já carregados por `options`. Todos os IDs inexistentes são
+    informados juntos em um único 404.
+    """
+    unique_ids = list(dict.fromkeys(ids))
+    rows = session.exec(
+        select(Local).where(Local.id.in_(unique_ids)).options(*options)
+    ).all()
+    locals_by_id = {local.id: local for local in rows}
+
+    missing_ids = [id for id in unique_ids if id not in locals_by_id]
+    if missing_ids:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Locais não encontrados: "
+            + ", ".join(str(id) for id in missing_ids),
+        )
+
+    locals = [locals_by_id[id] for id in ids]
+    coords = np.array(
+        [(local.latitude, local.longitude) for local in locals],
+        dtype=np.float64,
+    ).reshape(-1, 2)
+    return locals, coords
+
+
+async def solve_route(
+    pool: SolverPool,
+    algorithm: RouteAlgorithm,
+    coords: np.ndarray,
+    dist_matrix: np.ndarray,
+    parameters: RouteParameters,
+    time_limit: Optional[float],
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+) -> RouteSolution:
+    """
+    Função que executa no pool o solver escolhido com os parâmetros dados
+
+    No modo automático, as rotas com poucos locais são resolvidas de forma
+    exata; no modo heurístico, apenas a meta-heurística é executada. Com
+    `start`, a rota é um caminho aberto a partir desse ponto.
+    """
+    if algorithm == RouteAlgorithm.guided_local_search:
+        heuristic = partial(
+            guided_local_search,
+            max_iterations=parameters.max_iterations,
+            max_no_improv=parameters.max_no_improv,
+            alpha=parameters.alpha,
+        )
+    else:
+        heuristic = partial(
+            tabu_search,
+            max_iterations=parameters.max_iterations,
+            max_no_improv=parameters.max_no_improv,
+            tabu_tenure=parameters.tabu_tenure,
+        )
+
+    exact = parameters.mode == RouteMode.auto
+    return await pool.run(
+        solve_tsp_auto,
+        coords,
+        heuristic,
+        algorithm.value,
+        HELD_KARP_MAX_STOPS if exact else 0,
+        BRANCH_AND_BOUND_MAX_STOPS if exact else 0,
+        dist_matrix=dist_matrix,
+        time_limit=time_limit,
+        start=start,
+        end=end,
+    )
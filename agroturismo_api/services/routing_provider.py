@@ -0,0 +1,346 @@
+import asyncio
+from typing import Collection, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+import numpy as np
+from fastapi import FastAPI, HTTPException, Query, status
+
+from ..core.config import (
+    OSRM_PROFILE,
+    OSRM_URL,
+    ROUTE_AVERAGE_SPEED,
+    ROUTING_MAX_CONNECTIONS,
+    ROUTING_MAX_TABLE_SIZE,
+    ROUTING_PROVIDER,
+    ROUTING_RETRIES,
+    ROUTING_TIMEOUT,
+)
+from ..utils import calculate_distance_matrix
+
+# (distâncias em km, durações em minutos ou None quando o provedor não as
+# conhece), no formato (origens x destinos)
+CostTable = Tuple[np.ndarray, Optional[np.ndarray]]
+
+# fator que aproxima a distância por estrada a partir da distância em linha
+# reta, usado pelo servidor de testes
+MOCK_DETOUR_FACTOR = 1.3
+# custo dos trechos sem rota (null no OSRM): muito maior que o de qualquer
+# rota de verdade, para que os solvers os evitem sem receber NaN
+UNREACHABLE_DISTANCE = 1e6  # em km
+UNREACHABLE_DURATION = 1e6  # em minutos
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+def _as_coords(coords) -> np.ndarray:
+    return np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+
+
+def has_unreachable_leg(
+    matrix: np.ndarray, path: Sequence[int], penalty=UNREACHABLE_DISTANCE
+) -> bool:
+    """
+    Função que confere se o caminho passa por algum trecho sem rota, com o
+    custo de penalidade na matriz (de distâncias ou, com UNREACHABLE_DURATION,
+    de durações)
+    """
+    path = np.asarray(path, dtype=int)
+    return bool(np.any(matrix[path[:-1], path[1:]] >= penalty))
+
+
+class RoutingProvider:
+    """
+    Fonte das matrizes de distâncias e durações entre coordenadas
+    (latitude, longitude)
+    """
+
+    name: str = ""
+    provides_durations: bool = True
+
+    @property
+    def metric(self) -> str:
+        """
+        Identifica a origem dos custos no cache: provedores (ou perfis)
+        diferentes calculam distâncias diferentes para o mesmo par
+        """
+        return self.name
+
+    async def table(self, origins, destinations=None) -> CostTable:
+        raise NotImplementedError
+
+    async def aclose(self) -> None:
+        pass
+
+
+class HaversineProvider(RoutingProvider):
+    """
+    Distâncias em linha reta, calculadas localmente e sem duração
+    """
+
+    name = "haversine"
+    provides_durations = False
+
+    async def table(self, origins, destinations=None) -> CostTable:
+        return calculate_distance_matrix(origins, destinations), None
+
+
+class OSRMProvider(RoutingProvider):
+    """
+    Cliente do serviço `table` de um servidor compatível com o OSRM
+
+    Um único httpx.AsyncClient, com pool de conexões, é compartilhado por
+    todas as requisições. Tabelas maiores que `max_table_size` coordenadas
+    são divididas em blocos consultados em paralelo, e as falhas
+    temporárias (timeouts, 429 e 5xx) são repetidas com espera exponencial.
+    """
+
+    name = "osrm"
+
+    def __init__(
+        self,
+        base_url: str = OSRM_URL,
+        profile: str = OSRM_PROFILE,
+        timeout: float = ROUTING_TIMEOUT,
+        retries: int = ROUTING_RETRIES,
+        max_table_size: int = ROUTING_MAX_TABLE_SIZE,
+        max_connections: int = ROUTING_MAX_CONNECTIONS,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.profile = profile
+        self.timeout = timeout
+        self.retries = retries
+        self.max_table_size = max(2, max_table_size)
+        self.max_connections = max_connections
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # criado sob demanda, já dentro do event loop que vai usá-lo
+        if self._client is None or self._client.is_closed:
+            transport = self.transport or httpx.AsyncHTTPTransport(
+                retries=self.retries,  # falhas ao conectar
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(self.timeout),
+                transport=transport,
+            )
+        return self._client
+
+    @property
+    def metric(self) -> str:
+        return f"{self.name}:{self.profile}"
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def chunk_sizes(self, num_rows: int, num_cols: int) -> Tuple[int, int]:
+        """
+        Tamanhos dos blocos de origens e destinos, para que cada consulta
+        tenha no máximo `max_table_size` coordenadas
+        """
+        if num_rows + num_cols <= self.max_table_size:
+            return max(1, num_rows), max(1, num_cols)
+        rows = min(num_rows, self.max_table_size // 2)
+        return max(1, rows), max(1, self.max_table_size - rows)
+
+    async def table(self, origins, destinations=None) -> CostTable:
+        origins = _as_coords(origins)
+        destinations = (
+            origins if destinations is None else _as_coords(destinations)
+        )
+        num_rows, num_cols = len(origins), len(destinations)
+        distances = np.zeros((num_rows, num_cols))
+        durations = np.zeros((num_rows, num_cols))
+        if num_rows == 0 or num_cols == 0:
+            return distances, durations
+
+        rows_step, cols_step = self.chunk_sizes(num_rows, num_cols)
+        blocks = [
+            (slice(i, i + rows_step), slice(j, j + cols_step))
+            for i in range(0, num_rows, rows_step)
+            for j in range(0, num_cols, cols_step)
+        ]
+        results = await asyncio.gather(
+            *(
+                self._table_block(origins[rows], destinations[cols])
+                for rows, cols in blocks
+            )
+        )
+        for (rows, cols), (block_distances, block_durations) in zip(
+            blocks, results
+        ):
+            distances[rows, cols] = block_distances
+            durations[rows, cols] = block_durations
+        return distances, durations
+
+    async def _table_block(
+        self, origins: np.ndarray, destinations: np.ndarray
+    ) -> CostTable:
+        # coordenadas repetidas (por exemplo, origens que também são
+        # destinos) são enviadas uma vez só
+        points, index = np.unique(
+            np.concatenate([origins, destinations]),
+            axis=0,
+            return_inverse=True,
+        )
+        index = index.reshape(-1)
+        coordinates = ";".join(f"{lon:.6f},{lat:.6f}" for lat, lon in points)
+        params = {
+            "sources": ";".join(map(str, index[: len(origins)])),
+            "destinations": ";".join(map(str, index[len(origins) :])),
+            "annotations": "distance,duration",
+        }
+        payload = await self._get(
+            f"/table/v1/{self.profile}/{coordinates}", params
+        )
+
+        # valores nulos (trechos sem rota) viram NaN na conversão e recebem o
+        # custo de penalidade
+        distances = np.array(payload["distances"], dtype=np.float64) / 1000
+        durations = np.array(payload["durations"], dtype=np.float64) / 60
+        unreachable = np.isnan(distances) | np.isnan(durations)
+        distances[unreachable] = UNREACHABLE_DISTANCE
+        durations[unreachable] = UNREACHABLE_DURATION
+        return distances, durations
+
+    async def _get(self, path: str, params: Dict[str, str]) -> dict:
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            try:
+                response = await self.client.get(path, params=params)
+            except httpx.TransportError:
+                if last_attempt:
+                    break
+            else:
+                if response.status_code not in RETRY_STATUS_CODES:
+                    return self._parse(response)
+                if last_attempt:
+                    break
+            await asyncio.sleep(0.2 * 2**attempt)
+
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Serviço de rotas indisponível, tente novamente",
+        )
+
+    @staticmethod
+    def _parse(response: httpx.Response) -> dict:
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = {}
+        if response.is_success and payload.get("code") == "Ok":
+            return payload
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="Erro no serviço de rotas: "
+            + str(payload.get("message", response.status_code)),
+        )
+
+
+def create_mock_osrm_app(
+    detour_factor: float = MOCK_DETOUR_FACTOR,
+    speed: float = ROUTE_AVERAGE_SPEED,
+    unreachable: Collection[Tuple[float, float]] = (),
+) -> FastAPI:
+    """
+    Servidor local com o mesmo formato do serviço `table` do OSRM, que
+    responde com a distância em linha reta vezes `detour_factor` percorrida
+    a `speed` km/h. Os pontos (latitude, longitude) em `unreachable` não têm
+    rota para os demais, e esses trechos vêm como null. Serve para testes e
+    benchmarks sem acesso à internet (`agroturismo_api mock-osrm` o executa
+    como um servidor HTTP).
+    """
+    isolated = {(round(lat, 6), round(lon, 6)) for lat, lon in unreachable}
+    app = FastAPI(title="Mock OSRM")
+
+    @app.get("/table/v1/{profile}/{coordinates}")
+    def table(
+        coordinates: str,
+        profile: str,
+        sources: Optional[str] = Query(None),
+        destinations: Optional[str] = Query(None),
+    ):
+        points = np.array(
+            [
+                [float(value) for value in point.split(",")][::-1]
+                for point in coordinates.split(";")
+            ]
+        )
+
+        def indices(value: Optional[str]) -> List[int]:
+            if not value or value == "all":
+                return list(range(len(points)))
+            return [int(i) for i in value.split(";")]
+
+        def is_isolated(selected: np.ndarray) -> np.ndarray:
+            return np.array(
+                [
+                    (round(lat, 6), round(lon, 6)) in isolated
+                    for lat, lon in selected
+                ],
+                dtype=bool,
+            )
+
+        origins = points[indices(sources)]
+        targets = points[indices(destinations)]
+        distances = calculate_distance_matrix(origins, targets)
+        # sem rota entre um ponto isolado e os demais (mas sim até ele mesmo)
+        no_route = (
+            is_isolated(origins)[:, None] | is_isolated(targets)[None, :]
+        ) & (distances > 0)
+        distances = distances * detour_factor * 1000  # em metros
+        durations = distances / 1000 / speed * 3600  # em segundos
+        return {
+            "code": "Ok",
+            "distances": np.where(no_route, None, distances).tolist(),
+            "durations": np.where(no_route, None, durations).tolist(),
+        }
+
+    return app
+
+
+class MockOSRMProvider(OSRMProvider):
+    """
+    OSRMProvider ligado ao servidor de testes dentro do próprio processo,
+    percorrendo todo o caminho HTTP (blocos, conversão e erros) sem rede
+    """
+
+    name = "mock"
+
+    def __init__(
+        self, unreachable: Collection[Tuple[float, float]] = (), **kwargs
+    ):
+        kwargs.setdefault(
+            "transport",
+            httpx.ASGITransport(
+                app=create_mock_osrm_app(unreachable=unreachable)
+            ),
+        )
+        kwargs.setdefault("base_url", "http://mock-osrm")
+        super().__init__(**kwargs)
+
+
+ROUTING_PROVIDERS = {
+    HaversineProvider.name: HaversineProvider,
+    OSRMProvider.name: OSRMProvider,
+    MockOSRMProvider.name: MockOSRMProvider,
+}
+
+
+def get_routing_provider(name: str = ROUTING_PROVIDER) -> RoutingProvider:
+    try:
+        return ROUTING_PROVIDERS[name]()
+    except KeyError:
+        raise ValueError(f"Provedor de rotas desconhecido: {name}")
+
+
+routing_provider = get_routing_provider()
@@ -0,0 +1,100 @@
+from typing import (
+    Any,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+
+class FlushChanges(NamedTuple):
+    new: List[Any]
+    dirty: List[Any]
+    deleted: List[Any]
+
+
+def has_changes(instance, attributes: Optional[Iterable[str]] = None) -> bool:
+    """
+    Função que confere se algum dos atributos da instância (por padrão,
+    todas as colunas e relacionamentos) foi alterado no flush
+    """
+    state = inspect(instance)
+    if attributes is None:
+        attributes = state.mapper.attrs.keys()
+    return any(state.attrs[name].history.has_changes() for name in attributes)
+
+
+class FlushListener:
+    """
+    Base dos caches e índices atualizados a partir das alterações das
+    sessões
+
+    Em cada flush, `on_flush` recebe as instâncias novas, excluídas e
+    alteradas, e destas só as que tiveram algum atributo observado
+    (`watched_attributes`) alterado.
+    """
+
+    def watched_attributes(self, instance) -> Optional[Iterable[str]]:
+        return None
+
+    def on_flush(self, session: Session, changes: FlushChanges) -> None:
+        raise NotImplementedError
+
+    def after_flush(self, session: Session, flush_context) -> None:
+        # as listas new, dirty e deleted ainda têm o estado de antes do flush
+        changes = FlushChanges(
+            new=list(session.new),
+            dirty=[
+                instance
+                for instance in session.dirty
+                if has_changes(instance, self.watched_attributes(instance))
+            ],
+            deleted=list(session.deleted),
+        )
+        if changes.new or changes.dirty or changes.deleted:
+            self.on_flush(session, changes)
+
+    def listen(self) -> None:
+        event.listen(Session, "after_flush", self.after_flush)
+
+
+class CommitListener(FlushListener):
+    """
+    Base dos caches em memória, que só podem ver as alterações confirmadas
+
+    Os pares (chave, valor) retornados por `collect` em cada flush são
+    guardados na sessão, em `info_key`; quando a transação é confirmada,
+    `apply` recebe o último valor de cada chave e, quando ela é desfeita, os
+    pares são descartados.
+    """
+
+    info_key: str
+
+    def collect(self, changes: FlushChanges) -> Iterable[Tuple[Hashable, Any]]:
+        raise NotImplementedError
+
+    def apply(self, pending: Dict[Hashable, Any]) -> None:
+        raise NotImplementedError
+
+    def on_flush(self, session: Session, changes: FlushChanges) -> None:
+        pending = session.info.setdefault(self.info_key, {})
+        pending.update(self.collect(changes))
+
+    def after_commit(self, session: Session) -> None:
+        pending = session.info.pop(self.info_key, None)
+        if pending:
+            self.apply(pending)
+
+    def after_rollback(self, session: Session) -> None:
+        session.info.pop(self.info_key, None)
+
+    def listen(self) -> None:
+        super().listen()
+        event.listen(Session, "after_commit", self.after_commit)
+        event.listen(Session, "after_rollback", self.after_rollback)
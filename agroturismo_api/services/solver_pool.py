@@ -0,0 +1,174 @@
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Optional
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+from python_tsp.heuristics import solve_tsp_local_search
+
+from ..core.config import (
+    SOLVER_MAX_QUEUE,
+    SOLVER_TIME_LIMIT,
+    SOLVER_WORKERS,
+)
+
+# tempo extra, além do orçamento, antes de desistir de esperar o processo
+HARD_LIMIT_GRACE_SECONDS = 5.0
+# orçamento mínimo dado a um solver que esperou muito tempo na fila
+MIN_TIME_LIMIT_SECONDS = 0.05
+
+
+def solve_tsp_local_search_with_time_limit(
+    distance_matrix, time_limit: Optional[float] = None
+):
+    """
+    Função que adapta o solve_tsp_local_search do python_tsp ao parâmetro
+    `time_limit` usado pelos demais solvers
+    """
+    return solve_tsp_local_search(
+        distance_matrix, max_processing_time=time_limit
+    )
+
+
+class SolverPoolMetrics(BaseModel):
+    workers: int
+    running: int
+    queued: int
+    max_queue: int
+    saturation: float
+    completed: int
+    timed_out: int
+    rejected: int
+
+
+class SolverPool:
+    """
+    Executa os solvers (CPU-bound) em um pool de processos limitado, fora do
+    event loop, respeitando um orçamento de tempo por requisição
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.running = 0
+        self.queued = 0
+        self.completed = 0
+        self.timed_out = 0
+        self.rejected = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    @property
+    def slots(self) -> asyncio.Semaphore:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+        return self._slots
+
+    @property
+    def is_full(self) -> bool:
+        return self.running + self.queued >= self.max_workers + self.max_queue
+
+    async def run(
+        self,
+        func: Callable,
+        *args,
+        time_limit: Optional[float] = SOLVER_TIME_LIMIT,
+        **kwargs,
+    ):
+        """
+        Executa `func(*args, time_limit=..., **kwargs)` em um processo do
+        pool. O tempo na fila conta no orçamento, e o solver recebe apenas o
+        que sobrou dele para devolver a melhor solução encontrada até então.
+        """
+        if self.is_full:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Muitas rotas sendo calculadas, tente novamente",
+            )
+
+        started_at = time.perf_counter()
+        self.queued += 1
+        try:
+            await self.slots.acquire()
+        finally:
+            self.queued -= 1
+
+        # o slot só é liberado quando o processo termina: depois de um
+        # timeout ou de um cancelamento, o worker continua ocupado até o
+        # solver retornar
+        slots = self.slots
+        self.running += 1
+        try:
+            remaining = None
+            hard_limit = None
+            if time_limit is not None:
+                elapsed = time.perf_counter() - started_at
+                remaining = max(time_limit - elapsed, MIN_TIME_LIMIT_SECONDS)
+                hard_limit = remaining + HARD_LIMIT_GRACE_SECONDS
+
+            loop = asyncio.get_running_loop()
+            future = self.executor.submit(
+                partial(func, *args, time_limit=remaining, **kwargs)
+            )
+        except BaseException:
+            self._release(slots)
+            raise
+        future.add_done_callback(
+            partial(self._release_from_worker, loop, slots)
+        )
+
+        try:
+            result = await asyncio.wait_for(
+                asyncio.wrap_future(future), hard_limit
+            )
+            self.completed += 1
+            return result
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail="O cálculo da rota excedeu o tempo limite",
+            )
+
+    def _release(self, slots: asyncio.Semaphore) -> None:
+        self.running -= 1
+        slots.release()
+
+    def _release_from_worker(
+        self, loop: asyncio.AbstractEventLoop, slots: asyncio.Semaphore, _
+    ) -> None:
+        # chamado na thread do executor quando o processo termina
+        try:
+            loop.call_soon_threadsafe(self._release, slots)
+        except RuntimeError:  # event loop já encerrado
+            pass
+
+    def metrics(self) -> SolverPoolMetrics:
+        return SolverPoolMetrics(
+            workers=self.max_workers,
+            running=self.running,
+            queued=self.queued,
+            max_queue=self.max_queue,
+            saturation=self.running / self.max_workers,
+            completed=self.completed,
+            timed_out=self.timed_out,
+            rejected=self.rejected,
+        )
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._slots = None
+
+
+solver_pool = SolverPool(SOLVER_WORKERS, SOLVER_MAX_QUEUE)
@@ -0,0 +1,485 @@
+import re
+import unicodedata
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Set
+
+from sqlalchemy import case, event, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import TextClause
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..models.category import Category
+from ..models.local import Local
+from ..models.tag import Tag
+from .session_changes import FlushChanges, FlushListener
+
+LOCAL = "local"
+CATEGORY = "category"
+TAG = "tag"
+
+# código de cada tipo no rowid do índice do SQLite (id * 8 + código)
+ENTITY_CODES = {LOCAL: 1, CATEGORY: 2, TAG: 3}
+ENTITY_CODE_BITS = 8
+
+INDEX_TABLE = "search_document"
+TERM_PATTERN = re.compile(r"\w+")
+
+
+class SearchDocument(NamedTuple):
+    entity_type: str
+    entity_id: int
+    title: str  # pesa mais no ranking
+    body: str
+
+
+def search_terms(query: str) -> List[str]:
+    """
+    Função que separa a busca em palavras, descartando pontuação e os
+    operadores de cada backend
+    """
+    return TERM_PATTERN.findall(query.lower())
+
+
+def fold_text(value: str) -> str:
+    """
+    Função que remove acentos e coloca o texto em minúsculas
+    """
+    normalized = unicodedata.normalize("NFKD", value.lower())
+    return "".join(
+        char for char in normalized if not unicodedata.combining(char)
+    )
+
+
+class TextSearchBackend:
+    """
+    Índice de texto dos locais, categorias e tags, guardado na tabela
+    `search_document` e atualizado junto com as escritas nesses modelos
+    """
+
+    name = "like"
+
+    def create(self, connection: Connection) -> None:
+        connection.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {INDEX_TABLE} ("
+                " entity_type VARCHAR(16) NOT NULL,"
+                " entity_id INTEGER NOT NULL,"
+                " content TEXT NOT NULL,"
+                " PRIMARY KEY (entity_type, entity_id))"
+            )
+        )
+
+    def delete(self, connection: Connection, keys: Sequence[tuple]) -> None:
+        connection.execute(
+            text(
+                f"DELETE FROM {INDEX_TABLE}"
+                " WHERE entity_type = :entity_type AND entity_id = :entity_id"
+            ),
+            [
+                {"entity_type": entity_type, "entity_id": entity_id}
+                for entity_type, entity_id in keys
+            ],
+        )
+
+    def upsert(
+        self, connection: Connection, documents: Sequence[SearchDocument]
+    ) -> None:
+        self.delete(
+            connection, [(doc.entity_type, doc.entity_id) for doc in documents]
+        )
+        connection.execute(
+            text(
+                f"INSERT INTO {INDEX_TABLE} (entity_type, entity_id, content)"
+                " VALUES (:entity_type, :entity_id, :content)"
+            ),
+            [
+                {
+                    "entity_type": doc.entity_type,
+                    "entity_id": doc.entity_id,
+                    "content": fold_text(f"{doc.title} {doc.body}"),
+                }
+                for doc in documents
+            ],
+        )
+
+    def clear(self, connection: Connection) -> None:
+        connection.execute(text(f"DELETE FROM {INDEX_TABLE}"))
+
+    def count(self, connection: Connection) -> int:
+        return connection.execute(
+            text(f"SELECT COUNT(*) FROM {INDEX_TABLE}")
+        ).scalar()
+
+    def search_statement(
+        self, entity_type: str, terms: Sequence[str], limit: int
+    ) -> TextClause:
+        """
+        Consulta que retorna `entity_id` e `rank` dos documentos com todas
+        as palavras (sem ranking nesse backend)
+        """
+        conditions = " AND ".join(
+            f"content LIKE :term_{i}" for i in range(len(terms))
+        )
+        params = {
+            f"term_{i}": f"%{fold_text(term)}%" for i, term in enumerate(terms)
+        }
+        return text(
+            f"SELECT entity_id, 0 AS rank FROM {INDEX_TABLE}"
+            f" WHERE entity_type = :entity_type AND {conditions}"
+            " ORDER BY entity_id LIMIT :limit"
+        ).bindparams(entity_type=entity_type, limit=limit, **params)
+
+
+class PostgresTextSearch(TextSearchBackend):
+    """
+    tsvector com índice GIN, stemming em português e sem acentos (unaccent),
+    com o título pesando mais que o corpo no ranking (ts_rank_cd)
+    """
+
+    name = "postgresql"
+    config = "portuguese_unaccent"
+
+    def create(self, connection: Connection) -> None:
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS unaccent"))
+        connection.execute(
+            text(
+                "DO $$ BEGIN"
+                " IF NOT EXISTS (SELECT 1 FROM pg_ts_config"
+                f" WHERE cfgname = '{self.config}') THEN"
+                f" CREATE TEXT SEARCH CONFIGURATION {self.config}"
+                " (COPY = portuguese);"
+                f" ALTER TEXT SEARCH CONFIGURATION {self.config}"
+                " ALTER MAPPING FOR hword, hword_part, word"
+                " WITH unaccent, portuguese_stem;"
+                " END IF; END $$"
+            )
+        )
+        connection.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {INDEX_TABLE} ("
+                " entity_type VARCHAR(16) NOT NULL,"
+                " entity_id INTEGER NOT NULL,"
+                " document TSVECTOR NOT NULL,"
+                " PRIMARY KEY (entity_type, entity_id))"
+            )
+        )
+        connection.execute(
+            text(
+                f"CREATE INDEX IF NOT EXISTS ix_{INDEX_TABLE}_document"
+                f" ON {INDEX_TABLE} USING GIN (document)"
+            )
+        )
+
+    def upsert(
+        self, connection: Connection, documents: Sequence[SearchDocument]
+    ) -> None:
+        connection.execute(
+            text(
+                f"INSERT INTO {INDEX_TABLE} (entity_type, entity_id, document)"
+                " VALUES (:entity_type, :entity_id,"
+                f" setweight(to_tsvector('{self.config}', :title), 'A')"
+                f" || setweight(to_tsvector('{self.config}', :body), 'B'))"
+                " ON CONFLICT (entity_type, entity_id)"
+                " DO UPDATE SET document = EXCLUDED.document"
+            ),
+            [doc._asdict() for doc in documents],
+        )
+
+    def search_statement(
+        self, entity_type: str, terms: Sequence[str], limit: int
+    ) -> TextClause:
+        # cada palavra vale como prefixo, para buscar enquanto se digita
+        query = " & ".join(f"{term}:*" for term in terms)
+        return text(
+            "SELECT entity_id, ts_rank_cd(document, query) AS rank"
+            f" FROM {INDEX_TABLE}, to_tsquery('{self.config}', :query) query"
+            " WHERE entity_type = :entity_type AND document @@ query"
+            " ORDER BY rank DESC, entity_id LIMIT :limit"
+        ).bindparams(entity_type=entity_type, query=query, limit=limit)
+
+
+class SQLiteTextSearch(TextSearchBackend):
+    """
+    Tabela virtual FTS5 sem acentos (remove_diacritics), com ranking bm25.
+    O SQLite não tem stemming em português, então cada palavra vale como
+    prefixo. O tipo e o id ficam no rowid, para atualizar sem varredura.
+    """
+
+    name = "sqlite"
+
+    def create(self, connection: Connection) -> None:
+        connection.execute(
+            text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {INDEX_TABLE}"
+                " USING fts5(title, body,"
+                " tokenize = 'unicode61 remove_diacritics 2')"
+            )
+        )
+
+    @staticmethod
+    def rowid(entity_type: str, entity_id: int) -> int:
+        return entity_id * ENTITY_CODE_BITS + ENTITY_CODES[entity_type]
+
+    def delete(self, connection: Connection, keys: Sequence[tuple]) -> None:
+        connection.execute(
+            text(f"DELETE FROM {INDEX_TABLE} WHERE rowid = :rowid"),
+            [{"rowid": self.rowid(*key)} for key in keys],
+        )
+
+    def upsert(
+        self, connection: Connection, documents: Sequence[SearchDocument]
+    ) -> None:
+        self.delete(
+            connection, [(doc.entity_type, doc.entity_id) for doc in documents]
+        )
+        connection.execute(
+            text(
+                f"INSERT INTO {INDEX_TABLE} (rowid, title, body)"
+                " VALUES (:rowid, :title, :body)"
+            ),
+            [
+                {
+                    "rowid": self.rowid(doc.entity_type, doc.entity_id),
+                    "title": doc.title,
+                    "body": doc.body,
+                }
+                for doc in documents
+            ],
+        )
+
+    def search_statement(
+        self, entity_type: str, terms: Sequence[str], limit: int
+    ) -> TextClause:
+        query = " ".join(f'"{term}"*' for term in terms)
+        return text(
+            f"SELECT rowid / {ENTITY_CODE_BITS} AS entity_id,"
+            f" -bm25({INDEX_TABLE}, 10.0, 1.0) AS rank"
+            f" FROM {INDEX_TABLE}"
+            f" WHERE {INDEX_TABLE} MATCH :query"
+            f" AND rowid % {ENTITY_CODE_BITS} = :code"
+            " ORDER BY rank DESC LIMIT :limit"
+        ).bindparams(query=query, code=ENTITY_CODES[entity_type], limit=limit)
+
+
+def get_text_search_backend(dialect_name: str) -> TextSearchBackend:
+    if dialect_name == "postgresql":
+        return PostgresTextSearch()
+    if dialect_name == "sqlite":
+        return SQLiteTextSearch()
+    return TextSearchBackend()
+
+
+def _local_documents(
+    connection: Connection,
+    local_ids: Optional[Iterable[int]] = None,
+    category_ids: Optional[Iterable[int]] = None,
+) -> List[SearchDocument]:
+    """
+    Função que monta os documentos dos locais, com o nome e o slug da
+    categoria principal no corpo
+    """
+    local, category = Local.__table__, Category.__table__
+    statement = select(
+        local.c.id,
+        local.c.name,
+        local.c.slug,
+        local.c.description,
+        local.c.address,
+        local.c.website,
+        local.c.phone,
+        category.c.name.label("category_name"),
+        category.c.slug.label("category_slug"),
+    ).select_from(
+        local.outerjoin(category, local.c.main_category_id == category.c.id)
+    )
+    if local_ids is not None:
+        statement = statement.where(local.c.id.in_(list(local_ids)))
+    if category_ids is not None:
+        statement = statement.where(
+            local.c.main_category_id.in_(list(category_ids))
+        )
+
+    documents = []
+    for row in connection.execute(statement):
+        body = [
+            row.slug,
+            row.description,
+            row.address,
+            row.website,
+            row.phone,
+            row.category_name,
+            row.category_slug,
+        ]
+        documents.append(
+            SearchDocument(
+                LOCAL, row.id, row.name, " ".join(filter(None, body))
+            )
+        )
+    return documents
+
+
+def _category_documents(
+    connection: Connection, ids: Optional[Iterable[int]] = None
+) -> List[SearchDocument]:
+    category = Category.__table__
+    statement = select(category.c.id, category.c.name, category.c.slug)
+    if ids is not None:
+        statement = statement.where(category.c.id.in_(list(ids)))
+    return [
+        SearchDocument(CATEGORY, row.id, row.name, row.slug)
+        for row in connection.execute(statement)
+    ]
+
+
+def _tag_documents(
+    connection: Connection, ids: Optional[Iterable[int]] = None
+) -> List[SearchDocument]:
+    tag = Tag.__table__
+    statement = select(tag.c.id, tag.c.content)
+    if ids is not None:
+        statement = statement.where(tag.c.id.in_(list(ids)))
+    return [
+        SearchDocument(TAG, row.id, row.content, "")
+        for row in connection.execute(statement)
+    ]
+
+
+class TextSearchIndex(FlushListener):
+    """
+    Mantém o índice de texto: cria a tabela, reconstrói o índice e atualiza
+    os documentos alterados em cada flush de uma sessão, na mesma transação
+    """
+
+    def __init__(self):
+        self._backends: Dict[str, TextSearchBackend] = {}
+
+    def backend(self, dialect_name: str) -> TextSearchBackend:
+        if dialect_name not in self._backends:
+            self._backends[dialect_name] = get_text_search_backend(
+                dialect_name
+            )
+        return self._backends[dialect_name]
+
+    def create(self, metadata, connection: Connection, **kwargs) -> None:
+        # criado junto com as tabelas (SQLModel.metadata.create_all)
+        self.backend(connection.dialect.name).create(connection)
+
+    def setup(self, engine: Engine) -> None:
+        """
+        Preenche o índice se ele estiver vazio enquanto há locais (bancos
+        criados antes do índice)
+        """
+        backend = self.backend(engine.dialect.name)
+        with engine.begin() as connection:
+            backend.create(connection)
+            has_locals = connection.execute(
+                select(Local.__table__.c.id).limit(1)
+            ).first()
+            if has_locals and not backend.count(connection):
+                self.rebuild(connection)
+
+    def rebuild(self, connection: Connection) -> int:
+        backend = self.backend(connection.dialect.name)
+        documents = (
+            _local_documents(connection)
+            + _category_documents(connection)
+            + _tag_documents(connection)
+        )
+        backend.clear(connection)
+        if documents:
+            backend.upsert(connection, documents)
+        return len(documents)
+
+    def update(
+        self,
+        connection: Connection,
+        changed: Dict[str, Set[int]],
+        deleted: Dict[str, Set[int]],
+    ) -> None:
+        backend = self.backend(connection.dialect.name)
+        keys = [
+            (entity_type, entity_id)
+            for entity_type, ids in deleted.items()
+            for entity_id in ids
+        ]
+        if keys:
+            backend.delete(connection, keys)
+
+        documents = []
+        if changed[LOCAL]:
+            documents += _local_documents(connection, local_ids=changed[LOCAL])
+        if changed[CATEGORY]:
+            documents += _category_documents(connection, changed[CATEGORY])
+            # o nome da categoria faz parte do documento dos seus locais
+            documents += _local_documents(
+                connection, category_ids=changed[CATEGORY]
+            )
+        if changed[TAG]:
+            documents += _tag_documents(connection, changed[TAG])
+        # um local novo de uma categoria nova vem pelos dois caminhos
+        unique = {
+            (document.entity_type, document.entity_id): document
+            for document in documents
+        }
+        if unique:
+            backend.upsert(connection, list(unique.values()))
+
+    def on_flush(self, session: Session, changes: FlushChanges) -> None:
+        changed: Dict[str, Set[int]] = {key: set() for key in ENTITY_CODES}
+        deleted: Dict[str, Set[int]] = {key: set() for key in ENTITY_CODES}
+        for instances, target in (
+            (changes.new + changes.dirty, changed),
+            (changes.deleted, deleted),
+        ):
+            for instance in instances:
+                entity_type = _entity_type(instance)
+                if entity_type is not None and instance.id is not None:
+                    target[entity_type].add(instance.id)
+        for entity_type, ids in deleted.items():
+            changed[entity_type] -= ids
+
+        if any(changed.values()) or any(deleted.values()):
+            self.update(session.connection(), changed, deleted)
+
+    async def search(
+        self,
+        session: AsyncSession,
+        entity_type: str,
+        query: str,
+        limit: int,
+    ) -> List[int]:
+        """
+        Retorna os IDs que contêm todas as palavras da busca, do mais para o
+        menos relevante
+        """
+        terms = search_terms(query)
+        if not terms:
+            return []
+        backend = self.backend(session.bind.dialect.name)
+        statement = backend.search_statement(entity_type, terms, limit)
+        result = await session.execute(statement)
+        return [row.entity_id for row in result]
+
+
+def rank_ordering(column, ids: Sequence[int]):
+    """
+    Função que ordena as linhas na ordem dos IDs retornados pela busca
+    """
+    return case({id: index for index, id in enumerate(ids)}, value=column)
+
+
+def _entity_type(instance) -> Optional[str]:
+    if isinstance(instance, Local):
+        return LOCAL
+    if isinstance(instance, Category):
+        return CATEGORY
+    if isinstance(instance, Tag):
+        return TAG
+    return None
+
+
+text_search_index = TextSearchIndex()
+
+event.listen(SQLModel.metadata, "after_create", text_search_index.create)
+text_search_index.listen()
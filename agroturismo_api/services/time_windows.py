@@ -0,0 +1,108 @@
+from datetime import date
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from sqlmodel import Session, select
+
+from ..core.config import ROUTE_AVERAGE_SPEED
+from ..models.opening_hours import OpeningHours
+from ..models.special_opening_hours import SpecialOpeningHours
+
+MAX_INTERVALS = 2  # com pausa, o local abre em dois intervalos no dia
+MINUTES_PER_DAY = 24 * 60
+
+Hours = Union[OpeningHours, SpecialOpeningHours]
+
+
+def parse_time(value: str) -> int:
+    """
+    Função que converte um horário no formato HH:MM em minutos desde a
+    meia-noite
+    """
+    hours, minutes = value.split(":")[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+def format_time(minutes: float) -> str:
+    minutes = int(round(minutes))
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def opening_intervals(hours: Hours) -> List[Tuple[int, int]]:
+    """
+    Função que converte um horário de funcionamento nos intervalos em que o
+    local fica aberto, em minutos desde a meia-noite
+    """
+    if hours.is_closed:
+        return []
+    start = parse_time(hours.start_time) if hours.start_time else 0
+    end = parse_time(hours.end_time) if hours.end_time else MINUTES_PER_DAY
+    if end <= start:
+        end += MINUTES_PER_DAY  # fecha depois da meia-noite
+    if hours.start_pause_time and hours.end_pause_time:
+        return [
+            (start, parse_time(hours.start_pause_time)),
+            (parse_time(hours.end_pause_time), end),
+        ]
+    return [(start, end)]
+
+
+def load_opening_intervals(
+    session: Session, ids: Sequence[int], visit_date: date
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Função que obtém, com uma consulta por tabela, os intervalos de
+    funcionamento dos locais na data dada como dois arrays (n, MAX_INTERVALS)
+    com a abertura e o fechamento de cada intervalo, em minutos
+
+    O horário especial da data tem preferência sobre o do dia da semana. Um
+    local sem nenhum horário cadastrado é considerado sempre aberto, e um
+    local com horários apenas para outros dias, fechado. Os intervalos que
+    não existem ficam com abertura inf e fechamento -inf.
+    """
+    unique_ids = list(set(ids))
+    weekday = (visit_date.weekday() + 1) % 7  # 0 é domingo
+    special = {
+        hours.local_id: hours
+        for hours in session.exec(
+            select(SpecialOpeningHours).where(
+                SpecialOpeningHours.local_id.in_(unique_ids),
+                SpecialOpeningHours.opening_date == visit_date,
+            )
+        )
+    }
+    regular = {}
+    with_hours = set()
+    for hours in session.exec(
+        select(OpeningHours).where(OpeningHours.local_id.in_(unique_ids))
+    ):
+        with_hours.add(hours.local_id)
+        if hours.weekday == weekday:
+            regular[hours.local_id] = hours
+
+    opens = np.full((len(ids), MAX_INTERVALS), np.inf)
+    closes = np.full((len(ids), MAX_INTERVALS), -np.inf)
+    for i, local_id in enumerate(ids):
+        hours = special.get(local_id, regular.get(local_id))
+        if hours is not None:
+            intervals = opening_intervals(hours)
+        elif local_id in with_hours:
+            intervals = []
+        else:
+            intervals = [(0, np.inf)]
+        for k, (open_at, close_at) in enumerate(intervals[:MAX_INTERVALS]):
+            opens[i, k], closes[i, k] = open_at, close_at
+    return opens, closes
+
+
+def travel_times(
+    distances: np.ndarray,
+    durations: np.ndarray,
+    speed: Optional[float] = None,
+) -> np.ndarray:
+    """
+    Função que completa as durações (minutos) desconhecidas com a distância
+    percorrida na velocidade média `speed` (km/h)
+    """
+    speed = speed or ROUTE_AVERAGE_SPEED
+    return np.where(np.isnan(durations), distances / speed * 60, durations)
@@ -1,9 +1,11 @@
 from .calculate_distance_matrix import calculate_distance_matrix
 from .calculate_solution_cost import calculate_solution_cost
 from .generate_random_solution import generate_random_solution
+from .query_counter import QueryCounter
 
 __all__ = [
     "calculate_distance_matrix",
     "calculate_solution_cost",
     "generate_random_solution",
+    "QueryCounter",
 ]
@@ -1,49 +1,60 @@
-from typing import List, Tuple
+from typing import Optional, Sequence, Tuple, Union
 
-import httpx
 import numpy as np
 
-from .haversine_distance import haversine_distance
+from .haversine_distance import haversine_distances
 
+Coords = Union[Sequence[Tuple[float, float]], np.ndarray]
 
-def calculate_distance_matrix(coords: List[Tuple[float, float]]):
-    """
-    Função que calcula a matriz de distâncias a partir de um conjunto de coordenadas
-    """
-    num_points = len(coords)
-    dist_matrix = np.zeros((num_points, num_points))
-    for i in range(num_points):
-        for j in range(i + 1, num_points):
-            dist = haversine_distance(coords[i], coords[j])
-            dist_matrix[i][j] = dist
-            dist_matrix[j][i] = dist
-    return dist_matrix
-
-
-def get_distance_matrix_osrm(points: List[Tuple[float, float]]):
-    """
-    Função que obtém a matriz de distâncias a partir de um conjunto de coordenadas
-    """
-    url = f"https://router.project-osrm.org/table/v1/driving/"
-    params = {
-        "sources": ";".join([f"{i}" for i in range(len(points))]),
-        "destinations": ";".join([f"{i}" for i in range(len(points))]),
-        "annotations": "distance"
-    }
-
-    url_with_points = url + ";".join([f"{p[1]},{p[0]}" for p in points])
+# limite de elementos por bloco (linhas x colunas) no modo em blocos
+DEFAULT_CHUNK_ELEMENTS = 1_000_000
 
-    response = httpx.get(url_with_points, params=params)
 
-    distances = response.json()["distances"]
-    matrix = np.zeros((len(points), len(points)))
+def _as_coords_array(coords: Coords) -> np.ndarray:
+    coords = np.asarray(coords, dtype=np.float64)
+    if coords.size == 0:
+        return coords.reshape(0, 2)
+    if coords.ndim != 2 or coords.shape[1] != 2:
+        raise ValueError("As coordenadas devem ter o formato (n, 2)")
+    return coords
 
-    for i, row in enumerate(distances):
-        for j, element in enumerate(row):
-            matrix[i][j] = element / 1000  # Dividir por 1000 para obter responsedistâncias em km
 
-    request_url = response.request.url
-
-    print("\n\n", request_url, matrix, sep="\n", end="\n\n")
+def calculate_distance_matrix(
+    coords: Coords,
+    destinations: Optional[Coords] = None,
+    dtype=np.float64,
+    chunk_size: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Função que calcula a matriz de distâncias a partir de um conjunto de coordenadas
 
-    return matrix
+    Se `destinations` for informado, retorna a matriz retangular
+    (origens x destinos). Com `chunk_size`, as linhas são calculadas em blocos
+    para limitar a memória usada pelos arrays intermediários.
+    """
+    origins = _as_coords_array(coords)
+    square = destinations is None
+    targets = origins if square else _as_coords_array(destinations)
+
+    num_rows, num_cols = origins.shape[0], targets.shape[0]
+    dist_matrix = np.empty((num_rows, num_cols), dtype=dtype)
+    if num_rows == 0 or num_cols == 0:
+        return dist_matrix
+
+    if chunk_size is None:
+        chunk_size = max(1, DEFAULT_CHUNK_ELEMENTS // num_cols)
+
+    lat2 = targets[:, 0][np.newaxis, :]
+    lon2 = targets[:, 1][np.newaxis, :]
+    for start in range(0, num_rows, chunk_size):
+        stop = min(start + chunk_size, num_rows)
+        dist_matrix[start:stop] = haversine_distances(
+            origins[start:stop, 0][:, np.newaxis],
+            origins[start:stop, 1][:, np.newaxis],
+            lat2,
+            lon2,
+        )
+
+    if square:
+        np.fill_diagonal(dist_matrix, 0)
+    return dist_matrix
@@ -1,9 +1,13 @@
-def calculate_solution_cost(solution, dist_matrix):
+def calculate_solution_cost(solution, dist_matrix, closed=True):
     """
     Função que calcula o custo de uma solução
+
+    Com `closed` falso a solução é um caminho aberto e a volta do último
+    ponto para o primeiro não é somada.
     """
     cost = 0
     for i in range(len(solution) - 1):
         cost += dist_matrix[solution[i]][solution[i + 1]]
-    cost += dist_matrix[solution[-1]][solution[0]]
+    if closed:
+        cost += dist_matrix[solution[-1]][solution[0]]
     return cost
@@ -1,5 +1,7 @@
 import numpy as np
 
+EARTH_RADIUS_KM = 6371  # raio da Terra em km
+
 
 def haversine_distance(coords1, coords2):
     """
@@ -7,7 +9,7 @@ def haversine_distance(coords1, coords2):
     """
     lat1, lon1 = coords1
     lat2, lon2 = coords2
-    R = 6371  # raio da Terra em km
+    R = EARTH_RADIUS_KM
     dLat = np.radians(lat2 - lat1)
     dLon = np.radians(lon2 - lon1)
     a = np.sin(dLat / 2) * np.sin(dLat / 2) + np.cos(
@@ -16,3 +18,22 @@ def haversine_distance(coords1, coords2):
     c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
     distance = R * c
     return distance
+
+
+def haversine_distances(lat1, lon1, lat2, lon2):
+    """
+    Função que calcula a distância haversine entre arrays de coordenadas
+    (em graus), seguindo as regras de broadcasting do NumPy
+    """
+    lat1 = np.radians(lat1)
+    lon1 = np.radians(lon1)
+    lat2 = np.radians(lat2)
+    lon2 = np.radians(lon2)
+    sin_dlat = np.sin((lat2 - lat1) / 2)
+    sin_dlon = np.sin((lon2 - lon1) / 2)
+    a = sin_dlat * sin_dlat + (
+        np.cos(lat1) * np.cos(lat2) * sin_dlon * sin_dlon
+    )
+    a = np.clip(a, 0.0, 1.0)
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return EARTH_RADIUS_KM * c
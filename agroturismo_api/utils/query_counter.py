@@ -0,0 +1,57 @@
+from typing import List, Optional
+
+from sqlalchemy import event
+
+
+class QueryCounter:
+    """
+    Conta as consultas SQL executadas nos engines informados (síncronos ou
+    assíncronos) enquanto o contexto está ativo:
+
+        with QueryCounter(engine, async_engine) as counter:
+            client.get("/api/locals/")
+        counter.assert_at_most(3)
+    """
+
+    def __init__(self, *engines):
+        self.engines = [
+            getattr(engine, "sync_engine", engine) for engine in engines
+        ]
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _before_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ) -> None:
+        self.statements.append(statement)
+
+    def __enter__(self) -> "QueryCounter":
+        self.statements = []
+        for engine in self.engines:
+            event.listen(
+                engine, "before_cursor_execute", self._before_cursor_execute
+            )
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        for engine in self.engines:
+            event.remove(
+                engine, "before_cursor_execute", self._before_cursor_execute
+            )
+
+    def assert_at_most(
+        self, max_queries: int, label: Optional[str] = None
+    ) -> None:
+        """
+        Função que falha quando foram executadas mais de `max_queries`
+        consultas, listando todas elas
+        """
+        if self.count > max_queries:
+            statements = "\n\n".join(self.statements)
+            raise AssertionError(
+                f"{label or 'Bloco'} executou {self.count} consultas, o "
+                f"limite é {max_queries}:\n\n{statements}"
+            )
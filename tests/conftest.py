@@ -0,0 +1,15 @@
+import os
+import tempfile
+
+# The engines are created when agroturismo_api is imported, so the test
+# database is set before the tests import it.
+_directory = tempfile.mkdtemp(prefix="agroturismo-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_directory}/test.sqlite3"
+os.environ["ASYNC_DATABASE_URL"] = ""
+os.environ["ROUTING_PROVIDER"] = "haversine"
+os.environ["AUTOCOMPLETE_REFRESH_INTERVAL"] = "0"
+os.environ["PASSWORD_BCRYPT_ROUNDS"] = "4"
+
+# the app imports every model, so that the relationships between them can be
+# mapped whatever models a test uses
+import agroturismo_api.main  # noqa: E402,F401
@@ -0,0 +1,87 @@
+import asyncio
+
+import numpy as np
+import pytest
+from sqlmodel import Session
+
+from agroturismo_api.core.db import create_db_and_tables, engine
+from agroturismo_api.models.category import Category
+from agroturismo_api.models.local import Local
+from agroturismo_api.services.distance_cache import (
+    DistanceCache,
+    PairLRUCache,
+)
+from agroturismo_api.services.routing_provider import (
+    MOCK_DETOUR_FACTOR,
+    MockOSRMProvider,
+)
+from agroturismo_api.utils import calculate_distance_matrix
+
+COORDS = np.array([[-20.50, -40.50], [-20.52, -40.47], [-20.47, -40.55]])
+
+
+@pytest.fixture(scope="module")
+def local_ids():
+    create_db_and_tables(engine)
+    with Session(engine) as session:
+        category = Category(name="Distances", slug="distances")
+        locals = [
+            Local(
+                name=f"Distance {i}",
+                slug=f"distance-{i}",
+                latitude=latitude,
+                longitude=longitude,
+                address="",
+                description="",
+                main_category=category,
+            )
+            for i, (latitude, longitude) in enumerate(COORDS)
+        ]
+        session.add_all(locals)
+        session.commit()
+        return [local.id for local in locals]
+
+
+@pytest.fixture
+def session(local_ids):
+    with Session(engine) as session:
+        yield session
+        for local_id in local_ids:
+            DistanceCache(session).invalidate(local_id)
+        session.commit()
+
+
+def road_matrix(session, ids, coords, lru):
+    provider = MockOSRMProvider()
+    distances, _ = asyncio.run(
+        DistanceCache(session, lru).get_matrices_async(ids, coords, provider)
+    )
+    return distances
+
+
+@pytest.mark.parametrize("lru_size", [0, 100])
+def test_road_costs_are_not_read_as_straight_line(
+    session, local_ids, lru_size
+):
+    lru = PairLRUCache(lru_size)
+    # a route from the road provider caches the first two locals
+    road_matrix(session, local_ids[:2], COORDS[:2], lru)
+
+    distances = DistanceCache(session, lru).get_matrix(local_ids, COORDS)
+
+    expected = calculate_distance_matrix(COORDS)
+    np.testing.assert_allclose(distances, expected)
+    np.testing.assert_allclose(distances, distances.T)
+
+
+@pytest.mark.parametrize("lru_size", [0, 100])
+def test_straight_line_costs_are_not_read_as_road(
+    session, local_ids, lru_size
+):
+    lru = PairLRUCache(lru_size)
+    DistanceCache(session, lru).get_matrix(local_ids[:2], COORDS[:2])
+
+    distances = road_matrix(session, local_ids, COORDS, lru)
+
+    expected = calculate_distance_matrix(COORDS) * MOCK_DETOUR_FACTOR
+    np.testing.assert_allclose(distances, expected, rtol=1e-5)
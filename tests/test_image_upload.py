@@ -0,0 +1,143 @@
+import asyncio
+import io
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from fastapi.testclient import TestClient
+from PIL import Image as PILImage
+from sqlmodel import Session
+
+from agroturismo_api.core.db import create_db_and_tables, engine
+from agroturismo_api.main import app
+from agroturismo_api.models.category import Category
+from agroturismo_api.models.local import Local
+from agroturismo_api.routes import local as local_routes
+from agroturismo_api.services.image_upload import ImageIngest, LocalUploader
+
+FOLDER = "agroturismo/locais/teste"
+
+
+def jpeg(width=640, height=480) -> bytes:
+    buffer = io.BytesIO()
+    PILImage.new("RGB", (width, height), (120, 160, 80)).save(
+        buffer, format="JPEG"
+    )
+    return buffer.getvalue()
+
+
+def ingest_all(ingest, files):
+    async def run():
+        return await ingest.upload(
+            [
+                UploadFile(io.BytesIO(content), filename=filename)
+                for filename, content in files
+            ],
+            FOLDER,
+        )
+
+    return asyncio.run(run())
+
+
+def stored_files(directory):
+    return {
+        path.relative_to(directory).as_posix()
+        for path in directory.rglob("*")
+        if path.is_file()
+    }
+
+
+@pytest.fixture
+def ingest(tmp_path):
+    ingest = ImageIngest(LocalUploader(str(tmp_path)), max_workers=4)
+    yield ingest
+    ingest.shutdown()
+
+
+def test_uploads_every_variant_in_order(ingest, tmp_path):
+    images = ingest_all(
+        ingest, [("a.jpg", jpeg(800, 600)), ("b.jpg", jpeg(300, 200))]
+    )
+
+    assert [image.image.width for image in images] == [800, 300]
+    for image in images:
+        assert image.variants[0].placeholder
+        assert image.image.public_id in image.public_ids
+    assert stored_files(tmp_path) == {
+        public_id for image in images for public_id in image.public_ids
+    }
+
+
+def test_same_filename_does_not_overwrite_an_earlier_upload(ingest, tmp_path):
+    (first,) = ingest_all(ingest, [("foto.jpg", jpeg())])
+    (second,) = ingest_all(ingest, [("foto.jpg", jpeg())])
+
+    assert not set(first.public_ids) & set(second.public_ids)
+
+    # the second upload was not saved, as when the commit fails
+    asyncio.run(ingest.discard([second]))
+    assert stored_files(tmp_path) == set(first.public_ids)
+
+
+def test_failed_upload_discards_the_other_images(ingest, tmp_path):
+    with pytest.raises(HTTPException) as error:
+        ingest_all(ingest, [("a.jpg", jpeg()), ("b.jpg", b"not an image")])
+
+    assert error.value.status_code == 400
+    assert stored_files(tmp_path) == set()
+
+
+class FailingUploader(LocalUploader):
+    def upload(self, file, folder, filename):
+        if filename.endswith(".webp"):
+            raise ConnectionError("upload failed")
+        return super().upload(file, folder, filename)
+
+
+def test_failed_variant_discards_the_uploaded_ones(tmp_path):
+    ingest = ImageIngest(FailingUploader(str(tmp_path)), max_workers=2)
+    try:
+        with pytest.raises(HTTPException) as error:
+            ingest_all(ingest, [("a.jpg", jpeg())])
+    finally:
+        ingest.shutdown()
+
+    assert error.value.status_code == 502
+    assert stored_files(tmp_path) == set()
+
+
+@pytest.fixture
+def local_id():
+    create_db_and_tables(engine)
+    with Session(engine) as session:
+        local = Local(
+            name="Galeria",
+            slug="galeria",
+            latitude=-20.4,
+            longitude=-40.4,
+            address="",
+            description="",
+            main_category=Category(name="Galeria", slug="galeria"),
+        )
+        session.add(local)
+        session.commit()
+        return local.id
+
+
+def test_gallery_is_saved_in_one_request(
+    local_id, ingest, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(local_routes, "image_ingest", ingest)
+    files = [
+        ("image_files", ("foto.jpg", jpeg(), "image/jpeg")),
+        ("image_files", ("foto.jpg", jpeg(400, 300), "image/jpeg")),
+    ]
+    with TestClient(app) as client:
+        response = client.post(
+            f"/api/locals/add-images/{local_id}", files=files
+        )
+
+    assert response.status_code == 200, response.json()
+    images = response.json()["images"]
+    assert len(images) == 2
+    urls = {image["image"]["url"] for image in images}
+    assert len(urls) == 2
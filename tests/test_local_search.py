@@ -0,0 +1,132 @@
+import numpy as np
+import pytest
+
+from agroturismo_api.services.algorithms.local_search import (
+    EPSILON,
+    MAX_SEGMENT_LENGTH,
+    apply_or_opt,
+    apply_swap,
+    local_search,
+    or_opt_delta,
+    reverse_segment,
+    swap_delta,
+    tour_positions,
+    two_opt_delta,
+)
+from agroturismo_api.utils import (
+    calculate_distance_matrix,
+    calculate_solution_cost,
+)
+
+SEEDS = range(5)
+SIZES = range(4, 9)
+
+
+def random_instance(seed: int, num_points: int):
+    rng = np.random.default_rng(seed)
+    coords = rng.uniform([-21.0, -41.0], [-20.0, -40.0], (num_points, 2))
+    dist = calculate_distance_matrix(coords).tolist()
+    tour = rng.permutation(num_points).tolist()
+    return dist, tour
+
+
+def cost_change(dist, tour, move) -> float:
+    moved = list(tour)
+    pos = tour_positions(moved)
+    move(moved, pos)
+    assert sorted(moved) == sorted(tour)
+    assert pos == tour_positions(moved)
+    return calculate_solution_cost(moved, dist) - calculate_solution_cost(
+        tour, dist
+    )
+
+
+@pytest.mark.parametrize("num_points", SIZES)
+@pytest.mark.parametrize("seed", SEEDS)
+def test_swap_delta_matches_the_recomputed_cost(seed, num_points):
+    dist, tour = random_instance(seed, num_points)
+    for i in range(num_points):
+        for j in range(num_points):
+            if i == j:
+                continue
+            expected = cost_change(
+                dist, tour, lambda t, pos: apply_swap(t, pos, i, j)
+            )
+            assert swap_delta(tour, dist, i, j) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("num_points", SIZES)
+@pytest.mark.parametrize("seed", SEEDS)
+def test_two_opt_delta_matches_the_recomputed_cost(seed, num_points):
+    dist, tour = random_instance(seed, num_points)
+    n = num_points
+    for i in range(n):
+        for j in range(n):
+            a, b = tour[i], tour[(i + 1) % n]
+            c, d = tour[j], tour[(j + 1) % n]
+            if len({a, b, c, d}) < 4:
+                continue
+            expected = cost_change(
+                dist,
+                tour,
+                lambda t, pos: reverse_segment(t, pos, (i + 1) % n, j),
+            )
+            assert two_opt_delta(dist, a, b, c, d) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("num_points", SIZES)
+@pytest.mark.parametrize("seed", SEEDS)
+def test_or_opt_delta_matches_the_recomputed_cost(seed, num_points):
+    dist, tour = random_instance(seed, num_points)
+    pos = tour_positions(tour)
+    n = num_points
+    for i in range(n):
+        for length in range(1, min(MAX_SEGMENT_LENGTH, n - 3) + 1):
+            segment = [tour[(i + k) % n] for k in range(length)]
+            prev = tour[i - 1]
+            for after in tour:
+                if after == prev or after in segment:
+                    continue
+                for reverse in (False, True):
+                    expected = cost_change(
+                        dist,
+                        tour,
+                        lambda t, p: apply_or_opt(
+                            t, p, i, length, after, reverse
+                        ),
+                    )
+                    delta = or_opt_delta(
+                        tour, pos, dist, i, length, after, reverse
+                    )
+                    assert delta == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("num_points", SIZES)
+@pytest.mark.parametrize("seed", SEEDS)
+def test_local_search_stops_at_a_local_optimum(seed, num_points):
+    dist, tour = random_instance(seed, num_points)
+
+    result, cost = local_search(list(tour), np.array(dist))
+
+    assert sorted(result) == list(range(num_points))
+    assert cost == pytest.approx(calculate_solution_cost(result, dist))
+    assert cost <= calculate_solution_cost(tour, dist) + EPSILON
+    n = num_points
+    for i in range(n):
+        for j in range(n):
+            if i != j:
+                assert swap_delta(result, dist, i, j) > -1e-7
+            a, b = result[i], result[(i + 1) % n]
+            c, d = result[j], result[(j + 1) % n]
+            if len({a, b, c, d}) == 4:
+                assert two_opt_delta(dist, a, b, c, d) > -1e-7
+
+
+def test_local_search_keeps_the_fixed_edges():
+    dist, tour = random_instance(0, 8)
+    fixed = {(tour[0], tour[1]), (tour[1], tour[0])}
+
+    result, _ = local_search(list(tour), np.array(dist), fixed_edges=fixed)
+
+    i = result.index(tour[0])
+    assert tour[1] in (result[i - 1], result[(i + 1) % len(result)])
@@ -0,0 +1,55 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from agroturismo_api import security
+from agroturismo_api.core.db import create_db_and_tables, engine
+from agroturismo_api.main import app
+from agroturismo_api.models.admin_user import AdminUser
+from agroturismo_api.services.rate_limiter import RateLimiter
+
+USERNAME = "rate-limited"
+PASSWORD = "correct horse"
+
+
+@pytest.fixture(scope="module", autouse=True)
+def user():
+    create_db_and_tables(engine)
+    with Session(engine) as session:
+        session.add(AdminUser(username=USERNAME, password=PASSWORD))
+        session.commit()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(security, "CLIENT_IP_HEADER", "Fly-Client-IP")
+    monkeypatch.setattr(security, "login_rate_limiter", RateLimiter(100, 60))
+    monkeypatch.setattr(
+        security, "client_login_rate_limiter", RateLimiter(3, 60)
+    )
+    with TestClient(app) as client:
+        yield client
+
+
+def login(client, password, client_ip="10.0.0.1", username=USERNAME):
+    return client.post(
+        "/api/token",
+        data={"username": username, "password": password},
+        headers={"Fly-Client-IP": client_ip},
+    )
+
+
+def test_successful_logins_do_not_use_up_the_attempts(client):
+    for _ in range(5):
+        assert login(client, PASSWORD).status_code == 200
+
+
+def test_failed_logins_are_limited_per_client_ip(client):
+    for _ in range(3):
+        assert login(client, "wrong").status_code == 401
+
+    response = login(client, PASSWORD)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    # another client behind the same proxy is not blocked
+    assert login(client, PASSWORD, client_ip="10.0.0.2").status_code == 200
@@ -0,0 +1,63 @@
+import pytest
+from sqlmodel import Session
+
+from agroturismo_api.core.db import create_db_and_tables, engine
+from agroturismo_api.core.query_budget import check_query_budgets
+from agroturismo_api.main import app
+from agroturismo_api.models.category import Category
+from agroturismo_api.models.gallery_local import GalleryLocal
+from agroturismo_api.models.image import Image
+from agroturismo_api.models.image_variant import ImageVariant
+from agroturismo_api.models.local import Local
+from agroturismo_api.models.tag import Tag
+
+LOCALS = 5
+
+
+@pytest.fixture(scope="module", autouse=True)
+def catalogue():
+    create_db_and_tables(engine)
+    with Session(engine) as session:
+        category = Category(name="Agroturismo", slug="agroturismo")
+        tags = [Tag(content=f"tag {i}") for i in range(3)]
+        for i in range(LOCALS):
+            local = Local(
+                name=f"Local {i}",
+                slug=f"local-{i}",
+                latitude=-20.5 + i * 0.01,
+                longitude=-40.5 + i * 0.01,
+                address="",
+                description="",
+                main_category=category,
+                tags=tags[: i % len(tags) + 1],
+            )
+            session.add(local)
+            for arrangement in range(2):
+                image = Image(
+                    url=f"/uploads/local-{i}-{arrangement}.jpg",
+                    width=640,
+                    height=480,
+                    public_id=f"local-{i}-{arrangement}",
+                    variants=[
+                        ImageVariant(
+                            format=format,
+                            width=640,
+                            height=480,
+                            url=f"/uploads/local-{i}-{arrangement}.{format}",
+                            size=1000,
+                        )
+                        for format in ("webp", "jpeg")
+                    ],
+                )
+                session.add(
+                    GalleryLocal(
+                        local=local, image=image, arrangement=arrangement
+                    )
+                )
+        session.commit()
+
+
+def test_endpoints_stay_within_query_budgets():
+    counts = check_query_budgets(app)
+    assert all(count.status_code == 200 for count in counts), counts
+    assert all(count.ok for count in counts), "\n".join(map(str, counts))
@@ -0,0 +1,147 @@
+import asyncio
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from agroturismo_api.core.db import create_db_and_tables, engine
+from agroturismo_api.main import app
+from agroturismo_api.models.category import Category
+from agroturismo_api.models.local import Local
+from agroturismo_api.routes import algorithm
+from agroturismo_api.services.distance_cache import (
+    DistanceCache,
+    PairLRUCache,
+)
+from agroturismo_api.services.routing_provider import (
+    MOCK_DETOUR_FACTOR,
+    UNREACHABLE_DISTANCE,
+    UNREACHABLE_DURATION,
+    MockOSRMProvider,
+)
+from agroturismo_api.utils import calculate_distance_matrix
+
+COORDS = np.array(
+    [[-20.60, -40.60], [-20.62, -40.57], [-20.57, -40.65], [-20.65, -40.61]]
+)
+ISLAND = tuple(COORDS[2])
+
+
+def table(provider, origins, destinations=None):
+    async def run():
+        try:
+            return await provider.table(origins, destinations)
+        finally:
+            await provider.aclose()
+
+    return asyncio.run(run())
+
+
+def test_table_matches_the_mock_server():
+    distances, durations = table(MockOSRMProvider(), COORDS)
+
+    expected = calculate_distance_matrix(COORDS) * MOCK_DETOUR_FACTOR
+    np.testing.assert_allclose(distances, expected, rtol=1e-5)
+    assert np.all(durations[~np.eye(len(COORDS), dtype=bool)] > 0)
+
+
+def test_large_tables_are_split_in_blocks():
+    whole = table(MockOSRMProvider(), COORDS)
+    blocks = table(MockOSRMProvider(max_table_size=3), COORDS, COORDS[1:])
+
+    np.testing.assert_allclose(blocks[0], whole[0][:, 1:], rtol=1e-5)
+    np.testing.assert_allclose(blocks[1], whole[1][:, 1:], rtol=1e-5)
+
+
+def test_pairs_without_route_get_a_finite_penalty():
+    distances, durations = table(
+        MockOSRMProvider(unreachable=[ISLAND]), COORDS
+    )
+
+    assert np.all(np.isfinite(distances)) and np.all(np.isfinite(durations))
+    others = [0, 1, 3]
+    assert np.all(distances[2, others] == UNREACHABLE_DISTANCE)
+    assert np.all(distances[others, 2] == UNREACHABLE_DISTANCE)
+    assert np.all(durations[2, others] == UNREACHABLE_DURATION)
+    assert distances[2, 2] == 0
+    assert np.all(distances[np.ix_(others, others)] < UNREACHABLE_DISTANCE)
+
+
+class OfflineProvider(MockOSRMProvider):
+    async def table(self, origins, destinations=None):
+        raise AssertionError("the cached pairs should not be fetched again")
+
+
+@pytest.fixture(scope="module")
+def local_ids():
+    create_db_and_tables(engine)
+    with Session(engine) as session:
+        category = Category(name="Routing", slug="routing")
+        locals = [
+            Local(
+                name=f"Routing {i}",
+                slug=f"routing-{i}",
+                latitude=latitude,
+                longitude=longitude,
+                address="",
+                description="",
+                main_category=category,
+            )
+            for i, (latitude, longitude) in enumerate(COORDS[1:])
+        ]
+        session.add_all(locals)
+        session.commit()
+        return [local.id for local in locals]
+
+
+def test_pairs_without_route_are_cached(local_ids):
+    coords = COORDS[1:]
+    with Session(engine) as session:
+        lru = PairLRUCache(0)
+        provider = MockOSRMProvider(unreachable=[ISLAND])
+        distances, _ = asyncio.run(
+            DistanceCache(session, lru).get_matrices_async(
+                local_ids, coords, provider, require_duration=True
+            )
+        )
+        cached, _ = asyncio.run(
+            DistanceCache(session, lru).get_matrices_async(
+                local_ids, coords, OfflineProvider(), require_duration=True
+            )
+        )
+        for local_id in local_ids:
+            DistanceCache(session).invalidate(local_id)
+        session.commit()
+
+    np.testing.assert_allclose(cached, distances)
+    assert cached[1, 0] == UNREACHABLE_DISTANCE
+
+
+@pytest.mark.parametrize(
+    "unreachable, status_code", [([], 200), ([ISLAND], 422)]
+)
+def test_tsp_route_without_road_between_locals(
+    local_ids, monkeypatch, unreachable, status_code
+):
+    provider = MockOSRMProvider(unreachable=unreachable)
+    monkeypatch.setattr(algorithm, "routing_provider", provider)
+    latitude, longitude = COORDS[0]
+    with TestClient(app) as client:
+        response = client.get(
+            "/api/algorithms/tsp",
+            params={
+                "current_latitude": latitude,
+                "current_longitude": longitude,
+                "ids": local_ids,
+                "time_limit": 1,
+            },
+        )
+    with Session(engine) as session:
+        for local_id in local_ids:
+            DistanceCache(session).invalidate(local_id)
+        session.commit()
+
+    assert response.status_code == status_code, response.json()
+    if status_code == 200:
+        assert sorted(local["id"] for local in response.json()) == local_ids
@@ -0,0 +1,84 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session as BaseSession
+from sqlmodel import Session
+
+from agroturismo_api.core.db import create_db_and_tables, engine
+from agroturismo_api.models.tag import Tag
+from agroturismo_api.services.session_changes import (
+    CommitListener,
+    FlushChanges,
+)
+
+
+class RecordingListener(CommitListener):
+    info_key = "test_session_changes"
+
+    def __init__(self):
+        self.applied = []
+
+    def watched_attributes(self, instance):
+        return ("content",)
+
+    def collect(self, changes: FlushChanges):
+        for instance in changes.new + changes.dirty:
+            if isinstance(instance, Tag):
+                yield instance.id, instance.content
+        for instance in changes.deleted:
+            if isinstance(instance, Tag):
+                yield instance.id, None
+
+    def apply(self, pending):
+        self.applied.append(dict(pending))
+
+
+@pytest.fixture
+def listener():
+    create_db_and_tables(engine)
+    listener = RecordingListener()
+    listener.listen()
+    yield listener
+    event.remove(BaseSession, "after_flush", listener.after_flush)
+    event.remove(BaseSession, "after_commit", listener.after_commit)
+    event.remove(BaseSession, "after_rollback", listener.after_rollback)
+
+
+def test_changes_are_applied_on_commit(listener):
+    with Session(engine) as session:
+        tag = Tag(content="changes-a")
+        session.add(tag)
+        session.flush()
+        assert listener.applied == []
+        tag.content = "changes-b"
+        session.flush()
+        session.commit()
+        assert listener.applied == [{tag.id: "changes-b"}]
+
+        session.delete(tag)
+        session.commit()
+        assert listener.applied[-1] == {tag.id: None}
+
+
+def test_unchanged_attributes_are_ignored(listener):
+    with Session(engine) as session:
+        tag = Tag(content="changes-same")
+        session.add(tag)
+        session.commit()
+        listener.applied.clear()
+
+        # assigning the value it already has is not a change
+        tag.content = tag.content
+        session.commit()
+        assert listener.applied == []
+        session.delete(tag)
+        session.commit()
+
+
+def test_changes_are_discarded_on_rollback(listener):
+    with Session(engine) as session:
+        session.add(Tag(content="changes-rollback"))
+        session.flush()
+        session.rollback()
+        assert listener.applied == []
+        session.commit()
+        assert listener.applied == []
@@ -0,0 +1,232 @@
+import random
+from functools import partial
+from itertools import permutations
+
+import numpy as np
+import pytest
+
+from agroturismo_api.services.algorithms import (
+    branch_and_bound,
+    guided_local_search,
+    held_karp,
+    one_tree_lower_bound,
+    solve_tsp_auto,
+    solve_tsptw,
+    tabu_search,
+)
+from agroturismo_api.services.algorithms.time_windows import service_start
+from agroturismo_api.utils import (
+    calculate_distance_matrix,
+    calculate_solution_cost,
+)
+
+SEEDS = range(4)
+SIZES = range(2, 9)
+
+HEURISTICS = {
+    "guided-local-search": partial(
+        guided_local_search, max_iterations=100, max_no_improv=50, alpha=0.3
+    ),
+    "tabu-search": partial(
+        tabu_search, max_iterations=100, max_no_improv=50, tabu_tenure=10
+    ),
+}
+
+
+def random_coords(seed: int, num_points: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return rng.uniform([-21.0, -41.0], [-20.0, -40.0], (num_points, 2))
+
+
+def brute_force(dist, start=None, end=None) -> float:
+    """
+    Menor custo entre todas as rotas circulares ou, com `start`, entre
+    todos os caminhos abertos que saem dele (e terminam em `end`)
+    """
+    num_points = len(dist)
+    first = 0 if start is None else start
+    others = [point for point in range(num_points) if point != first]
+    costs = []
+    for middle in permutations(others):
+        route = [first, *middle]
+        if end is not None and route[-1] != end:
+            continue
+        costs.append(calculate_solution_cost(route, dist, start is None))
+    return min(costs) if costs else 0.0
+
+
+def assert_valid_route(tour, cost, dist, start=None, end=None):
+    num_points = len(dist)
+    assert sorted(tour) == list(range(num_points))
+    if start is not None:
+        assert tour[0] == start
+        if end is not None:
+            assert tour[-1] == end
+    closed = start is None
+    assert cost == pytest.approx(calculate_solution_cost(tour, dist, closed))
+
+
+def open_paths(num_points: int):
+    # sem ponto de partida, só com ele e com ele e o de chegada
+    yield None, None
+    yield 0, None
+    if num_points > 1:
+        yield num_points - 1, 0
+
+
+@pytest.mark.parametrize("num_points", SIZES)
+@pytest.mark.parametrize("seed", SEEDS)
+def test_exact_solvers_match_brute_force(seed, num_points):
+    dist = calculate_distance_matrix(random_coords(seed, num_points))
+    # também com distâncias assimétricas, que os solvers exatos aceitam
+    asymmetric = dist * np.random.default_rng(seed).uniform(1, 1.5, dist.shape)
+    for matrix in (dist, asymmetric):
+        optimum = brute_force(matrix)
+
+        tour, cost = held_karp(matrix)
+        assert_valid_route(tour, cost, matrix)
+        assert cost == pytest.approx(optimum)
+
+        tour, cost, optimal = branch_and_bound(matrix)
+        assert optimal
+        assert_valid_route(tour, cost, matrix)
+        assert cost == pytest.approx(optimum)
+
+        assert one_tree_lower_bound(matrix, cost) <= optimum + 1e-9
+
+
+@pytest.mark.parametrize("exact", ["held-karp", "branch-and-bound"])
+@pytest.mark.parametrize("num_points", SIZES)
+@pytest.mark.parametrize("seed", SEEDS)
+def test_auto_solver_matches_brute_force_on_open_paths(
+    seed, num_points, exact
+):
+    coords = random_coords(seed, num_points)
+    dist = calculate_distance_matrix(coords)
+    held_karp_max_stops = 8 if exact == "held-karp" else 0
+    for start, end in open_paths(num_points):
+        random.seed(seed)
+        solution = solve_tsp_auto(
+            coords,
+            HEURISTICS["guided-local-search"],
+            "guided-local-search",
+            held_karp_max_stops=held_karp_max_stops,
+            branch_and_bound_max_stops=8,
+            dist_matrix=dist,
+            start=start,
+            end=end,
+        )
+
+        assert_valid_route(solution.tour, solution.cost, dist, start, end)
+        assert solution.cost == pytest.approx(brute_force(dist, start, end))
+        assert solution.optimality_gap == 0
+
+
+@pytest.mark.parametrize("heuristic", HEURISTICS)
+@pytest.mark.parametrize("num_points", SIZES)
+@pytest.mark.parametrize("seed", SEEDS)
+def test_heuristics_match_brute_force(seed, num_points, heuristic):
+    coords = random_coords(seed, num_points)
+    dist = calculate_distance_matrix(coords)
+    for start, end in open_paths(num_points):
+        random.seed(seed)
+        tour, cost = HEURISTICS[heuristic](
+            coords, dist_matrix=dist, start=start, end=end
+        )
+
+        assert_valid_route(tour, cost, dist, start, end)
+        assert cost == pytest.approx(brute_force(dist, start, end))
+
+
+def random_time_windows(seed: int, num_points: int):
+    """
+    Deslocamentos (minutos) e até dois intervalos de funcionamento por
+    ponto; o ponto 0 é a partida, sempre aberta e sem visita
+    """
+    rng = np.random.default_rng(seed)
+    coords = random_coords(seed, num_points)
+    travel = calculate_distance_matrix(coords) / 60 * 60  # a 60 km/h
+    opens = np.full((num_points, 2), np.inf)
+    closes = np.full((num_points, 2), -np.inf)
+    for point in range(1, num_points):
+        opens[point, 0] = rng.uniform(480, 720)
+        closes[point, 0] = opens[point, 0] + rng.uniform(60, 240)
+        if rng.random() < 0.5:
+            opens[point, 1] = closes[point, 0] + rng.uniform(60, 120)
+            closes[point, 1] = opens[point, 1] + rng.uniform(60, 180)
+    opens[0, 0], closes[0, 0] = 0, np.inf
+    service = np.full(num_points, 45.0)
+    service[0] = 0
+    return travel, opens, closes, service
+
+
+def simulate(route, travel, opens, closes, service, start_time):
+    latest = closes - service[:, np.newaxis]
+    t, late = start_time + service[route[0]], 0.0
+    starts = [start_time]
+    for prev, node in zip(route, route[1:]):
+        start, lateness = service_start(
+            t + travel[prev][node], opens[node].tolist(), latest[node]
+        )
+        late += lateness
+        t = start + service[node]
+        starts.append(start)
+    return late, t, starts
+
+
+def brute_force_time_windows(travel, opens, closes, service, start, end):
+    num_points = len(travel)
+    best = None
+    for middle in permutations(range(1, num_points)):
+        route = [0, *middle]
+        if end is not None and route[-1] != end:
+            continue
+        late, finish, _ = simulate(
+            route, travel, opens, closes, service, start
+        )
+        if late <= 1e-9 and (best is None or finish < best):
+            best = finish
+    return best  # None quando nenhuma rota respeita os horários
+
+
+@pytest.mark.parametrize("held_karp_max_stops", [8, 0])
+@pytest.mark.parametrize("num_points", range(2, 8))
+@pytest.mark.parametrize("seed", SEEDS)
+def test_time_windows_solver_matches_brute_force(
+    seed, num_points, held_karp_max_stops
+):
+    travel, opens, closes, service = random_time_windows(seed, num_points)
+    start_time = 480.0
+    for end in (None, num_points - 1) if num_points > 2 else (None,):
+        solution = solve_tsptw(
+            travel,
+            opens,
+            closes,
+            service,
+            start_time,
+            end=end,
+            held_karp_max_stops=held_karp_max_stops,
+        )
+        assert solution.tour[0] == 0
+        assert sorted(solution.tour) == list(range(num_points))
+        if end is not None:
+            assert solution.tour[-1] == end
+
+        late, finish, starts = simulate(
+            solution.tour, travel, opens, closes, service, start_time
+        )
+        assert solution.finish_time == pytest.approx(finish)
+        np.testing.assert_allclose(solution.start_times, starts)
+        assert bool(solution.late_points) == (late > 1e-9)
+
+        best = brute_force_time_windows(
+            travel, opens, closes, service, start_time, end
+        )
+        if held_karp_max_stops:
+            # exato: encontra uma rota nos horários sempre que ela existe,
+            # terminando as visitas o mais cedo possível
+            assert (best is None) == bool(solution.late_points)
+            if best is not None:
+                assert finish == pytest.approx(best)
+        elif not solution.late_points:
+            assert finish >= best - 1e-9